@@ -147,51 +147,86 @@ function apiFetch(path, options = {}) {
 
 // === 2. ОСНОВНЫЕ ФУНКЦИИ ===
 
+function normalizeWord(word) {
+    return {
+        ...word,
+        example: word.example || "",
+        exampleTranslate: word.exampleTranslate || "",
+        forgetStep: Number(word.forgetStep) || 0,
+        tags: sanitizeTags(word.tags || []),
+        videoId: word.videoId || '',
+        startTime: Number(word.startTime) || 0,
+        endTime: Number(word.endTime) || 0,
+        subtitleText: word.subtitleText || ''
+    };
+}
+
 async function loadWords() {
     const localData = safeParseStorage('myWords', []);
     if (localData.length > 0) {
-        myWords = localData.map(word => ({
-            ...word,
-            example: word.example || "",
-            exampleTranslate: word.exampleTranslate || "",
-            forgetStep: Number(word.forgetStep) || 0,
-            tags: sanitizeTags(word.tags || []),
-            videoId: word.videoId || '',
-            startTime: Number(word.startTime) || 0,
-            endTime: Number(word.endTime) || 0,
-            subtitleText: word.subtitleText || ''
-        }));
+        myWords = localData.map(normalizeWord);
         isLoaded = true;
         render();
     }
 
     try {
-        const response = await apiFetch('/api/words');
-        if (!response.ok) throw new Error('Сервер недоступен');
-        const data = await response.json();
+        // Сначала шарды: если с экспорта словарь не менялся, скачаются только
+        // шарды с новым хешем. Иначе (или без экспорта) — весь /api/words
+        let data = await loadClipShards(true).catch((err) => {
+            console.log("Словарь из /api/words:", err.message);
+            return null;
+        });
+        if (!data) {
+            const response = await apiFetch('/api/words');
+            if (!response.ok) throw new Error('Сервер недоступен');
+            data = await response.json();
+        }
         if (Array.isArray(data) && data.length > 0) {
-            myWords = data.map(word => ({
-                ...word,
-                example: word.example || "",
-                exampleTranslate: word.exampleTranslate || "",
-                forgetStep: Number(word.forgetStep) || 0,
-                tags: sanitizeTags(word.tags || []),
-                videoId: word.videoId || '',
-                startTime: Number(word.startTime) || 0,
-                endTime: Number(word.endTime) || 0,
-                subtitleText: word.subtitleText || ''
-            }));
+            myWords = data.map(normalizeWord);
             localStorage.setItem('myWords', JSON.stringify(myWords));
         }
         isLoaded = true;
         render();
     } catch (e) {
+        if (myWords.length === 0) {
+            try {
+                // Офлайн ревизию не сверить — последний известный экспорт
+                myWords = (await loadClipShards(false)).map(normalizeWord);
+            } catch (err) {
+                console.log("Шарды словаря недоступны:", err.message);
+            }
+        }
         console.log("Сервер недоступен, работаем офлайн (localStorage)");
         isLoaded = true;
         render();
     }
 }
 
+// Словарь из статических шардов (tools/clip_export.py): index.json + шарды
+// с хешем в имени; sw.js отдаёт неизменившиеся шарды из кеша. С checkRevision
+// шарды берутся, только если revision в индексе совпадает с ревизией words
+// на сервере — иначе они устарели после /api/sync
+async function loadClipShards(checkRevision) {
+    const [index, current] = await Promise.all([
+        fetch('/clips/index.json').then((res) => {
+            if (!res.ok) throw new Error('Нет индекса шардов');
+            return res.json();
+        }),
+        checkRevision
+            ? apiFetch('/api/words/revision').then(res => (res.ok ? res.json() : null))
+            : null
+    ]);
+    if (checkRevision && (!current || current.revision !== index.revision)) {
+        throw new Error('Шарды устарели');
+    }
+    const shards = await Promise.all(index.shards.map(async (shard) => {
+        const res = await fetch(`/clips/${shard.file}`);
+        if (!res.ok) throw new Error(`Нет шарда ${shard.file}`);
+        return res.json();
+    }));
+    return shards.flat();
+}
+
 function safeSetClick(id, callback) {
     const el = document.getElementById(id);
     if (el) {
@@ -2,6 +2,8 @@ const express = require('express');
 const sqlite3 = require('sqlite3').verbose();
 const cors = require('cors');
 const path = require('path');
+const fs = require('fs');
+const { execFile } = require('child_process');
 const https = require('https');
 const http = require('http');
 const app = express();
@@ -9,6 +11,33 @@ const PORT = 3000;
 
 app.use(cors());
 app.use(express.json({ limit: '50mb' }));
+
+// Шарды словаря (tools/clip_export.py): хеш содержимого в имени — кешируются
+// навсегда, index.json каждый раз проверяется. Рядом лежат .br / .gz —
+// отдаём сжатую копию, если браузер её принимает. Раньше express.static.
+const CLIPS_DIR = path.join(__dirname, 'clips');
+app.get('/clips/:file', (req, res, next) => {
+    const file = path.basename(req.params.file);
+    if (!file.endsWith('.json')) return next();
+    const accepts = req.headers['accept-encoding'] || '';
+    const headers = {
+        'Content-Type': 'application/json; charset=utf-8',
+        'Cache-Control': file === 'index.json' ? 'no-cache' : 'public, max-age=31536000, immutable',
+        'Vary': 'Accept-Encoding'
+    };
+    const variants = [['.br', 'br'], ['.gz', 'gzip']]
+        .filter(([ext, encoding]) => accepts.includes(encoding) && fs.existsSync(path.join(CLIPS_DIR, file + ext)));
+    const [ext, encoding] = variants[0] || ['', null];
+    if (encoding) headers['Content-Encoding'] = encoding;
+    res.set(headers);
+    res.sendFile(path.join(CLIPS_DIR, file + ext), (err) => {
+        if (err) {
+            ['Content-Encoding', 'Cache-Control'].forEach(h => res.removeHeader(h));
+            next();
+        }
+    });
+});
+
 app.use(express.static(path.join(__dirname)));
 
 const db = new sqlite3.Database('./vocab.db', (err) => {
@@ -135,6 +164,33 @@ app.get('/api/words', (req, res) => {
     });
 });
 
+// Ревизия words (tools/vocab_store.py, триггеры words_revision): клиент сверяет
+// её с revision в clips/index.json и берёт словарь из шардов, если они свежие
+app.get('/api/words/revision', (req, res) => {
+    db.get("SELECT revision FROM words_revision WHERE id = 1", [], (err, row) => {
+        if (err || !row) return res.status(404).json({ error: 'Нет words_revision (запустите инструменты)' });
+        res.json({ revision: row.revision });
+    });
+});
+
+// После синхронизации шарды устарели — пересобираем их (с задержкой, чтобы
+// серия сохранений дала один экспорт). Только если экспорт уже включён:
+// clips/index.json создаёт первый запуск tools/clip_export.py
+const EXPORT_DELAY_MS = 30000;
+let exportTimer = null;
+function scheduleClipExport() {
+    if (!fs.existsSync(path.join(CLIPS_DIR, 'index.json'))) return;
+    clearTimeout(exportTimer);
+    exportTimer = setTimeout(() => {
+        const script = path.join(__dirname, 'tools', 'clip_export.py');
+        execFile('python3', [script, '--db', path.join(__dirname, 'vocab.db'), '--out', CLIPS_DIR],
+            (err) => {
+                if (err) console.error('Ошибка экспорта шардов:', err.message);
+                else console.log('Шарды словаря обновлены');
+            });
+    }, EXPORT_DELAY_MS);
+}
+
 app.post('/api/sync', (req, res) => {
     const words = req.body;
     if (!Array.isArray(words)) return res.status(400).json({ error: "Data is not an array" });
@@ -177,11 +233,58 @@ app.post('/api/sync', (req, res) => {
                 db.run("COMMIT");
                 console.log(`Синхронизировано слов: ${words.length}`);
                 res.json({ status: "success", count: words.length });
+                scheduleClipExport();
             }
         });
     });
 });
 
+// --- ПОИСК ПО СЛОВАРЮ ---
+// Индекс words_fts (FTS5) создают инструменты (tools/vocab_store.py) и держат
+// в актуальном состоянии триггеры — в том числе при /api/sync.
+// Разбор запроса — как fts_query() в tools/word_search.py: слова через пробел
+// (все обязательны), "фраза", слово* — префикс; последнее слово — префикс.
+function ftsQuery(text) {
+    const parts = [];
+    for (const m of String(text).matchAll(/"([^"]*)"|(\S+)/g)) {
+        const bare = m[1] === undefined;
+        const tokens = (bare ? m[2] : m[1]).toLowerCase().match(/[\p{L}\p{N}_]+/gu) || [];
+        if (!tokens.length) continue;
+        parts.push({ phrase: `"${tokens.join(' ')}"`, star: bare && m[2].endsWith('*'), bare });
+    }
+    if (!parts.length) return null;
+    if (parts[parts.length - 1].bare) parts[parts.length - 1].star = true;
+    return parts.map(p => p.phrase + (p.star ? '*' : '')).join(' ');
+}
+
+app.get('/api/search', (req, res) => {
+    const query = ftsQuery(req.query.q || '');
+    if (!query) return res.json([]);
+    const limit = Math.min(parseInt(req.query.limit) || 20, 200);
+    const clips = req.query.clips === '1'
+        ? "AND COALESCE(w.videoId, '') != '' AND COALESCE(w.subtitleText, '') != ''"
+        : '';
+    db.all(`
+        SELECT w.id, w.original, w.translate, w.videoId, w.startTime, w.endTime,
+               snippet(words_fts, -1, '[', ']', '…', 12) AS snippet
+        FROM   words_fts JOIN words w ON w.rowid = words_fts.rowid
+        WHERE  words_fts MATCH ? ${clips}
+        ORDER  BY words_fts.rank
+        LIMIT  ?
+    `, [query, limit], (err, rows) => {
+        if (err && /no such table/.test(err.message)) {
+            return res.status(503).json({ error: "Нет индекса words_fts: запустите python3 tools/word_search.py --rebuild" });
+        }
+        if (err) return res.status(500).json({ error: err.message });
+        res.json(rows.map(row => ({
+            ...row,
+            videoId: row.videoId || '',
+            startTime: Number(row.startTime) || 0,
+            endTime: Number(row.endTime) || 0
+        })));
+    });
+});
+
 // ============================================================
 // YOUGLISH PROXY — обходим X-Frame-Options через сервер
 // ============================================================
@@ -1,4 +1,8 @@
 const CACHE_NAME = 'slovar-v1';
+// Шарды словаря (tools/clip_export.py): имя меняется вместе с содержимым,
+// поэтому закешированный шард никогда не перепроверяется
+const CLIPS_CACHE = 'slovar-clips';
+const CLIPS_INDEX = '/clips/index.json';
 const STATIC_ASSETS = [
     '/',
     '/index.html',
@@ -22,7 +26,7 @@ self.addEventListener('activate', (event) => {
     event.waitUntil(
         caches.keys().then((keys) =>
             Promise.all(
-                keys.filter(k => k !== CACHE_NAME).map(k => caches.delete(k))
+                keys.filter(k => k !== CACHE_NAME && k !== CLIPS_CACHE).map(k => caches.delete(k))
             )
         )
     );
@@ -46,6 +50,42 @@ self.addEventListener('fetch', (event) => {
         return;
     }
 
+    // Индекс шардов — сначала сеть (офлайн — последний известный)
+    if (url.pathname === CLIPS_INDEX) {
+        event.respondWith(
+            fetch(event.request).then((response) => {
+                if (response && response.status === 200) {
+                    const clone = response.clone();
+                    event.waitUntil(cacheClipsIndex(event.request, clone));
+                }
+                return response;
+            }).catch(() =>
+                caches.open(CLIPS_CACHE)
+                    .then(c => c.match(event.request))
+                    .then(cached => cached || new Response('offline', { status: 503 }))
+            )
+        );
+        return;
+    }
+
+    // Шарды — только кеш, в сеть лишь за новым хешем
+    if (url.pathname.startsWith('/clips/')) {
+        event.respondWith(
+            caches.open(CLIPS_CACHE).then((cache) =>
+                cache.match(event.request).then((cached) => {
+                    if (cached) return cached;
+                    return fetch(event.request).then((response) => {
+                        if (response && response.status === 200) {
+                            cache.put(event.request, response.clone());
+                        }
+                        return response;
+                    }).catch(() => new Response('offline', { status: 503 }));
+                })
+            )
+        );
+        return;
+    }
+
     // Статика — сначала кеш, потом сеть
     event.respondWith(
         caches.match(event.request).then((cached) => {
@@ -59,4 +99,20 @@ self.addEventListener('fetch', (event) => {
             }).catch(() => cached || new Response('offline', { status: 503 }));
         })
     );
-});
\ No newline at end of file
+});
+
+// Новый индекс: запоминаем его и удаляем шарды, на которые он больше не ссылается
+async function cacheClipsIndex(request, response) {
+    const cache = await caches.open(CLIPS_CACHE);
+    const index = await response.clone().json().catch(() => null);
+    await cache.put(request, response);
+    if (!index || !Array.isArray(index.shards)) return;
+    const keep = new Set(index.shards.map(s => `/clips/${s.file}`));
+    const cached = await cache.keys();
+    await Promise.all(cached
+        .filter(req => {
+            const path = new URL(req.url).pathname;
+            return path !== CLIPS_INDEX && !keep.has(path);
+        })
+        .map(req => cache.delete(req)));
+}
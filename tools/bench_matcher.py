@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+bench_matcher.py
+----------------
+Сверяет пакетный find_sentences() с эталонным find_sentence() и меряет ускорение.
+
+Транскрипт синтетический (или из кеша субтитров, если указан --video),
+слова — из vocab.db либо из самого транскрипта.
+
+  python bench_matcher.py --words 500 --chunks 2000
+  python bench_matcher.py --db ./vocab.db --video dQw4w9WgXcQ
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import sqlite3
+import time
+import tracemalloc
+from typing import Optional
+
+from transcript_cache import DEFAULT_CACHE_DIR, TranscriptCache
+from transcripts import Chunk, Transcript, find_sentence, find_sentences
+
+_FILLER = ("the a to and of you it is that in we this for so what but just like "
+           "know going really think right people time very good back want look "
+           "take run make off up out over into about get go new year day").split()
+
+
+def reference_find_sentence(chunks: list[Chunk], word: str,
+                            max_expand: int = 6,
+                            max_duration: float = 15.0) -> Optional[tuple[float, float, str]]:
+    """Исходная реализация find_sentence() (до пакетного режима) — эталон для сверки."""
+    pattern = re.compile(r"(?<!\w)" + re.escape(word) + r"(?!\w)", re.IGNORECASE)
+    hit = next((i for i, c in enumerate(chunks) if pattern.search(c.text)), None)
+    if hit is None:
+        return None
+
+    left = hit
+    while left > 0 and (hit - left) < max_expand:
+        if re.search(r"[.!?…]\s*$", chunks[left - 1].text):
+            break
+        left -= 1
+
+    right = hit
+    while right < len(chunks) - 1 and (right - hit) < max_expand:
+        if re.search(r"[.!?…]\s*$", chunks[right].text):
+            break
+        right += 1
+        if re.search(r"[.!?…]\s*$", chunks[right].text):
+            break
+
+    word_start = chunks[hit].start
+    half       = max_duration / 2.0
+    clip_start = max(chunks[left].start, word_start - half)
+    clip_end   = clip_start + max_duration
+
+    while left < hit and chunks[left].start < clip_start:
+        left += 1
+    while right > hit and chunks[right].end > clip_end:
+        right -= 1
+
+    final_start = chunks[left].start
+    final_end   = chunks[right].end
+    if final_end - final_start > max_duration:
+        left = right = hit
+        final_start = chunks[hit].start
+        final_end   = chunks[hit].end
+
+    sentence = re.sub(r"\s+", " ",
+                      " ".join(c.text for c in chunks[left:right + 1])).strip()
+
+    pad_start = max(0.0, final_start - 0.5)
+    pad_end   = final_end + 0.5
+    if pad_end - pad_start > max_duration:
+        pad_end = pad_start + max_duration
+
+    return round(pad_start, 2), round(pad_end, 2), sentence
+
+
+def synthetic_transcript(n_chunks: int, vocab: list[str], rng: random.Random) -> list[Chunk]:
+    chunks, t = [], 0.0
+    for _ in range(n_chunks):
+        n   = rng.randint(3, 9)
+        txt = " ".join(rng.choice(vocab) if rng.random() < 0.15 else rng.choice(_FILLER)
+                       for _ in range(n))
+        if rng.random() < 0.25:
+            txt += rng.choice(".!?…")
+        if rng.random() < 0.1:
+            txt = txt.capitalize()
+        dur = rng.uniform(1.5, 5.0)
+        chunks.append(Chunk(text=txt, start=round(t, 2), end=round(t + dur, 2)))
+        t += dur * rng.uniform(0.6, 1.0)
+    return chunks
+
+
+def load_words(db: str | None, n: int, rng: random.Random) -> list[str]:
+    if db:
+        conn = sqlite3.connect(db)
+        rows = [r[0] for r in conn.execute(
+            "SELECT original FROM words WHERE length(COALESCE(original,'')) >= 2")]
+        conn.close()
+        if rows:
+            return rng.sample(rows, min(n, len(rows)))
+    return [f"word{i}" if i % 3 else rng.choice(_FILLER) + " " + rng.choice(_FILLER)
+            for i in range(n)]
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Бенчмарк и сверка find_sentences()")
+    p.add_argument("--db",        default=None, help="Брать слова из vocab.db")
+    p.add_argument("--video",     default=None, help="Взять транскрипт из кеша субтитров")
+    p.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    p.add_argument("--words",     type=int, default=300)
+    p.add_argument("--chunks",    type=int, default=1500)
+    p.add_argument("--repeat",    type=int, default=3)
+    p.add_argument("--seed",      type=int, default=42)
+    args = p.parse_args()
+
+    rng   = random.Random(args.seed)
+    words = load_words(args.db, args.words, rng)
+    # Часть слов кладём в транскрипт, чтобы были и попадания, и промахи
+    vocab = words[: max(1, len(words) // 2)]
+
+    if args.video:
+        chunks = TranscriptCache(args.cache_dir).get(args.video, "en", "json3")
+        if not chunks:
+            print(f"❌ {args.video} нет в кеше")
+            raise SystemExit(1)
+    else:
+        chunks = synthetic_transcript(args.chunks, vocab, rng)
+
+    print(f"📋 Чанков: {len(chunks)}, слов: {len(words)}")
+
+    # Сверка с эталоном
+    expected = {w: reference_find_sentence(chunks, w) for w in words}
+    batch    = find_sentences(chunks, words)
+    single   = {w: find_sentence(chunks, w) for w in words}
+    mismatch = [w for w in words if not (expected[w] == batch[w] == single[w])]
+    found    = sum(1 for r in expected.values() if r is not None)
+    if mismatch:
+        print(f"❌ Расхождения с эталоном: {len(mismatch)} (например {mismatch[:5]})")
+        raise SystemExit(1)
+    print(f"✅ Результаты совпадают с эталоном ({found} найдено, {len(words) - found} нет)")
+
+    def timed(fn) -> float:
+        best = float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - t0)
+        return best
+
+    t_ref   = timed(lambda: [reference_find_sentence(chunks, w) for w in words])
+    t_batch = timed(lambda: find_sentences(chunks, words))
+    print(f"⏱  по одному слову: {t_ref * 1000:8.1f} мс")
+    print(f"⏱  пакетно:         {t_batch * 1000:8.1f} мс")
+    print(f"🚀 ускорение: ×{t_ref / t_batch:.1f}")
+
+    # Transcript строится один раз на видео и переиспользуется для всех слов
+    transcript = Transcript(chunks)
+    t_build = timed(lambda: Transcript(chunks))
+    t_query = timed(lambda: transcript.find_sentences(words))
+    print(f"⏱  Transcript: сборка {t_build * 1000:.1f} мс, поиск {t_query * 1000:.1f} мс")
+
+    def allocated(build) -> int:
+        tracemalloc.start()
+        obj = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del obj
+        return size
+
+    # Текст копируется заново, чтобы обе структуры учитывали свои строки
+    rows = [(c.text.encode(), c.start, c.end) for c in chunks]
+    mem_chunks  = allocated(lambda: [Chunk(t.decode(), s, e) for t, s, e in rows])
+    mem_compact = allocated(lambda: Transcript([Chunk(t.decode(), s, e) for t, s, e in rows]))
+    print(f"💾 память: list[Chunk] {mem_chunks / 1024:.0f} КБ, Transcript {mem_compact / 1024:.0f} КБ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+bench_pipeline.py
+-----------------
+Офлайн-прогон режима --workers N (refine_pipeline → run_pipeline) на
+заглушке провайдера субтитров: без сети, YouTube и vocab.db.
+
+Заглушка отвечает с задержкой --latency, у части видео субтитров нет,
+а каждый --ban-every-й запрос "банит" текущий прокси: все запросы через
+него получают 429, пока ротатор не сменит IP. Потоки ловят 429
+одновременно, и проверяется, что на один бан приходится одна смена IP
+(а не по смене на поток), а каждое слово получает свой результат.
+
+  python bench_pipeline.py --videos 200 --workers 8
+  python bench_pipeline.py --videos 200 --workers 1 --ban-every 0
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import sqlite3
+import threading
+import time
+
+from bench_suite import WORDS_SCHEMA
+from db_writer import BatchWriter
+from refine_segments import ProxyRotator, ResultWriter, SubtitleFetcher, refine_pipeline
+from transcript_providers import NoTranscript, TranscriptProvider
+from transcripts import Chunk
+
+_RATE_LIMITED = "HTTP Error 429: Too Many Requests"
+
+
+class StubProvider(TranscriptProvider):
+    """Провайдер-заглушка: транскрипты из памяти, баны прокси по счётчику запросов."""
+
+    name      = "stub"
+    cacheable = False
+
+    def __init__(self, transcripts: dict[str, list[Chunk]], latency: float = 0.005,
+                 ban_every: int = 0):
+        self.transcripts = transcripts
+        self.latency     = latency
+        self.ban_every   = ban_every
+        self._lock       = threading.Lock()
+        self.banned: set = set()
+        self.requests    = 0
+        self.rejected    = 0
+        self.resets      = 0
+
+    def fetch(self, video_id: str, lang: str = "en",
+              proxy: str | None = None) -> tuple[list[Chunk], str, str | None]:
+        time.sleep(self.latency)
+        with self._lock:
+            self.requests += 1
+            if proxy in self.banned:
+                self.rejected += 1
+                raise RuntimeError(_RATE_LIMITED)
+            if self.ban_every and self.requests % self.ban_every == 0:
+                self.banned.add(proxy)
+                self.rejected += 1
+                raise RuntimeError(_RATE_LIMITED)
+        chunks = self.transcripts.get(video_id)
+        if chunks is None:
+            raise NoTranscript("Субтитры не найдены: заглушка")
+        return chunks, lang, None
+
+    def reset(self) -> None:
+        with self._lock:
+            self.resets += 1
+
+
+def make_corpus(n_videos: int, words_per_video: int,
+                no_subs_every: int) -> tuple[list[tuple], dict[str, list[Chunk]]]:
+    """Строки (id, original, videoId) и транскрипты, где каждое слово встречается один раз."""
+    rows, transcripts = [], {}
+    for v in range(n_videos):
+        video_id = f"stub{v:07d}"
+        words = [f"word{v}x{w}" for w in range(words_per_video)]
+        rows += [(v * 1000 + w, word, video_id) for w, word in enumerate(words)]
+        if no_subs_every and v % no_subs_every == no_subs_every - 1:
+            continue
+        transcripts[video_id] = [Chunk(text=f"We say {word} every day.", start=i * 3.0,
+                                       end=i * 3.0 + 2.5)
+                                 for i, word in enumerate(words)]
+    return rows, transcripts
+
+
+def pipeline_args(workers: int) -> argparse.Namespace:
+    """Только те флаги refine_segments, которые читает refine_pipeline."""
+    return argparse.Namespace(workers=workers, rate=10_000.0, sleep_min=0.0, sleep_max=0.0,
+                              max_consecutive_errors=10_000, max_duration=15.0,
+                              clip_mode="sentence", clip_min=3.0, clip_max=6.0,
+                              exact_only=False)
+
+
+def run(args: argparse.Namespace) -> None:
+    rows, transcripts = make_corpus(args.videos, args.words_per_video, args.no_subs_every)
+    conn = sqlite3.connect(":memory:")
+    conn.execute(WORDS_SCHEMA)
+    conn.executemany("INSERT INTO words (id, original, videoId) VALUES (?, ?, ?)", rows)
+    conn.commit()
+    selected = conn.execute("SELECT rowid, original, videoId FROM words").fetchall()
+
+    provider = StubProvider(transcripts, args.latency, args.ban_every)
+    # Прокси с запасом: ротатор не должен вернуться к уже забаненному
+    rotator  = ProxyRotator(mode="list",
+                            proxies=[f"socks5://stub-{i}" for i in range(args.videos * 4 + 8)])
+    fetcher  = SubtitleFetcher(rotator, provider, verbose=False)
+
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    t0 = time.perf_counter()
+    with BatchWriter(conn, flush_rows=500, verbose=False) as writer, quiet:
+        refine_pipeline(pipeline_args(args.workers), fetcher, ResultWriter(writer), selected)
+    elapsed = time.perf_counter() - t0
+
+    found = conn.execute("SELECT COUNT(*) FROM words WHERE subtitleText != ''").fetchone()[0]
+    expected = sum(len(chunks) for chunks in transcripts.values())
+    bans = len(provider.banned)
+
+    print(f"🧪 {args.videos} видео × {args.words_per_video} слов, потоков: {args.workers}, "
+          f"задержка {args.latency * 1000:g} мс")
+    print(f"  время            {elapsed * 1000:9.1f} мс")
+    print(f"  запросов         {provider.requests:9d}  (429: {provider.rejected})")
+    print(f"  банов / смен IP  {bans:9d} / {rotator.generation}  "
+          f"(сбросов соединений: {provider.resets})")
+    print(f"  слов найдено     {found:9d} / {expected}")
+
+    assert found == expected, "не все слова с субтитрами получили клип"
+    assert rotator.generation == bans, "смен IP больше, чем банов: потоки меняли IP повторно"
+    assert provider.resets == rotator.generation, "сброс соединений не совпал со сменой IP"
+    print("  ✅ проверки пройдены")
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Офлайн-прогон конвейера refine_segments на заглушке")
+    p.add_argument("--videos", type=int, default=200)
+    p.add_argument("--words-per-video", type=int, default=3)
+    p.add_argument("--workers", type=int, default=8)
+    p.add_argument("--latency", type=float, default=0.005,
+                   help="Задержка ответа заглушки, с (default: 0.005)")
+    p.add_argument("--ban-every", type=int, default=25,
+                   help="Каждый N-й запрос банит текущий прокси (0 — без банов)")
+    p.add_argument("--no-subs-every", type=int, default=10,
+                   help="У каждого N-го видео нет субтитров (0 — у всех есть)")
+    p.add_argument("--verbose", action="store_true", help="Показывать вывод refine_pipeline")
+    run(p.parse_args())
+
+
+if __name__ == "__main__":
+    main()
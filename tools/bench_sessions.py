@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+bench_sessions.py
+-----------------
+Накладные расходы на слово: новый YoutubeDL на каждый запрос (как было
+в fetch_chunks — два экземпляра на слово) против одной YdlSession на запуск.
+
+Сеть не трогается: extract_info и urlopen подменены заготовками. По умолчанию
+экстрактор — заглушка, которая, как настоящий конструктор, разбирает опции,
+читает cookies.txt и собирает urllib-обработчики. С --real берётся настоящий
+yt_dlp.YoutubeDL с заглушками вместо сетевых методов.
+
+  python bench_sessions.py --words 300
+  python bench_sessions.py --words 300 --cookies 400 --real
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.cookiejar
+import io
+import json
+import os
+import tempfile
+import time
+import urllib.request
+
+from transcripts import _parse_json3
+from ydl_session import YdlSession
+
+_SUBS_URL = "https://www.youtube.com/api/timedtext?v={}&fmt=json3"
+
+
+def _fake_info(video_id: str) -> dict:
+    return {"id": video_id,
+            "automatic_captions": {"en": [{"ext": "json3", "url": _SUBS_URL.format(video_id)}]}}
+
+
+def _fake_json3(n_events: int = 200) -> bytes:
+    events = [{"tStartMs": i * 2000, "dDurationMs": 2000,
+               "segs": [{"utf8": f"line {i} with some words to take off"}]}
+              for i in range(n_events)]
+    return json.dumps({"events": events}).encode("utf-8")
+
+
+class StubYoutubeDL:
+    """Заглушка YoutubeDL: стоимость конструктора без сети."""
+
+    instances = 0
+
+    def __init__(self, opts: dict):
+        StubYoutubeDL.instances += 1
+        self.params = dict(opts)
+        self.cookiejar = http.cookiejar.MozillaCookieJar()
+        cookiefile = opts.get("cookiefile")
+        if cookiefile:
+            self.cookiejar.load(cookiefile, ignore_discard=True, ignore_expires=True)
+        handlers = [urllib.request.HTTPCookieProcessor(self.cookiejar)]
+        if opts.get("proxy"):
+            handlers.append(urllib.request.ProxyHandler({"https": opts["proxy"]}))
+        self._opener = urllib.request.build_opener(*handlers)
+        self._body = _fake_json3()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.params.get("cookiefile"):
+            # Настоящий YoutubeDL при закрытии сохраняет cookie-jar
+            self.cookiejar.save(os.devnull, ignore_discard=True, ignore_expires=True)
+
+    def extract_info(self, url: str, download: bool = False) -> dict:
+        return _fake_info(url.rsplit("=", 1)[-1])
+
+    def urlopen(self, url: str) -> io.BytesIO:
+        return io.BytesIO(self._body)
+
+
+def _real_factory():
+    from yt_dlp import YoutubeDL
+
+    body = _fake_json3()
+
+    class OfflineYoutubeDL(YoutubeDL):
+        instances = 0
+
+        def __init__(self, opts):
+            OfflineYoutubeDL.instances += 1
+            super().__init__(opts)
+
+        def extract_info(self, url, download=False, **kwargs):
+            return _fake_info(url.rsplit("=", 1)[-1])
+
+        def urlopen(self, req):
+            return io.BytesIO(body)
+
+    return OfflineYoutubeDL
+
+
+def _write_cookies(path: str, n: int) -> None:
+    with open(path, "w") as f:
+        f.write("# Netscape HTTP Cookie File\n")
+        for i in range(n):
+            f.write(f".youtube.com\tTRUE\t/\tTRUE\t2000000000\tCOOKIE{i}\t{'x' * 40}\n")
+
+
+def _opts(cookies_file: str | None) -> dict:
+    opts = {"quiet": True, "no_warnings": True, "skip_download": True,
+            "writesubtitles": True, "writeautomaticsub": True,
+            "subtitleslangs": ["en"], "subtitlesformat": "json3"}
+    if cookies_file:
+        opts["cookiefile"] = cookies_file
+    return opts
+
+
+def _subs_url(info: dict) -> str:
+    return info["automatic_captions"]["en"][0]["url"]
+
+
+def run_per_word(factory, opts: dict, video_ids: list[str]) -> int:
+    """Прежняя схема fetch_chunks: два новых экземпляра на каждое слово."""
+    total = 0
+    for vid in video_ids:
+        with factory(opts) as ydl:
+            info = ydl.extract_info(f"https://www.youtube.com/watch?v={vid}", download=False)
+        with factory({**opts, "quiet": True}) as ydl:
+            raw = ydl.urlopen(_subs_url(info)).read().decode("utf-8")
+        total += len(_parse_json3(json.loads(raw)))
+    return total
+
+
+def run_session(factory, opts: dict, video_ids: list[str]) -> int:
+    """Одна сессия на весь запуск."""
+    total = 0
+    with YdlSession(opts, factory) as session:
+        for vid in video_ids:
+            info = session.extract_info(f"https://www.youtube.com/watch?v={vid}", download=False)
+            raw  = session.urlopen(_subs_url(info)).decode("utf-8")
+            total += len(_parse_json3(json.loads(raw)))
+    return total
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="YoutubeDL на слово vs долгоживущая сессия")
+    p.add_argument("--words", type=int, default=300)
+    p.add_argument("--cookies", type=int, default=200,
+                   help="Строк в синтетическом cookies.txt (0 — без cookies)")
+    p.add_argument("--real", action="store_true",
+                   help="Настоящий yt_dlp.YoutubeDL с заглушками сетевых методов")
+    args = p.parse_args()
+
+    factory = _real_factory() if args.real else StubYoutubeDL
+    video_ids = [f"vid{i:08d}" for i in range(args.words)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cookies_file = None
+        if args.cookies:
+            cookies_file = os.path.join(tmp, "cookies.txt")
+            _write_cookies(cookies_file, args.cookies)
+        opts = _opts(cookies_file)
+
+        results = {}
+        for name, fn in (("на слово", run_per_word), ("сессия", run_session)):
+            factory.instances = 0
+            t0 = time.perf_counter()
+            chunks = fn(factory, opts, video_ids)
+            elapsed = time.perf_counter() - t0
+            results[name] = (elapsed, factory.instances, chunks)
+
+    print(f"🧪 {args.words} слов, cookies: {args.cookies} строк, "
+          f"экстрактор: {'yt_dlp' if args.real else 'заглушка'}")
+    for name, (elapsed, instances, chunks) in results.items():
+        print(f"  {name:<9} {elapsed * 1e3:9.1f} мс  "
+              f"{elapsed / args.words * 1e6:8.1f} мкс/слово  "
+              f"экземпляров YoutubeDL: {instances}")
+    before, after = results["на слово"][0], results["сессия"][0]
+    assert results["на слово"][2] == results["сессия"][2], "результаты разошлись"
+    print(f"  ⚡ время на слово: x{before / after:.1f} меньше")
+
+
+if __name__ == "__main__":
+    main()
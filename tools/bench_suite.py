@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+bench_suite.py
+--------------
+Бенчмарк всего пути обработки без сети: синтетические json3-транскрипты
+(автосубтитры без пунктуации и ручные с пунктуацией) и таблица words
+нужного размера во временной БД.
+
+Стадии меряются отдельно, суммарно по всем видео (лучшее из --repeat):
+  decode  json.loads
+  parse   разбор событий json3 (_json3_events)
+  clean   _clean + сборка Chunk
+  match   find_sentences по словам видео
+  write   UPDATE words через BatchWriter (как в refine_segments)
+
+  python bench_suite.py                                 # 3k слов, оба стиля
+  python bench_suite.py --sizes 3000,30000,300000 --json bench.json
+  python bench_suite.py --save-baseline bench_baseline.json
+  python bench_suite.py --baseline bench_baseline.json  # код 1 при регрессии
+
+Базовая линия зависит от машины — сохраняй и сравнивай на одной и той же.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from db_writer import BatchWriter
+from outcomes import OutcomeStore
+from refine_segments import UPDATE_FOUND_SQL
+from transcripts import Chunk, _clean, _json3_events, find_sentences
+
+STAGES = ("decode", "parse", "clean", "match", "write")
+STYLES = ("auto", "manual")
+
+_FILLER = ("the a to and of you it is that in we this for so what but just like "
+           "know going really think right people time very good back want look "
+           "take run make off up out over into about get go new year day").split()
+_SYLLABLES = ("ba be bi bo ca ce co da de di do fa fe ga ge go la le li lo ma me mi "
+              "mo na ne ni no pa pe pi po ra re ri ro sa se si so ta te ti to va ve "
+              "vi vo za ze zi").split()
+
+WORDS_SCHEMA = """
+    CREATE TABLE words (
+        id REAL, original TEXT, translate TEXT, example TEXT, exampleTranslate TEXT,
+        level INTEGER, nextReview REAL, forgetStep INTEGER, videoId TEXT,
+        startTime REAL, tags TEXT, endTime REAL, subtitleText TEXT,
+        subtitleLang TEXT, subtitleUpdatedAt TEXT
+    )
+"""
+
+
+# ─── Генерация ────────────────────────────────────────────────
+
+def make_vocab(size: int, rng: random.Random) -> list[str]:
+    """Псевдослова словаря; ~10% — фразы из двух слов, как в реальной БД."""
+    vocab: set[str] = set()
+    while len(vocab) < size:
+        word = "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if rng.random() < 0.1:
+            word += " " + rng.choice(_FILLER)
+        vocab.add(word.capitalize())
+    return sorted(vocab)
+
+
+def _video_id(i: int) -> str:
+    return f"v{i:010d}"
+
+
+def json3_transcript(words: list[str], style: str, n_events: int,
+                     rng: random.Random, hit_rate: float = 0.7) -> str:
+    """
+    Транскрипт json3 со ~hit_rate слов видео внутри.
+    auto   — нижний регистр, без пунктуации, пословные сегменты с tOffsetMs,
+             служебные события-переводы строки и [Music];
+    manual — предложения с заглавной буквы и знаками препинания, один сегмент.
+    """
+    inject = [w.lower() if style == "auto" else w for w in words if rng.random() < hit_rate]
+    slots  = {rng.randrange(n_events): w for w in inject}
+    events, t_ms = [], 0
+    for i in range(n_events):
+        tokens = [rng.choice(_FILLER) for _ in range(rng.randint(3, 9))]
+        if i in slots:
+            tokens.insert(rng.randrange(len(tokens) + 1), slots[i])
+        dur = rng.randint(1500, 5000)
+
+        if style == "auto":
+            if rng.random() < 0.03:
+                tokens = ["[Music]"]
+            segs = [{"utf8": tokens[0]}] + [
+                {"utf8": " " + tok, "tOffsetMs": k * dur // len(tokens)}
+                for k, tok in enumerate(tokens[1:], start=1)]
+            events.append({"tStartMs": t_ms, "dDurationMs": dur, "wWinId": 1, "segs": segs})
+            events.append({"tStartMs": t_ms + dur, "wWinId": 1, "aAppend": 1,
+                           "segs": [{"utf8": "\n"}]})
+        else:
+            text = " ".join(tokens)
+            text = text[0].upper() + text[1:] + (rng.choice(".!?") if rng.random() < 0.4 else ",")
+            events.append({"tStartMs": t_ms, "dDurationMs": dur,
+                           "segs": [{"utf8": text}]})
+        t_ms += int(dur * rng.uniform(0.6, 1.0))
+    return json.dumps({"wireMagic": "pb3", "events": events})
+
+
+class Workload:
+    """Временная БД words и json3 по видео для одного размера и стиля."""
+
+    def __init__(self, n_words: int, style: str, videos: int, n_events: int,
+                 seed: int, tmp_dir: str):
+        rng = random.Random(f"{seed}-{n_words}-{style}")
+        self.n_words  = n_words
+        self.style    = style
+        n_videos      = max(1, min(videos, n_words // 5))
+        vocab         = make_vocab(min(max(n_words, 100), 50_000), rng)
+
+        self.db_path = os.path.join(tmp_dir, f"words_{n_words}_{style}.db")
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(WORDS_SCHEMA)
+        now = time.time() * 1000
+        rows = [(now + i, rng.choice(vocab), _video_id(i % n_videos)) for i in range(n_words)]
+        conn.executemany("INSERT INTO words (id, original, videoId) VALUES (?,?,?)", rows)
+        conn.commit()
+
+        # (rowid, original) по видео — rowid совпадает с порядком вставки
+        self.groups: dict[str, list[tuple[int, str]]] = {}
+        for rowid, (_id, original, video_id) in enumerate(rows, start=1):
+            self.groups.setdefault(video_id, []).append((rowid, original))
+        conn.close()
+
+        self.payloads = {video_id: json3_transcript([w for _, w in items], style, n_events, rng)
+                         for video_id, items in self.groups.items()}
+
+    def run(self) -> dict[str, float]:
+        """Один прогон всех стадий; возвращает секунды по стадиям."""
+        times = dict.fromkeys(STAGES, 0.0)
+        clock = time.perf_counter
+        now_iso = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        results: list[tuple[str, tuple]] = []
+        conn = sqlite3.connect(self.db_path)
+        # Не найденные слова — в negative_outcomes, как в refine_segments
+        outcomes = OutcomeStore(conn, enabled=False)
+
+        for video_id, payload in self.payloads.items():
+            t0 = clock()
+            data = json.loads(payload)
+            t1 = clock()
+            events = list(_json3_events(data))
+            t2 = clock()
+            chunks = []
+            for text, start, end, _segs in events:
+                text = _clean(text)
+                if text:
+                    chunks.append(Chunk(text=text, start=start, end=end))
+            t3 = clock()
+            items   = self.groups[video_id]
+            matches = find_sentences(chunks, [w for _, w in items])
+            t4 = clock()
+            times["decode"] += t1 - t0
+            times["parse"]  += t2 - t1
+            times["clean"]  += t3 - t2
+            times["match"]  += t4 - t3
+
+            for rowid, word in items:
+                found = matches[word]
+                if found is None:
+                    item = outcomes.record(video_id, "not_found", word)
+                    if item is not None:
+                        results.append(item)
+                else:
+                    results.append((UPDATE_FOUND_SQL, (*found, "en", now_iso, rowid)))
+
+        t0 = clock()
+        with BatchWriter(conn, flush_rows=500, flush_secs=3600, verbose=False) as writer:
+            for sql, params in results:
+                writer.add(sql, params)
+        times["write"] = clock() - t0
+        conn.close()
+        self.found = sum(1 for sql, _ in results if sql is UPDATE_FOUND_SQL)
+        return times
+
+
+# ─── Сравнение с базовой линией ───────────────────────────────
+
+def _key(result: dict) -> str:
+    return f"{result['words']}/{result['style']}"
+
+
+def compare(results: list[dict], baseline: dict, tolerance: float,
+            min_seconds: float) -> list[str]:
+    """Стадии, ставшие медленнее базовой линии больше чем на tolerance."""
+    base = {_key(r): r["stages"] for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        old = base.get(_key(r))
+        if old is None:
+            continue
+        for stage, sec in r["stages"].items():
+            ref = old.get(stage)
+            if ref is None or max(sec, ref) < min_seconds:
+                continue  # слишком короткие стадии — шум таймера
+            if sec > ref * (1 + tolerance):
+                regressions.append(f"{_key(r)} {stage}: {ref * 1e3:.1f} → {sec * 1e3:.1f} мс "
+                                   f"(+{(sec / ref - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Бенчмарк стадий parse/clean/match/write без сети")
+    p.add_argument("--sizes",   default="3000", help="Размеры таблицы words через запятую")
+    p.add_argument("--styles",  default="auto,manual", help="auto, manual или оба")
+    p.add_argument("--videos",  type=int, default=600,
+                   help="Максимум разных видео (≈5 слов на видео, как в vocab.db)")
+    p.add_argument("--events",  type=int, default=300, help="Событий json3 на транскрипт")
+    p.add_argument("--repeat",  type=int, default=3, help="Прогонов; берётся лучший по стадии")
+    p.add_argument("--seed",    type=int, default=42)
+    p.add_argument("--json",    default=None, metavar="PATH",
+                   help="Записать результаты в JSON ('-' — в stdout)")
+    p.add_argument("--baseline", default=None, metavar="PATH",
+                   help="Сравнить с базовой линией и вернуть код 1 при регрессии")
+    p.add_argument("--save-baseline", default=None, metavar="PATH",
+                   help="Сохранить результаты как базовую линию")
+    p.add_argument("--tolerance", type=float, default=0.25,
+                   help="Допустимое замедление стадии (0.25 = +25%%)")
+    p.add_argument("--min-ms", type=float, default=5.0,
+                   help="Стадии короче этого не проверяются на регрессию")
+    args = p.parse_args()
+
+    sizes  = [int(s) for s in args.sizes.split(",") if s.strip()]
+    styles = [s.strip() for s in args.styles.split(",") if s.strip() in STYLES]
+    log    = sys.stderr if args.json == "-" else sys.stdout
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_words in sizes:
+            for style in styles:
+                t0 = time.perf_counter()
+                work = Workload(n_words, style, args.videos, args.events, args.seed, tmp)
+                gen  = time.perf_counter() - t0
+                best = dict.fromkeys(STAGES, float("inf"))
+                for _ in range(max(1, args.repeat)):
+                    for stage, sec in work.run().items():
+                        best[stage] = min(best[stage], sec)
+                total = sum(best.values())
+                results.append({"words": n_words, "style": style,
+                                "videos": len(work.payloads), "found": work.found,
+                                "stages": {s: round(v, 6) for s, v in best.items()},
+                                "total": round(total, 6)})
+
+                print(f"🧪 {n_words} слов / {len(work.payloads)} видео / {style} "
+                      f"(генерация {gen:.1f}с, найдено {work.found})", file=log)
+                for stage in STAGES:
+                    sec = best[stage]
+                    print(f"  {stage:<7} {sec * 1e3:9.1f} мс  {sec / n_words * 1e6:7.1f} мкс/слово",
+                          file=log)
+                print(f"  {'всего':<7} {total * 1e3:9.1f} мс  "
+                      f"{n_words / total:9.0f} слов/с", file=log)
+
+    report = {
+        "meta": {"createdAt": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                 "python": platform.python_version(), "platform": platform.platform(),
+                 "sqlite": sqlite3.sqlite_version, "seed": args.seed,
+                 "events": args.events, "videos": args.videos, "repeat": args.repeat},
+        "results": results,
+    }
+    if args.json == "-":
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 Базовая линия сохранена: {args.save_baseline}", file=log)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.min_ms / 1000)
+        if regressions:
+            print(f"❌ Регрессии (допуск +{args.tolerance * 100:.0f}%):", file=log)
+            for line in regressions:
+                print(f"  {line}", file=log)
+            raise SystemExit(1)
+        print(f"✅ Регрессий нет (допуск +{args.tolerance * 100:.0f}%)", file=log)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+caption_catalog.py
+------------------
+Каталог дорожек субтитров по videoId: какие языки есть, ручные или
+автоматические, в каких форматах и ссылки на нужные языки со сроком жизни.
+
+fetch_chunks раньше на каждое слово вызывал полный extract_info() (весь
+словарь форматов и метаданных видео) только ради ссылки на json3. Теперь
+extract_info() нужен один раз на видео: из ответа берётся компактная
+запись каталога, сам ответ сразу отпускается, а запись переиспользуется,
+пока не истекла ссылка (параметр expire в URL YouTube).
+
+  entry = catalog.lookup(video_id)
+  if entry is None:
+      entry = catalog.put(catalog_entry(video_id, session.extract_info(url), langs))
+  url = entry.url("en")
+
+Хранится в caption_catalog.db в папке кеша субтитров; общий для потоков.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+from urllib.parse import parse_qs, urlparse
+
+from metrics import METRICS
+
+FILENAME       = "caption_catalog.db"
+SUBS_EXTS      = ("json3", "srv3")   # в порядке предпочтения
+DEFAULT_TTL    = 6 * 3600            # если в ссылке нет expire
+EXPIRY_MARGIN  = 300                 # не отдавать ссылку, которая вот-вот истечёт
+KINDS          = {"subtitles": "manual", "automatic_captions": "auto"}
+
+SCHEMA = """
+    PRAGMA journal_mode = WAL;
+    PRAGMA busy_timeout = 5000;
+
+    CREATE TABLE IF NOT EXISTS caption_tracks (
+        videoId   TEXT PRIMARY KEY,
+        entry     TEXT NOT NULL,
+        expiresAt REAL NOT NULL,
+        updatedAt REAL NOT NULL
+    ) WITHOUT ROWID;
+"""
+
+
+@dataclass
+class CaptionTrack:
+    lang: str
+    kind: str   # manual | auto
+    ext:  str
+    url:  str
+
+
+@dataclass
+class CatalogEntry:
+    video_id:   str
+    languages:  dict[str, dict[str, list[str]]]   # lang → kind → форматы
+    tracks:     list[CaptionTrack] = field(default_factory=list)
+    expires_at: float = 0.0
+    # Языки, для которых ссылки собраны: если среди них язык есть, а url() —
+    # None, то json3/srv3 у видео нет, и повторный extract_info() не поможет
+    resolved:   list[str] = field(default_factory=list)
+
+    def has(self, lang: str) -> bool:
+        return lang in self.languages
+
+    def track(self, lang: str) -> Optional[CaptionTrack]:
+        """Дорожка json3/srv3: ручные раньше автоматических, как в yt-dlp."""
+        for kind in ("manual", "auto"):
+            for ext in SUBS_EXTS:
+                for t in self.tracks:
+                    if t.lang == lang and t.kind == kind and t.ext == ext:
+                        return t
+        return None
+
+    def url(self, lang: str) -> Optional[str]:
+        track = self.track(lang)
+        return track.url if track is not None else None
+
+    def to_json(self) -> str:
+        return json.dumps({"languages": self.languages,
+                           "tracks": [[t.lang, t.kind, t.ext, t.url] for t in self.tracks],
+                           "resolved": self.resolved},
+                          ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, video_id: str, raw: str, expires_at: float) -> "CatalogEntry":
+        data = json.loads(raw)
+        return cls(video_id, data["languages"],
+                   [CaptionTrack(*t) for t in data["tracks"]], expires_at,
+                   data.get("resolved", []))
+
+
+def url_expiry(url: str) -> Optional[float]:
+    """Время истечения из параметра expire ссылки YouTube."""
+    try:
+        return float(parse_qs(urlparse(url).query)["expire"][0])
+    except (KeyError, IndexError, ValueError):
+        return None
+
+
+def catalog_entry(video_id: str, info: dict, langs: Iterable[str]) -> CatalogEntry:
+    """
+    Запись каталога из ответа extract_info(): все языки и форматы, ссылки —
+    только json3/srv3 для langs (автопереводов сотни, их ссылки не нужны).
+    """
+    langs  = set(langs)
+    expiry = time.time() + DEFAULT_TTL
+    languages: dict[str, dict[str, list[str]]] = {}
+    tracks: list[CaptionTrack] = []
+    for key, kind in KINDS.items():
+        for lang, formats in (info.get(key) or {}).items():
+            languages.setdefault(lang, {})[kind] = [f.get("ext", "") for f in formats]
+            if lang not in langs:
+                continue
+            for fmt in formats:
+                if fmt.get("ext") in SUBS_EXTS and fmt.get("url"):
+                    tracks.append(CaptionTrack(lang, kind, fmt["ext"], fmt["url"]))
+                    expires = url_expiry(fmt["url"])
+                    if expires is not None:
+                        expiry = min(expiry, expires)
+    return CatalogEntry(video_id, languages, tracks, expiry, sorted(langs))
+
+
+class CaptionCatalog:
+    """Записи каталога в памяти и в SQLite; lookup() отдаёт только неистёкшие."""
+
+    def __init__(self, path: str, langs: Iterable[str] = ("en",)):
+        self.path  = path
+        self.langs = tuple(langs)
+        self._lock = threading.Lock()
+        self._mem: dict[str, CatalogEntry] = {}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+
+    def lookup(self, video_id: str, lang: Optional[str] = None) -> Optional[CatalogEntry]:
+        """
+        Действующая запись или None (нет, ссылки истекают, или язык lang
+        в записи есть, а ссылки на него не собирали). Язык без json3/srv3
+        отдаётся из каталога: url() вернёт None, и загрузка сразу скажет
+        "нет субтитров".
+        """
+        with self._lock:
+            entry = self._mem.get(video_id)
+            if entry is None:
+                row = self.conn.execute("SELECT entry, expiresAt FROM caption_tracks "
+                                        "WHERE videoId=?", (video_id,)).fetchone()
+                if row is not None:
+                    entry = self._mem[video_id] = CatalogEntry.from_json(video_id, *row)
+        if (entry is None or entry.expires_at - EXPIRY_MARGIN < time.time()
+                or (lang and entry.has(lang) and lang not in entry.resolved)):
+            METRICS.inc("catalog_miss")
+            return None
+        METRICS.inc("catalog_hit")
+        return entry
+
+    def put(self, entry: CatalogEntry) -> CatalogEntry:
+        with self._lock, self.conn:
+            self._mem[entry.video_id] = entry
+            self.conn.execute("""
+                INSERT OR REPLACE INTO caption_tracks (videoId, entry, expiresAt, updatedAt)
+                VALUES (?, ?, ?, ?)
+            """, (entry.video_id, entry.to_json(), entry.expires_at, time.time()))
+        return entry
+
+    def invalidate(self, video_id: str) -> None:
+        """Ссылка из каталога не сработала — в следующий раз снова extract_info()."""
+        with self._lock, self.conn:
+            self._mem.pop(video_id, None)
+            self.conn.execute("DELETE FROM caption_tracks WHERE videoId=?", (video_id,))
+
+    def purge(self) -> int:
+        with self._lock, self.conn:
+            cur = self.conn.execute("DELETE FROM caption_tracks WHERE expiresAt < ?",
+                                    (time.time(),))
+        return cur.rowcount
+
+    def close(self) -> None:
+        self.conn.close()
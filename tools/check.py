@@ -1,6 +1,5 @@
 #!/usr/bin/env python3
 import argparse
-import sqlite3
 import time
 import random
 import re
@@ -9,6 +8,19 @@ from dataclasses import dataclass
 from typing import Optional, List
 from yt_dlp import YoutubeDL
 
+from outcomes import OutcomeStore, add_outcome_args, outcomes_from_args
+from search_cache import (SearchCache, add_search_cache_args, search_cache_from_args,
+                          search_entry, walk_candidates)
+from terms import dedupe_summary, fan_out, group_terms, resolved_by_key
+from transcript_cache import TranscriptCache, add_cache_args, cache_from_args
+from vocab_store import connect
+from word_changes import add_change_args, changes_from_args
+from word_index import WordIndex, resolve_from_index
+from ydl_session import YdlSession
+
+# Форматы источников, под которыми инструменты кладут субтитры в кеш
+CACHED_SUBS_FORMATS = ("json3", "yta")
+
 @dataclass
 class MatchResult:
     word: str
@@ -18,8 +30,12 @@ class MatchResult:
     subtitle_text: str
 
 class YouTubeFinder:
-    def __init__(self, cookies_file: str = None):
+    def __init__(self, cookies_file: str = None, cache: Optional[TranscriptCache] = None,
+                 outcomes: Optional[OutcomeStore] = None, searches: Optional[SearchCache] = None):
         self.cookies_file = cookies_file
+        self.cache = cache
+        self.outcomes = outcomes
+        self.searches = searches
         self.base_opts = {
             "quiet": True,
             "no_warnings": True,
@@ -27,33 +43,59 @@ class YouTubeFinder:
             "cookiefile": cookies_file if cookies_file and os.path.exists(cookies_file) else None,
             "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
         }
+        # Два долгоживущих экземпляра на весь запуск: поиск и проверка субтитров
+        self.search = YdlSession({**self.base_opts, "extract_flat": True}, YoutubeDL)
+        self.probe = YdlSession({**self.base_opts, "writesubtitles": True,
+                                 "writeautomaticsub": True, "subtitleslangs": ["en"]}, YoutubeDL)
+
+    def close(self):
+        self.search.close()
+        self.probe.close()
+
+    def _known_no_subs(self, vid_id: str) -> bool:
+        # Уже проверяли: английских субтитров нет — не тратим запрос
+        return self.outcomes is not None and self.outcomes.blocked(vid_id) == "no_subs"
+
+    def _search(self, query: str, n: int) -> list[dict]:
+        search_res = self.search.extract_info(f"ytsearch{n}:{query}", download=False)
+        return [search_entry(e) for e in search_res.get("entries", []) if e.get("id")]
 
     def find(self, word: str) -> Optional[MatchResult]:
-        search_opts = {**self.base_opts, "extract_flat": True}
         query = f'"{word}" english examples'
-        
-        try:
-            with YoutubeDL(search_opts) as ydl:
-                # Ищем 3 варианта, чтобы был выбор
-                search_res = ydl.extract_info(f"ytsearch3:{query}", download=False)
-                vids = [e["id"] for e in search_res.get("entries", []) if e.get("id")]
-        except Exception as e:
-            if "429" in str(e):
-                print("\n🔥 YouTube выдал 429 (Too Many Requests). Спим 5 минут...")
-                time.sleep(300)
-            return None
-
-        for vid_id in vids:
+        # Сначала кандидаты прошлых запусков, новый поиск — только если все отсеяны.
+        # Ищем 3 варианта, чтобы был выбор
+        candidates = walk_candidates(self.searches, query, 3,
+                                     lambda n: self._search(query, n), self._known_no_subs)
+
+        while True:
+            try:
+                entry = next(candidates, None)
+            except Exception as e:
+                if "429" in str(e):
+                    print("\n🔥 YouTube выдал 429 (Too Many Requests). Спим 5 минут...")
+                    time.sleep(300)
+                return None
+            if entry is None:
+                return None
+
+            vid_id = entry["id"]
             print(f"    → {vid_id}...", end=" ", flush=True)
+
+            # Субтитры этого видео уже лежат в кеше — проверять их по сети незачем
+            if self.cache is not None and any(
+                    self.cache.contains(vid_id, "en", fmt) for fmt in CACHED_SUBS_FORMATS):
+                print("💾 ✅")
+                return MatchResult(word, vid_id, 15.0, 20.0, f"Example sentence with {word}")
+
             try:
-                opts = {**self.base_opts, "writesubtitles": True, "writeautomaticsub": True, "subtitleslangs": ["en"]}
-                with YoutubeDL(opts) as ydl:
-                    info = ydl.extract_info(f"https://www.youtube.com/watch?v={vid_id}", download=False)
+                info = self.probe.extract_info(f"https://www.youtube.com/watch?v={vid_id}", download=False)
                 
                 # Простая проверка: есть ли хоть какие-то английские субтитры
                 subs = info.get("requested_subtitles") or info.get("subtitles") or info.get("automatic_captions")
                 if not subs or "en" not in subs:
                     print("нет субтитров")
+                    if self.outcomes is not None:
+                        self.outcomes.save(vid_id, "no_subs")
                     continue
 
                 print("✅")
@@ -66,7 +108,6 @@ class YouTubeFinder:
                     print("🔥 429! Отдых 2 мин...")
                     time.sleep(120)
                 continue
-        return None
 
 def main():
     parser = argparse.ArgumentParser()
@@ -74,6 +115,13 @@ def main():
     parser.add_argument("--limit", type=int, default=10)
     parser.add_argument("--delay-min", type=float, default=20.0)
     parser.add_argument("--delay-max", type=float, default=40.0)
+    parser.add_argument("--index-first", action="store_true",
+                        help="Сначала искать слово в уже скачанных транскриптах (без поиска в YouTube)")
+    parser.add_argument("--max-duration", type=float, default=15.0)
+    add_cache_args(parser)
+    add_outcome_args(parser)
+    add_search_cache_args(parser)
+    add_change_args(parser)
     args = parser.parse_args()
 
     print("=" * 60)
@@ -81,37 +129,74 @@ def main():
     print("=" * 60)
 
     try:
-        conn = sqlite3.connect(args.db)
+        conn = connect(args.db)
         cur = conn.cursor()
-
-        # Проверка структуры БД
-        cur.execute("PRAGMA table_info(words)")
-        cols = {row[1] for row in cur.fetchall()}
-        if "videoId" not in cols: cur.execute("ALTER TABLE words ADD COLUMN videoId TEXT DEFAULT ''")
-        if "startTime" not in cols: cur.execute("ALTER TABLE words ADD COLUMN startTime REAL DEFAULT 0")
-        conn.commit()
-
-        cur.execute("SELECT original FROM words WHERE (videoId='' OR videoId IS NULL) LIMIT ?", (args.limit,))
-        words = [r[0] for r in cur.fetchall()]
-
-        if not words:
+        changes = changes_from_args(conn, args, "check")
+        changed, changed_params = changes.sql_filter()
+
+        cur.execute(f"SELECT rowid, original FROM words WHERE (videoId='' OR videoId IS NULL) AND {changed} "
+                    f"{changes.sql_order()} LIMIT ?",
+                    (*changed_params, args.limit))
+        rows = cur.fetchall()
+        changes.selected(rows, args.limit)
+
+        # Уникальные термины ("Apple" и "apple " — одно слово); то, что уже найдено
+        # для другого написания, копируется без поиска
+        terms = group_terms(rows)
+        resolved = resolved_by_key(cur, ("videoId", "startTime", "endTime", "subtitleText"),
+                                   "videoId != '' AND videoId IS NOT NULL")
+        borrowed = [t for t in terms if t.key in resolved]
+        for term in borrowed:
+            fan_out(conn, "UPDATE words SET videoId=?, startTime=?, endTime=?, subtitleText=? WHERE rowid=?",
+                    resolved[term.key], term.rowids)
+        terms = [t for t in terms if t.key not in resolved]
+        print(dedupe_summary(len(rows), len(terms) + len(borrowed), len(borrowed)))
+
+        if not terms:
+            changes.commit()
             print("✨ Все слова заполнены!")
             return
 
-        finder = YouTubeFinder(cookies_file="cookies.txt")
+        cache  = cache_from_args(args)
+        outcomes = outcomes_from_args(conn, args)
+        searches = search_cache_from_args(args)
+        if searches is not None:
+            searches.purge()
+        finder = YouTubeFinder(cookies_file="cookies.txt", cache=cache, outcomes=outcomes,
+                               searches=searches)
+
+        index = None
+        if args.index_first and cache is not None:
+            index = WordIndex.for_cache(cache)
+            index.sync(cache)
+
+        for i, term in enumerate(terms, 1):
+            word = term.original
+            print(f"[{i}/{len(terms)}] 🔍 '{word}'")
+            local = resolve_from_index(index, cache, word, args.max_duration) if index else None
+            if local:
+                video_id, start, end, sentence = local
+                print(f"    📚 из индекса: {video_id} [{start}s–{end}s]")
+                fan_out(conn, "UPDATE words SET videoId=?, startTime=?, endTime=?, subtitleText=? WHERE rowid=?",
+                        (video_id, start, end, sentence), term.rowids)
+                continue
 
-        for i, word in enumerate(words, 1):
-            print(f"[{i}/{len(words)}] 🔍 '{word}'")
             res = finder.find(word)
             if res:
-                cur.execute("UPDATE words SET videoId=?, startTime=? WHERE original=?", (res.video_id, res.start_time, word))
-                conn.commit()
+                fan_out(conn, "UPDATE words SET videoId=?, startTime=? WHERE rowid=?",
+                        (res.video_id, res.start_time), term.rowids)
             
-            if i < len(words):
+            if i < len(terms):
                 wait = random.uniform(args.delay_min, args.delay_max)
                 print(f"    ⏳ пауза {wait:.1f}с...")
                 time.sleep(wait)
 
+        finder.close()
+        changes.commit()
+        print(outcomes.summary())
+        if searches is not None:
+            print(searches.summary())
+            searches.close()
         conn.close()
     except Exception as e:
         print(f"❌ Ошибка: {e}")
@@ -0,0 +1,290 @@
+"""
+clip_export.py
+--------------
+Статический экспорт словаря и клипов для PWA: шарды JSON с хешем
+содержимого в имени, рядом сжатые копии .gz / .br и маленький index.json.
+
+GET /api/words на каждой загрузке сериализует все колонки всех строк, а
+sw.js ответы /api/ не кеширует. Клиент вместо этого читает index.json и
+докачивает лишь шарды с новым хешем: имя шарда меняется только вместе с
+содержимым, поэтому sw.js кеширует их навсегда. Шарды годятся, пока
+revision в index.json совпадает с GET /api/words/revision (ревизия words,
+vocab_store), иначе клиент берёт /api/words. После /api/sync сервер сам
+перезапускает экспорт, если папка clips/ уже есть.
+
+Шарды отдаёт маршрут /clips/:file в server.js: он выбирает готовую копию
+.br / .gz по Accept-Encoding, не сжимая на лету.
+
+  python3 tools/clip_export.py --db ./vocab.db --out ./clips
+  python3 tools/clip_export.py --split tag
+
+  clips/index.json                   {"split", "revision", "words",
+                                      "shards": [{key, label, file, hash, ...}],
+                                      "previous": [файлы прошлого поколения]}
+  clips/level-0.3f9c2a1b7e4d.json    слова шарда (те же поля, что у /api/words)
+  clips/level-0.3f9c2a1b7e4d.json.gz
+  clips/level-0.3f9c2a1b7e4d.json.br  (если установлен brotli)
+
+Шарды делятся по уровню (--split level) или по первому тегу слова
+(--split tag), так что каждое слово лежит ровно в одном шарде. Повторный
+экспорт пишет только шарды, которых ещё нет на диске, и index.json — только
+если он изменился. Шарды прошлого поколения (previous) живут ещё один
+экспорт: клиент со старым index.json успеет их докачать. Удаляются шарды,
+на которые не ссылаются ни shards, ни previous.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:   # без brotli — только .gz
+    brotli = None
+
+from vocab_store import connect, iter_rows, words_revision
+
+INDEX_FILENAME = "index.json"
+INDEX_FORMAT   = 1
+HASH_LEN       = 12
+SPLITS         = ("level", "tag")
+UNTAGGED       = "untagged"
+
+# Поля слова в шарде — как у GET /api/words в server.js
+EXPORT_SQL = """
+    SELECT id, original, translate, example, exampleTranslate, level, nextReview,
+           forgetStep, tags, videoId, startTime, endTime, subtitleText
+    FROM   words
+    WHERE  id IS NOT NULL
+    ORDER  BY id, original, rowid
+"""
+
+# Файлы, которые экспорт считает своими (index.json и чужие файлы не трогает)
+SHARD_FILE_RE = re.compile(rf"^[a-z]+-[0-9a-z_-]+\.[0-9a-f]{{{HASH_LEN}}}\.json(\.gz|\.br)?$")
+
+
+@dataclass
+class Shard:
+    key:   str          # часть имени файла: level-2, tag-<хеш тега>
+    label: str          # что показать в интерфейсе: уровень или сам тег
+    words: list[dict] = field(default_factory=list)
+
+    def payload(self) -> bytes:
+        """Канонический JSON: одинаковые слова — одинаковые байты и хеш."""
+        return json.dumps(self.words, ensure_ascii=False, sort_keys=True,
+                          separators=(",", ":")).encode("utf-8")
+
+
+# ─── Слова ────────────────────────────────────────────────────
+
+def _tags(raw) -> list[str]:
+    try:
+        tags = json.loads(raw or "[]")
+    except ValueError:
+        return []
+    if not isinstance(tags, list):
+        return []
+    return list(dict.fromkeys(str(t).strip() for t in tags if str(t or "").strip()))
+
+
+def export_word(row: tuple) -> dict:
+    """Строка words → слово, приведённое так же, как в /api/words."""
+    (word_id, original, translate, example, example_tr, level, next_review,
+     forget_step, tags, video_id, start, end, subtitle) = row
+    return {
+        "id":               word_id,
+        "original":         original or "",
+        "translate":        translate or "",
+        "example":          example or "",
+        "exampleTranslate": example_tr or "",
+        "level":            int(level or 0),
+        "nextReview":       next_review or 0,
+        "forgetStep":       int(forget_step or 0),
+        "tags":             _tags(tags),
+        "videoId":          video_id or "",
+        "startTime":        float(start or 0),
+        "endTime":          float(end or 0),
+        "subtitleText":     subtitle or "",
+    }
+
+
+def shard_key(word: dict, split: str) -> tuple[str, str]:
+    """(ключ для имени файла, подпись) шарда слова."""
+    if split == "level":
+        return f"level-{word['level']}", str(word["level"])
+    tag = word["tags"][0] if word["tags"] else ""
+    if not tag:
+        return f"tag-{UNTAGGED}", ""
+    # Теги бывают кириллицей и с пробелами — в имени файла только хеш тега
+    return f"tag-{hashlib.sha1(tag.encode('utf-8')).hexdigest()[:10]}", tag
+
+
+def build_shards(conn, split: str) -> list[Shard]:
+    shards: dict[str, Shard] = {}
+    for row in iter_rows(conn, EXPORT_SQL):
+        word = export_word(row)
+        key, label = shard_key(word, split)
+        shards.setdefault(key, Shard(key, label)).words.append(word)
+    return [shards[k] for k in sorted(shards)]
+
+
+def snapshot(conn, split: str) -> tuple[int, list[Shard]]:
+    """Ревизия words и шарды из одного снимка БД: сервер может писать параллельно."""
+    conn.execute("BEGIN")
+    try:
+        return words_revision(conn), build_shards(conn, split)
+    finally:
+        conn.rollback()
+
+
+# ─── Файлы ────────────────────────────────────────────────────
+
+def _write_atomic(path: str, data: bytes) -> None:
+    """Через временный файл: сервер не отдаст недописанный шард."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _gzip(data: bytes) -> bytes:
+    return gzip.compress(data, compresslevel=9, mtime=0)   # без mtime — детерминированно
+
+
+def _brotli(data: bytes) -> bytes:
+    return brotli.compress(data, quality=11)
+
+
+# Расширение сжатой копии → компрессор
+COMPRESSORS = {".gz": _gzip}
+if brotli is not None:
+    COMPRESSORS[".br"] = _brotli
+
+
+def compressed(data: bytes) -> dict[str, bytes]:
+    """Сжатые копии: расширение → байты."""
+    return {ext: compress(data) for ext, compress in COMPRESSORS.items()}
+
+
+@dataclass
+class ExportResult:
+    index:   dict
+    written: int = 0
+    kept:    int = 0
+    removed: int = 0
+
+
+def write_shard(out_dir: str, shard: Shard, result: ExportResult) -> dict:
+    """Пишет шард и его сжатые копии, если их ещё нет; возвращает запись индекса."""
+    data   = shard.payload()
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LEN]
+    name   = f"{shard.key}.{digest}.json"
+    entry  = {"key": shard.key, "label": shard.label, "file": name, "hash": digest,
+              "words": len(shard.words), "bytes": len(data)}
+
+    path  = os.path.join(out_dir, name)
+    fresh = not os.path.exists(path)
+    for ext, compress in COMPRESSORS.items():
+        # Имя — хеш содержимого: готовую копию не пережимаем (gzip-9 и brotli-11 дорогие)
+        if not fresh and os.path.exists(path + ext):
+            entry[ext[1:]] = os.path.getsize(path + ext)
+            continue
+        body = compress(data)
+        entry[ext[1:]] = len(body)
+        _write_atomic(path + ext, body)
+    if fresh:
+        _write_atomic(path, data)
+        result.written += 1
+    else:
+        result.kept += 1
+    return entry
+
+
+def remove_stale(out_dir: str, keep: set[str]) -> int:
+    removed = 0
+    for name in os.listdir(out_dir):
+        base = name[:-3] if name.endswith((".gz", ".br")) else name
+        if SHARD_FILE_RE.match(name) and base not in keep:
+            os.remove(os.path.join(out_dir, name))
+            removed += 1
+    return removed
+
+
+def _read_index(path: str) -> tuple[Optional[bytes], dict]:
+    if not os.path.exists(path):
+        return None, {}
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        index = json.loads(data)
+    except ValueError:
+        return data, {}
+    return data, index if isinstance(index, dict) else {}
+
+
+def export(conn, out_dir: str, split: str = "level") -> ExportResult:
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, INDEX_FILENAME)
+    old, old_index = _read_index(path)
+
+    revision, shards = snapshot(conn, split)
+    index  = {"format": INDEX_FORMAT, "split": split, "revision": revision,
+              "words": sum(len(s.words) for s in shards), "shards": []}
+    result = ExportResult(index)
+    for shard in shards:
+        index["shards"].append(write_shard(out_dir, shard, result))
+
+    # Новое поколение — прошлое сохраняется до следующего изменения набора шардов
+    files     = {s["file"] for s in index["shards"]}
+    old_files = {s.get("file") for s in old_index.get("shards", []) if isinstance(s, dict)}
+    if old_files and old_files != files:
+        index["previous"] = sorted(old_files - files)
+    else:
+        index["previous"] = [f for f in old_index.get("previous", []) if f not in files]
+
+    # Индекс — после шардов: клиент не увидит ссылку на ещё не записанный файл
+    data = json.dumps(index, ensure_ascii=False, indent=1).encode("utf-8")
+    if data != old:
+        _write_atomic(path, data)
+        for ext, body in compressed(data).items():
+            _write_atomic(path + ext, body)
+
+    result.removed = remove_stale(out_dir, files | set(index["previous"]))
+    return result
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Экспорт словаря и клипов в статические шарды для PWA")
+    p.add_argument("--db", default="./vocab.db")
+    p.add_argument("--out", default="./clips",
+                   help="Папка шардов; сервер отдаёт её как /clips/ (default: ./clips)")
+    p.add_argument("--split", choices=SPLITS, default="level",
+                   help="Деление на шарды: по уровню или по первому тегу (default: level)")
+    args = p.parse_args()
+
+    conn   = connect(args.db)
+    result = export(conn, args.out, args.split)
+    conn.close()
+
+    index = result.index
+    print(f"📦 Экспорт: {index['words']} слов в {len(index['shards'])} шардах "
+          f"({args.split}) → {args.out}")
+    for s in index["shards"]:
+        br = f", br {s['br'] / 1024:.1f} КБ" if "br" in s else ""
+        print(f"  {s['file']}: {s['words']} слов, {s['bytes'] / 1024:.1f} КБ "
+              f"(gz {s['gz'] / 1024:.1f} КБ{br})")
+    if brotli is None:
+        print("ℹ️  brotli не установлен — только .gz (pip install brotli)")
+    print(f"🏁 Записано шардов: {result.written}, без изменений: {result.kept}, "
+          f"удалено файлов: {result.removed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+clip_ranker.py
+--------------
+Лучший клип для слова среди ВСЕХ его вхождений во всех уже скачанных
+транскриптах — без сети.
+
+find_sentence() берёт первое вхождение в одном видео, check.py — первый
+результат поиска с английскими субтитрами. Здесь кандидаты собираются по
+индексу слов (word_index.db рядом с кешем), каждый получает оценку:
+
+  duration  длина клипа близка к IDEAL_DURATION
+  complete  клип начинается с заглавной и заканчивается концом предложения
+  position  слово ближе к середине клипа
+  manual    ручные субтитры лучше автоматических (вид дорожки из кеша)
+
+Оценка считается векторно по массивам кандидатов (numpy, если установлен,
+иначе тот же расчёт циклом). Лучший клип пишется в words, top-k — в
+таблицу clip_candidates, так что перевыбор клипа потом не требует сети.
+
+  python3 clip_ranker.py --db ./vocab.db --top-k 5
+  python3 clip_ranker.py --word "take off" --dry-run
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+try:
+    import numpy as np
+except ImportError:   # без numpy — тот же расчёт в чистом Python
+    np = None
+
+from db_writer import add_writer_args, writer_from_args
+from inflections import forms_pattern, word_forms
+from metrics import METRICS, add_metrics_args, metrics_from_args, profiled
+from refine_segments import EMPTY_VALUES, STAMP_PARAMS_SQL, params_signature
+from transcript_cache import TranscriptCache, add_cache_args, cache_from_args
+from transcripts import Chunk, Transcript
+from vocab_store import connect
+from word_changes import AllWords, add_change_args, changes_from_args
+from word_index import WordIndex
+
+WEIGHTS = {"duration": 0.35, "complete": 0.30, "position": 0.20, "manual": 0.15}
+IDEAL_DURATION = 8.0
+DEFAULT_TOP_K  = 5
+_LOOKUP_LIMIT  = 100_000
+
+# DELETE идёт в пачке раньше INSERT слова (BatchWriter сохраняет порядок add);
+# удаляются только лишние ранги, остальные перезаписывает INSERT OR REPLACE
+DELETE_CANDIDATES_SQL = "DELETE FROM clip_candidates WHERE wordId=? AND rank>=?"
+INSERT_CANDIDATE_SQL  = """
+    INSERT OR REPLACE INTO clip_candidates
+        (wordId, rank, videoId, fmt, startTime, endTime, subtitleText, score, rankedAt)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+UPDATE_BEST_SQL = """
+    UPDATE words
+    SET videoId=?, startTime=?, endTime=?, subtitleText=?, subtitleLang=?, subtitleUpdatedAt=?
+    WHERE rowid=?
+"""
+
+
+@dataclass
+class Candidate:
+    video_id:  str
+    fmt:       str
+    start:     float
+    end:       float
+    sentence:  str
+    word_time: float   # время начала самого слова
+    complete:  float   # 0 / 0.5 / 1 — целостность предложения
+    manual:    bool
+
+
+# ─── Кандидаты ────────────────────────────────────────────────
+
+def is_manual(fmt: str, chunks: list[Chunk], kind: Optional[str] = None) -> bool:
+    """
+    Ручные ли субтитры: по виду дорожки, записанному в кеш провайдером. У
+    старых записей без kind угадываем только для json3 — там автосубтитры
+    приходят с пословными метками; у yta меток нет ни у каких.
+    """
+    if kind is not None:
+        return kind == "manual"
+    return fmt == "json3" and sum(1 for c in chunks if c.marks) * 2 < len(chunks)
+
+
+def _completeness(sentence: str) -> float:
+    s = sentence.strip()
+    return 0.5 * s[:1].isupper() + 0.5 * (s[-1:] in (".", "!", "?", "…"))
+
+
+def occurrences(transcript: Transcript, word: str) -> list[tuple[int, int]]:
+    """Все вхождения слова и его словоформ: (индекс чанка, позиция в тексте чанка)."""
+    hits, seen = [], set()
+    for m in forms_pattern(word).finditer(transcript.text):
+        i = bisect.bisect_right(transcript.offsets, m.start()) - 1
+        if i not in seen:
+            seen.add(i)
+            hits.append((i, m.start() - transcript.offsets[i]))
+    return hits
+
+
+def video_candidates(transcript: Transcript, video_id: str, fmt: str, manual: bool,
+                     word: str, max_duration: float) -> list[Candidate]:
+    result = []
+    for hit, pos in occurrences(transcript, word):
+        start, end, sentence = transcript.clip(hit, max_duration=max_duration)
+        # Время слова — по пословным меткам или интерполяцией внутри чанка
+        word_time = next((t for cs, ce, t, _ in transcript.token_times(hit) if ce > pos),
+                         transcript.starts[hit])
+        result.append(Candidate(video_id, fmt, start, end, sentence, word_time,
+                                _completeness(sentence), manual))
+    return result
+
+
+def videos_for(index: WordIndex, word: str) -> set[tuple[str, str]]:
+    """(videoId, fmt), где по индексу встречается слово или одна из его словоформ."""
+    found = set()
+    for form in word_forms(word):
+        for video_id, fmt, _chunk, _start in index.lookup(form, limit=_LOOKUP_LIMIT):
+            found.add((video_id, fmt))
+    return found
+
+
+def collect(words: list[str], cache: TranscriptCache, index: WordIndex,
+            max_duration: float = 15.0) -> dict[str, list[Candidate]]:
+    """
+    Кандидаты для всех слов сразу: каждый транскрипт читается из кеша и
+    разбирается в Transcript один раз, сколько бы слов в нём ни встречалось.
+    """
+    by_video: dict[tuple[str, str], list[str]] = {}
+    for word in words:
+        for key in videos_for(index, word):
+            by_video.setdefault(key, []).append(word)
+
+    candidates: dict[str, list[Candidate]] = {w: [] for w in words}
+    for (video_id, fmt), video_words in sorted(by_video.items()):
+        track = cache.get_track(video_id, "en", fmt)
+        if track is None or not track[0]:
+            continue
+        chunks, kind = track
+        transcript = Transcript(chunks)
+        manual = is_manual(fmt, chunks, kind)
+        with METRICS.time("match"):
+            for word in video_words:
+                candidates[word] += video_candidates(transcript, video_id, fmt, manual,
+                                                     word, max_duration)
+    return candidates
+
+
+# ─── Оценка ───────────────────────────────────────────────────
+
+def score(cands: list[Candidate], ideal: float = IDEAL_DURATION) -> list[float]:
+    """Взвешенная сумма признаков для каждого кандидата (0..1)."""
+    if not cands:
+        return []
+    if np is not None:
+        start    = np.fromiter((c.start for c in cands), float, len(cands))
+        end      = np.fromiter((c.end for c in cands), float, len(cands))
+        word_t   = np.fromiter((c.word_time for c in cands), float, len(cands))
+        complete = np.fromiter((c.complete for c in cands), float, len(cands))
+        manual   = np.fromiter((c.manual for c in cands), float, len(cands))
+        dur      = np.maximum(end - start, 1e-6)
+        s_dur    = np.clip(1.0 - np.abs(dur - ideal) / ideal, 0.0, 1.0)
+        s_pos    = np.clip(1.0 - 2.0 * np.abs((word_t - start) / dur - 0.5), 0.0, 1.0)
+        total    = (WEIGHTS["duration"] * s_dur + WEIGHTS["complete"] * complete
+                    + WEIGHTS["position"] * s_pos + WEIGHTS["manual"] * manual)
+        return total.tolist()
+
+    result = []
+    for c in cands:
+        dur   = max(c.end - c.start, 1e-6)
+        s_dur = min(max(1.0 - abs(dur - ideal) / ideal, 0.0), 1.0)
+        s_pos = min(max(1.0 - 2.0 * abs((c.word_time - c.start) / dur - 0.5), 0.0), 1.0)
+        result.append(WEIGHTS["duration"] * s_dur + WEIGHTS["complete"] * c.complete
+                      + WEIGHTS["position"] * s_pos + WEIGHTS["manual"] * c.manual)
+    return result
+
+
+def rank(cands: list[Candidate], top_k: int = DEFAULT_TOP_K,
+         ideal: float = IDEAL_DURATION) -> list[tuple[float, Candidate]]:
+    """top_k лучших кандидатов по убыванию оценки; при равенстве — более ранний клип."""
+    if top_k < 1:
+        raise ValueError(f"top_k должен быть не меньше 1: {top_k}")
+    scores = score(cands, ideal)
+    if np is not None and len(cands) > top_k * 4:
+        arr = np.asarray(scores)
+        top = np.argpartition(-arr, top_k - 1)[:top_k]
+        order = sorted(top.tolist(), key=lambda i: (-scores[i], i))
+    else:
+        order = sorted(range(len(cands)), key=lambda i: (-scores[i], i))[:top_k]
+    return [(round(scores[i], 4), cands[i]) for i in order]
+
+
+# ─── БД ───────────────────────────────────────────────────────
+
+def select_words(cur: sqlite3.Cursor, limit: int, all_words: bool = False,
+                 only: Optional[str] = None, changes=None) -> list[tuple[int, float, str]]:
+    """(rowid, id, original) слов для ранжирования."""
+    changes = changes if changes is not None else AllWords()
+    changed, changed_params = changes.sql_filter()
+    order = changes.sql_order()   # --changed-only: ранние изменения первыми
+    if only is not None:
+        cur.execute("SELECT rowid, id, original FROM words WHERE original=? LIMIT ?",
+                    (only, limit))
+    elif all_words:
+        cur.execute(f"""
+            SELECT rowid, id, original FROM words
+            WHERE  length(COALESCE(original,'')) >= 2
+              AND  {changed}
+            {order}
+            LIMIT  ?
+        """, (*changed_params, limit))
+    else:
+        filled = [v for v in EMPTY_VALUES if v is not None]   # NULL — через IS NULL
+        placeholders = ",".join("?" * len(filled))
+        cur.execute(f"""
+            SELECT rowid, id, original FROM words
+            WHERE  length(COALESCE(original,'')) >= 2
+              AND  (subtitleText IS NULL OR TRIM(subtitleText) IN ({placeholders}))
+              AND  {changed}
+            {order}
+            LIMIT  ?
+        """, (*filled, *changed_params, limit))
+    rows = cur.fetchall()
+    changes.selected(rows, limit)
+    return rows
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Выбор лучшего клипа по всем кешированным транскриптам")
+    p.add_argument("--db", default="./vocab.db")
+    p.add_argument("--limit", type=int, default=100_000)
+    p.add_argument("--top-k", type=int, default=DEFAULT_TOP_K,
+                   help=f"Сколько альтернатив хранить (default: {DEFAULT_TOP_K})")
+    p.add_argument("--ideal-duration", type=float, default=IDEAL_DURATION,
+                   help=f"Желаемая длина клипа, с (default: {IDEAL_DURATION:g})")
+    p.add_argument("--max-duration", type=float, default=15.0,
+                   help="Макс. длина фрагмента в секундах (default: 15)")
+    p.add_argument("--all-words", action="store_true",
+                   help="Перевыбрать клипы всех слов, а не только без субтитров")
+    p.add_argument("--word", default=None, help="Только это слово (original)")
+    p.add_argument("--dry-run", action="store_true", help="Только показать, не писать в БД")
+    add_cache_args(p)
+    add_change_args(p)
+    add_writer_args(p)
+    add_metrics_args(p)
+    args = p.parse_args()
+    if args.top_k < 1:
+        p.error("--top-k должен быть не меньше 1")
+    metrics_from_args(args, "clip_ranker")
+
+    cache = cache_from_args(args)
+    if cache is None:
+        print("❌ Ранжирование работает только по кешу субтитров (уберите --no-cache)")
+        return
+    index = WordIndex.for_cache(cache)
+    added, removed = index.sync(cache)
+    videos, tokens = index.stats()
+    print(f"🗂  Индекс: {videos} видео, {tokens} токенов (+{added}, -{removed})")
+    print(f"🧮 Оценка: {'numpy' if np is not None else 'чистый Python'}")
+
+    conn = connect(args.db)
+    cur  = conn.cursor()
+
+    changes = changes_from_args(conn, args, "clip_ranker")
+    rows = select_words(cur, args.limit, args.all_words, args.word, changes)
+    if not rows:
+        if not (args.dry_run or args.word):
+            changes.commit()
+        print("✨ Нет слов для ранжирования.")
+        conn.close()
+        return
+    words = list(dict.fromkeys(original for _rowid, _id, original in rows))
+    print(f"📋 Слов: {len(rows)} (уникальных {len(words)})")
+
+    t0 = time.perf_counter()
+    with profiled(args.profile):
+        candidates = collect(words, cache, index, args.max_duration)
+        with METRICS.time("rank"):
+            ranked = {w: rank(c, args.top_k, args.ideal_duration) for w, c in candidates.items()}
+    total = sum(len(c) for c in candidates.values())
+    print(f"⚖️  Кандидатов: {total} за {time.perf_counter() - t0:.2f}с")
+
+    now, now_iso = time.time(), datetime.now(timezone.utc).isoformat(timespec="seconds")
+    signature = params_signature("clip_ranker", {"ideal_duration": args.ideal_duration,
+                                                 "max_duration": args.max_duration,
+                                                 "weights": WEIGHTS})
+    writer  = writer_from_args(conn, args)
+    picked = 0
+    with writer:
+        for rowid, word_id, word in rows:
+            top = ranked.get(word) or []
+            if not top:
+                METRICS.inc("words_no_candidates")
+                continue
+            picked += 1
+            METRICS.inc("words_ranked")
+            best_score, best = top[0]
+            if args.dry_run or args.word:
+                print(f"🔍 '{word}': {len(candidates[word])} кандидатов")
+                for n, (s, c) in enumerate(top, 1):
+                    print(f"  {n}. {s:.3f}  {c.video_id} [{c.start}s–{c.end}s] "
+                          f"{'ручные' if c.manual else 'авто'}  «{c.sentence[:70]}»")
+            if args.dry_run:
+                continue
+            writer.add(UPDATE_BEST_SQL, (best.video_id, best.start, best.end, best.sentence,
+                                         "en", now_iso, rowid))
+            writer.add(STAMP_PARAMS_SQL, (signature, "clip", now, rowid))
+            if word_id is None:
+                continue
+            writer.add(DELETE_CANDIDATES_SQL, (word_id, len(top)))
+            for n, (s, c) in enumerate(top):
+                writer.add(INSERT_CANDIDATE_SQL, (word_id, n, c.video_id, c.fmt, c.start,
+                                                  c.end, c.sentence, s, now))
+    if not (args.dry_run or args.word):
+        changes.commit()
+
+    print(f"\n🏁 Выбран клип для {picked}/{len(rows)} слов"
+          f"{' (dry-run, БД не изменена)' if args.dry_run else ''}")
+    print(writer.summary())
+    print(cache.summary())
+    print(METRICS.summary())
+    METRICS.close()
+    index.close()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+corpus.py
+---------
+Потоковое чтение архива субтитров: папка (рекурсивно) или tar/tar.gz
+с файлами .json3 / .vtt / .srt, названными по videoId:
+
+  <videoId>.json3            <videoId>.en.vtt
+  Заголовок [<videoId>].en.srt   (имена yt-dlp по умолчанию)
+
+Файлы разбираются по одному (тарбол читается потоком, без распаковки),
+сеть не используется.
+
+  reader = CorpusReader("./subs_archive.tar.gz")
+  for video_id, lang, fmt, chunks in reader:
+      ...
+  print(reader.summary())
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import tarfile
+from typing import Iterator, Optional
+
+from metrics import METRICS
+from transcripts import Chunk, parse_subtitles
+
+CORPUS_FORMATS = ("json3", "vtt", "srt")
+
+_VIDEO_ID  = re.compile(r"^[A-Za-z0-9_-]{11}$")
+_BRACKETED = re.compile(r"\[([A-Za-z0-9_-]{11})\]")
+
+
+def split_name(name: str) -> Optional[tuple[str, str, str]]:
+    """Имя файла → (videoId, lang, fmt) или None, если это не субтитры."""
+    base  = os.path.basename(name)
+    parts = base.split(".")
+    if len(parts) < 2 or parts[-1].lower() not in CORPUS_FORMATS:
+        return None
+    fmt  = parts[-1].lower()
+    lang = parts[-2] if len(parts) >= 3 and 2 <= len(parts[-2]) <= 8 else "en"
+    stem = ".".join(parts[:-2] if len(parts) >= 3 else parts[:-1])
+
+    if _VIDEO_ID.match(stem):
+        return stem, lang, fmt
+    m = _BRACKETED.search(stem)
+    if m:
+        return m.group(1), lang, fmt
+    if len(parts) == 2 and stem:
+        return stem, "en", fmt   # нестандартный id — доверяем имени файла
+    return None
+
+
+class CorpusReader:
+    """Итератор по (videoId, lang, fmt, chunks) из папки или тарбола."""
+
+    def __init__(self, path: str, lang: str = "en"):
+        self.path    = path
+        self.lang    = lang
+        self.files   = 0   # разобрано файлов субтитров
+        self.skipped = 0   # чужой язык / не субтитры
+        self.errors  = 0   # битые файлы
+
+    def __iter__(self) -> Iterator[tuple[str, str, str, list[Chunk]]]:
+        if os.path.isdir(self.path):
+            yield from self._iter_dir()
+        else:
+            yield from self._iter_tar()
+
+    def _parse(self, name: str, read) -> Optional[tuple[str, str, str, list[Chunk]]]:
+        key = split_name(name)
+        if key is None or not key[1].startswith(self.lang):
+            self.skipped += 1
+            return None
+        video_id, lang, fmt = key
+        try:
+            data = read()
+            METRICS.inc("bytes_read", len(data))
+            with METRICS.time("parse"):
+                chunks = parse_subtitles(data.decode("utf-8-sig"), fmt)
+        except (ValueError, KeyError, UnicodeDecodeError) as exc:
+            self.errors += 1
+            print(f"  ⚠️  {name}: {exc}")
+            return None
+        self.files += 1
+        return video_id, lang, fmt, chunks
+
+    def _iter_dir(self):
+        for root, dirs, files in os.walk(self.path):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+
+                def read(path=path) -> bytes:
+                    with open(path, "rb") as f:
+                        return f.read()
+
+                item = self._parse(name, read)
+                if item is not None:
+                    yield item
+
+    def _iter_tar(self):
+        # "r|*" — потоковый режим: архив не распаковывается и не читается целиком
+        with tarfile.open(self.path, "r|*") as tar:
+            for member in tar:
+                if not member.isfile():
+                    continue
+                f = tar.extractfile(member)
+                if f is None:
+                    continue
+                item = self._parse(member.name, f.read)
+                if item is not None:
+                    yield item
+
+    def summary(self) -> str:
+        return (f"📦 Корпус: разобрано файлов {self.files}, пропущено {self.skipped}, "
+                f"ошибок {self.errors}")
@@ -0,0 +1,105 @@
+"""
+db_writer.py
+------------
+Пакетная запись результатов в vocab.db для инструментов в tools/.
+
+Вместо commit после каждого UPDATE результаты копятся в памяти и
+сбрасываются одной транзакцией через executemany каждые N строк или
+T секунд. Подряд идущие строки с одним SQL идут одним executemany, а
+порядок запросов в пачке тот же, что у add(). При выходе из with-блока (в том числе по Ctrl+C) остаток
+дописывается, так что готовая работа не теряется.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import time
+
+from metrics import METRICS
+
+DEFAULT_FLUSH_ROWS = 50
+DEFAULT_FLUSH_SECS = 10.0
+
+
+class BatchWriter:
+    """Копит (sql, params) и пишет их пачками в одной транзакции."""
+
+    def __init__(self, conn: sqlite3.Connection,
+                 flush_rows: int = DEFAULT_FLUSH_ROWS,
+                 flush_secs: float = DEFAULT_FLUSH_SECS,
+                 verbose: bool = True):
+        self.conn       = conn
+        self.flush_rows = max(1, flush_rows)
+        self.flush_secs = flush_secs
+        self.verbose    = verbose
+        self._pending: list[tuple[str, list[tuple]]] = []   # серии одного SQL по порядку
+        self._count     = 0
+        self._last      = time.monotonic()
+        self.rows_written = 0
+        self.latencies: list[float] = []
+
+    def __enter__(self) -> "BatchWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        # Дописываем накопленное даже при KeyboardInterrupt / ошибке
+        self.flush()
+        return False
+
+    def add(self, sql: str, params: tuple) -> None:
+        if self._pending and self._pending[-1][0] == sql:
+            self._pending[-1][1].append(params)
+        else:
+            self._pending.append((sql, [params]))
+        self._count += 1
+        if (self._count >= self.flush_rows
+                or time.monotonic() - self._last >= self.flush_secs):
+            self.flush()
+
+    def add_many(self, sql: str, params: list[tuple]) -> None:
+        for p in params:
+            self.add(sql, p)
+
+    def flush(self) -> int:
+        """Пишет всё накопленное одной транзакцией. Возвращает число строк."""
+        self._last = time.monotonic()
+        if not self._pending:
+            return 0
+
+        pending, count = self._pending, self._count
+        self._pending, self._count = [], 0
+
+        t0 = time.perf_counter()
+        with self.conn:
+            for sql, params in pending:
+                self.conn.executemany(sql, params)
+        elapsed = time.perf_counter() - t0
+
+        self.latencies.append(elapsed)
+        METRICS.observe("db_flush", elapsed)
+        self.rows_written += count
+        if self.verbose:
+            print(f"  💾 записано {count} строк за {elapsed * 1000:.1f} мс")
+        return count
+
+    def summary(self) -> str:
+        if not self.latencies:
+            return "💾 БД: записей не было"
+        lat = sorted(self.latencies)
+        avg = sum(lat) / len(lat)
+        p95 = lat[min(len(lat) - 1, int(len(lat) * 0.95))]
+        return (f"💾 БД: {self.rows_written} строк за {len(lat)} сбросов, "
+                f"задержка сброса ср. {avg * 1000:.1f} мс / p95 {p95 * 1000:.1f} мс / "
+                f"макс. {lat[-1] * 1000:.1f} мс")
+
+
+def add_writer_args(p) -> None:
+    """Общие CLI-флаги частоты сброса в БД."""
+    p.add_argument("--flush-rows", type=int, default=DEFAULT_FLUSH_ROWS,
+                   help=f"Сбрасывать в БД каждые N строк (default: {DEFAULT_FLUSH_ROWS})")
+    p.add_argument("--flush-secs", type=float, default=DEFAULT_FLUSH_SECS,
+                   help=f"...или каждые T секунд (default: {DEFAULT_FLUSH_SECS:g})")
+
+
+def writer_from_args(conn: sqlite3.Connection, args) -> BatchWriter:
+    return BatchWriter(conn, flush_rows=args.flush_rows, flush_secs=args.flush_secs)
@@ -1,28 +1,36 @@
 #!/usr/bin/env python3
-import sqlite3
+import argparse
 import time
 import random
-import json
-import subprocess
-import re
 
-def get_precise_range(v_id, target_word):
+from db_writer import add_writer_args, writer_from_args
+from inflections import forms_pattern
+from metrics import METRICS, add_metrics_args, metrics_from_args, profiled
+from outcomes import add_outcome_args, outcomes_from_args
+from transcript_cache import add_cache_args, cache_from_args
+from transcript_providers import (NoTranscript, add_provider_args, load_transcript,
+                                  provider_from_args)
+from vocab_store import connect
+
+def get_precise_range(v_id, target_word, provider, cache=None, outcomes=None, writer=None):
     try:
-        # Запускаем CLI версию
-        cmd = ["youtube-transcript-api", v_id, "--format", "json"]
-        result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8')
-        
-        if result.returncode != 0:
+        # Субтитры из общего кеша (или от провайдера, в том же процессе)
+        try:
+            transcript = load_transcript(provider, cache, v_id)
+        except NoTranscript:
+            if outcomes is not None:   # исход — в той же пачке BatchWriter
+                outcomes.add_to(writer, v_id, "no_subs")
+            return None
+        except RuntimeError:
             return None
-
-        transcript = json.loads(result.stdout)
         
-        # Регулярка для поиска слова как отдельного элемента (границы слова \b)
-        # Это спасет нас от поиска буквы 'a' внутри слова 'apple'
-        pattern = re.compile(r'\b' + re.escape(target_word) + r'\b', re.IGNORECASE)
+        # Регулярка для поиска слова как отдельного элемента (границы слова)
+        # Это спасет нас от поиска буквы 'a' внутри слова 'apple'.
+        # Ищем и словоформы: run → running/ran, take off → took off
+        pattern = forms_pattern(target_word)
         
         for i, entry in enumerate(transcript):
-            text = entry['text'].replace('\n', ' ')
+            text = entry.text.replace('\n', ' ')
             
             # 1. Сначала ищем точное совпадение
             match = pattern.search(text)
@@ -33,8 +41,8 @@ def get_precise_range(v_id, target_word):
                     match = True
             
             if match:
-                raw_start = entry['start']
-                raw_dur = entry.get('duration', 4.0)
+                raw_start = entry.start
+                raw_dur = entry.end - entry.start
                 
                 # Делаем красивый отрезок: -1.5 сек до, +3 сек после
                 new_start = max(0, raw_start - 1.5)
@@ -43,47 +51,90 @@ def get_precise_range(v_id, target_word):
                 # Берем текущую фразу и следующую для полноты смысла
                 context = text
                 if i + 1 < len(transcript):
-                    next_text = transcript[i+1]['text'].replace('\n', ' ')
+                    nxt = transcript[i+1]
+                    next_text = nxt.text.replace('\n', ' ')
                     context += " " + next_text
-                    new_end = transcript[i+1]['start'] + transcript[i+1].get('duration', 2.0)
+                    new_end = nxt.end
 
                 return round(new_start, 2), round(new_end, 2), context.strip()
                 
+        if outcomes is not None:
+            outcomes.add_to(writer, v_id, "not_found", target_word)
         return "NOT_IN_TEXT"
     except Exception as e:
         return f"ERROR: {str(e)[:20]}"
 
 def main():
-    db_path = "./vocab.db"
-    conn = sqlite3.connect(db_path)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default="./vocab.db")
+    parser.add_argument("--limit", type=int, default=100)
+    add_provider_args(parser)
+    add_cache_args(parser)
+    add_writer_args(parser)
+    add_outcome_args(parser)
+    add_metrics_args(parser)
+    args = parser.parse_args()
+    metrics_from_args(args, "final_test")
+    provider = provider_from_args(args)
+    # Транскрипты кешируются под форматом источника (провайдера)
+    cache = cache_from_args(args)
+
+    conn = connect(args.db)
     cur = conn.cursor()
+    # Видео без субтитров / слова, которых нет в видео, — пропускаем без сети
+    outcomes = outcomes_from_args(conn, args, network=provider.network)
 
     # Берем те, где есть видео, но еще нет нормальной подрезки (startTime был 0 или 10)
-    cur.execute("SELECT original, videoId FROM words WHERE videoId != '' AND videoId IS NOT NULL LIMIT 100")
+    cur.execute("SELECT rowid, original, videoId FROM words WHERE videoId != '' AND videoId IS NOT NULL LIMIT ?",
+                (args.limit,))
     rows = cur.fetchall()
 
     print(f"✂️ Ювелирная подрезка v2.0 (Regex Mode)")
     print(f"Обрабатываем пул из {len(rows)} слов...")
 
-    for word, v_id in rows:
-        print(f"🔍 '{word}'...", end=" ", flush=True)
-        
-        res = get_precise_range(v_id, word)
-        
-        if isinstance(res, tuple):
-            start, end, text = res
-            cur.execute("""
-                UPDATE words SET startTime = ?, endTime = ?, subtitleText = ? 
-                WHERE original = ? AND videoId = ?
-            """, (start, end, text, word, v_id))
-            conn.commit()
-            print(f"✅ {start}s -> {end}s")
-        else:
-            print(f"❌ {res}")
-            
-        time.sleep(random.uniform(1, 2)) # Ускорился, т.к. CLI работает бодро
+    # Результаты пишутся пачками по rowid; при Ctrl+C остаток дописывается
+    writer = writer_from_args(conn, args)
+    try:
+        with writer, profiled(args.profile):
+            for rowid, word, v_id in rows:
+                print(f"🔍 '{word}'...", end=" ", flush=True)
+
+                reason = outcomes.blocked(v_id, word)
+                if reason:
+                    METRICS.inc(f"skipped_{reason}")
+                    print(f"⏭  {reason} (известно)")
+                    continue
+
+                hits_before = cache.hits if cache is not None else None
+                with METRICS.time("word"):
+                    res = get_precise_range(v_id, word, provider, cache, outcomes, writer)
+
+                if isinstance(res, tuple):
+                    METRICS.inc("words_found")
+                    start, end, text = res
+                    print(f"✅ {start}s -> {end}s")
+                    writer.add("""
+                        UPDATE words SET startTime = ?, endTime = ?, subtitleText = ?
+                        WHERE rowid = ?
+                    """, (start, end, text, rowid))
+                else:
+                    METRICS.inc("words_error" if str(res).startswith("ERROR") else "words_not_found")
+                    print(f"❌ {res}")
+
+                from_cache = cache is not None and cache.hits != hits_before
+                if provider.network and not from_cache:  # пауза только после обращения к сети
+                    METRICS.sleep(random.uniform(1, 2)) # Ускорился, т.к. CLI работает бодро
+    except KeyboardInterrupt:
+        print("\n⛔ Прервано.")
 
+    provider.close()
     conn.close()
+    print(writer.summary())
+    if cache is not None:
+        print(cache.summary())
+    print(outcomes.summary())
+    print(METRICS.summary())
+    METRICS.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,341 @@
+"""
+inflections.py
+--------------
+Словоформы английского слова для поиска в субтитрах: словарная запись
+"run" должна находиться и в "running" / "ran", а "take off" — в "took off".
+
+  word_forms("take off")  → ("take off", "takes off", "taking off", "took off", "taken off")
+  word_forms("city")      → ("city", "cities", ...)
+
+Правила:
+  • регулярные окончания -s/-es/-ies, -ed/-d/-ied, -ing (с удвоением согласной);
+  • таблица неправильных глаголов и неправильных множественных чисел;
+  • фразовые глаголы ("take off", "give up") — изменяется глагол, частица остаётся;
+    составные существительные ("ice cream") — изменяется последнее слово;
+  • "to run" ищется как "run".
+
+Исходная форма всегда первая. Таблица неправильных форм собирается один
+раз при импорте, формы слов запоминаются (lru_cache).
+"""
+
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+
+# base  past  participle; варианты через "/"
+_IRREGULAR_VERBS_RAW = """
+arise arose arisen
+awake awoke awoken
+be was/were been
+bear bore borne/born
+beat beat beaten
+become became become
+begin began begun
+bend bent bent
+bet bet bet
+bind bound bound
+bite bit bitten
+bleed bled bled
+blow blew blown
+break broke broken
+breed bred bred
+bring brought brought
+broadcast broadcast broadcast
+build built built
+burn burnt/burned burnt/burned
+burst burst burst
+buy bought bought
+catch caught caught
+choose chose chosen
+cling clung clung
+come came come
+cost cost cost
+creep crept crept
+cut cut cut
+deal dealt dealt
+dig dug dug
+do did done
+draw drew drawn
+dream dreamt/dreamed dreamt/dreamed
+drink drank drunk
+drive drove driven
+eat ate eaten
+fall fell fallen
+feed fed fed
+feel felt felt
+fight fought fought
+find found found
+flee fled fled
+fly flew flown
+forbid forbade forbidden
+forget forgot forgotten
+forgive forgave forgiven
+freeze froze frozen
+get got got/gotten
+give gave given
+go went gone
+grind ground ground
+grow grew grown
+hang hung/hanged hung/hanged
+have had had
+hear heard heard
+hide hid hidden
+hit hit hit
+hold held held
+hurt hurt hurt
+keep kept kept
+kneel knelt knelt
+know knew known
+lay laid laid
+lead led led
+lean leant/leaned leant/leaned
+leap leapt/leaped leapt/leaped
+learn learnt/learned learnt/learned
+leave left left
+lend lent lent
+let let let
+lie lay lain
+light lit/lighted lit/lighted
+lose lost lost
+make made made
+mean meant meant
+meet met met
+mislead misled misled
+mistake mistook mistaken
+overcome overcame overcome
+overtake overtook overtaken
+pay paid paid
+prove proved proven/proved
+put put put
+quit quit quit
+read read read
+ride rode ridden
+ring rang rung
+rise rose risen
+run ran run
+say said said
+see saw seen
+seek sought sought
+sell sold sold
+send sent sent
+set set set
+sew sewed sewn
+shake shook shaken
+shed shed shed
+shine shone shone
+shoot shot shot
+show showed shown
+shrink shrank shrunk
+shut shut shut
+sing sang sung
+sink sank sunk
+sit sat sat
+sleep slept slept
+slide slid slid
+sling slung slung
+slit slit slit
+smell smelt/smelled smelt/smelled
+speak spoke spoken
+speed sped sped
+spell spelt/spelled spelt/spelled
+spend spent spent
+spill spilt/spilled spilt/spilled
+spin spun spun
+spit spat spat
+split split split
+spoil spoilt/spoiled spoilt/spoiled
+spread spread spread
+spring sprang sprung
+stand stood stood
+steal stole stolen
+stick stuck stuck
+sting stung stung
+stink stank stunk
+strike struck struck
+strive strove striven
+swear swore sworn
+sweep swept swept
+swell swelled swollen
+swim swam swum
+swing swung swung
+take took taken
+teach taught taught
+tear tore torn
+tell told told
+think thought thought
+throw threw thrown
+tread trod trodden
+understand understood understood
+undertake undertook undertaken
+upset upset upset
+wake woke woken
+wear wore worn
+weave wove woven
+weep wept wept
+win won won
+wind wound wound
+withdraw withdrew withdrawn
+write wrote written
+"""
+
+# Глаголы, чьи 3-е лицо и -ing не выводятся из правил ("bes", "gos")
+_EXTRA_VERB_FORMS = {
+    "be":   ("am", "is", "are", "being"),
+    "have": ("has", "having"),
+    "do":   ("does", "doing"),
+    "go":   ("goes", "going"),
+}
+
+IRREGULAR_PLURALS = {
+    "child": "children", "man": "men", "woman": "women", "person": "people",
+    "foot": "feet", "tooth": "teeth", "goose": "geese", "mouse": "mice",
+    "louse": "lice", "ox": "oxen", "knife": "knives",
+    "wife": "wives", "life": "lives", "leaf": "leaves", "half": "halves",
+    "wolf": "wolves", "shelf": "shelves", "thief": "thieves", "loaf": "loaves",
+    "calf": "calves", "analysis": "analyses", "crisis": "crises",
+    "phenomenon": "phenomena", "criterion": "criteria", "cactus": "cacti",
+}
+
+# Многосложные с ударением на последнем слоге: согласная удваивается (admitted)
+_DOUBLE_FINAL = frozenset("""
+admit begin commit compel confer control defer deter equip expel forbid forget incur
+occur omit patrol permit prefer propel rebel recur refer regret submit transfer transmit
+""".split())
+
+# Частицы фразовых глаголов: во фразе "<глагол> <частица> ..." меняется глагол
+PARTICLES = frozenset("""
+about across after against ahead along apart around aside at away back behind
+by down for forward in into off on onto out over past round through to together
+under up upon with without
+""".split())
+
+_VOWELS   = "aeiou"
+_PLAIN    = re.compile(r"^[a-z]+$")
+_VOWEL_GROUPS = re.compile(r"[aeiouy]+")
+_MIN_LEN  = 3   # короче — только таблица (иначе "as" → "ased")
+
+
+def _parse_irregular(raw: str) -> dict[str, tuple[str, ...]]:
+    table: dict[str, tuple[str, ...]] = {}
+    for line in raw.strip().splitlines():
+        base, past, participle = line.split()
+        forms = [*past.split("/"), *participle.split("/"), *_EXTRA_VERB_FORMS.get(base, ())]
+        table[base] = tuple(dict.fromkeys(f for f in forms if f != base))
+    return table
+
+
+IRREGULAR_VERBS = _parse_irregular(_IRREGULAR_VERBS_RAW)
+
+
+# ─── Регулярные окончания ─────────────────────────────────────
+
+def _cvc(w: str) -> bool:
+    """Согласная–гласная–согласная на конце: stop → stopping."""
+    return (len(w) >= 3 and w[-1] not in _VOWELS + "wxy"
+            and w[-2] in _VOWELS and w[-3] not in _VOWELS)
+
+
+def _syllables(w: str) -> int:
+    return len(_VOWEL_GROUPS.findall(w))
+
+
+def _with_suffix(w: str, suffix: str) -> list[str]:
+    """
+    -ed / -ing с удвоением согласной: у односложных (stop → stopping) и
+    многосложных с ударным концом из _DOUBLE_FINAL (admit → admitted);
+    abandon → abandoned без удвоения. На -l — оба варианта (travelled/traveled).
+    """
+    if not _cvc(w):
+        return [w + suffix]
+    doubled = w + w[-1] + suffix
+    if _syllables(w) == 1 or w in _DOUBLE_FINAL:
+        return [doubled]
+    if w.endswith("l"):
+        return [doubled, w + suffix]
+    return [w + suffix]
+
+
+def _plural(w: str) -> list[str]:
+    if w.endswith(("s", "x", "z", "ch", "sh")):
+        return [w + "es"]
+    if w.endswith("y") and w[-2] not in _VOWELS:
+        return [w[:-1] + "ies"]
+    if w.endswith("o") and w[-2] not in _VOWELS:
+        return [w + "s", w + "es"]
+    return [w + "s"]
+
+
+def _past(w: str) -> list[str]:
+    if w.endswith("e"):
+        return [w + "d"]
+    if w.endswith("y") and w[-2] not in _VOWELS:
+        return [w[:-1] + "ied"]
+    return _with_suffix(w, "ed")
+
+
+def _gerund(w: str) -> list[str]:
+    if w.endswith("ie"):
+        return [w[:-2] + "ying"]
+    if w.endswith("e") and not w.endswith(("ee", "oe", "ye")):
+        return [w[:-1] + "ing"]
+    return _with_suffix(w, "ing")
+
+
+def _single_forms(w: str) -> list[str]:
+    """Формы одного слова в нижнем регистре, без исходного."""
+    if w in _EXTRA_VERB_FORMS:
+        forms = list(IRREGULAR_VERBS[w])
+    elif w in IRREGULAR_VERBS:
+        forms = [*_plural(w), *_gerund(w), *IRREGULAR_VERBS[w]]
+    elif len(w) < _MIN_LEN:
+        return []
+    else:
+        forms = [*_plural(w), *_past(w), *_gerund(w)]
+    if w in IRREGULAR_PLURALS:
+        forms.append(IRREGULAR_PLURALS[w])
+    return [f for f in dict.fromkeys(forms) if f != w]
+
+
+# ─── Публичный API ────────────────────────────────────────────
+
+@lru_cache(maxsize=65536)
+def word_forms(word: str) -> tuple[str, ...]:
+    """
+    Исходная запись и её словоформы в нижнем регистре: "Abandon" из словаря
+    даёт ещё "abandons", "abandoned", ... Слова с цифрами, апострофами и т.п.
+    не изменяются — только исходная запись.
+    """
+    tokens = word.casefold().split()
+    if tokens and tokens[0].lower() == "to" and len(tokens) > 1:
+        tokens = tokens[1:]
+    if not tokens or not all(_PLAIN.match(t) for t in tokens):
+        return (word,)
+
+    if len(tokens) == 1:
+        variants = [tokens[0], *_single_forms(tokens[0])]
+    elif tokens[0] in IRREGULAR_VERBS or tokens[1] in PARTICLES:
+        # Фразовый глагол: took off, giving up, looked forward to
+        rest = " ".join(tokens[1:])
+        variants = [f"{f} {rest}" for f in (tokens[0], *_single_forms(tokens[0]))]
+    else:
+        # Составное существительное: ice creams
+        head = " ".join(tokens[:-1])
+        variants = [f"{head} {f}" for f in (tokens[-1], *_plural(tokens[-1]))]
+        if tokens[-1] in IRREGULAR_PLURALS:
+            variants.append(f"{head} {IRREGULAR_PLURALS[tokens[-1]]}")
+
+    # "Abandon" и "abandon" — одна форма (поиск без учёта регистра)
+    return tuple(dict.fromkeys([word, *(v for v in variants if v != word.casefold())]))
+
+
+def is_exact(word: str, form: str) -> bool:
+    """Совпала ли исходная запись (без учёта регистра), а не словоформа."""
+    return form.lower() == word.lower()
+
+
+def forms_pattern(word: str) -> re.Pattern:
+    """Регулярка на любую словоформу как отдельное слово (длинные формы первыми)."""
+    forms = sorted(word_forms(word), key=len, reverse=True)
+    return re.compile(r"(?<!\w)(?:" + "|".join(map(re.escape, forms)) + r")(?!\w)",
+                      re.IGNORECASE)
@@ -0,0 +1,204 @@
+"""
+job_queue.py
+------------
+Долговечная очередь заданий на уточнение субтитров (таблица refine_jobs в vocab.db).
+
+Одно задание на слово (ключ — words.id: он переживает полную перезапись
+таблицы через /api/sync, в отличие от rowid). У задания есть состояние,
+число попыток, последняя ошибка и время следующей попытки с
+экспоненциальной задержкой. Задания забираются пачками по видео;
+после падения процесса «running» возвращаются в очередь, так что
+следующий запуск продолжает ровно с того места, где остановился.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import time
+from typing import Optional
+
+from vocab_store import REFINE_JOBS_SCHEMA
+
+STATES = ("pending", "running", "done", "no_subs", "not_found", "error")
+# no_subs / not_found / done — финальные: повторно берутся только через requeue()
+READY_STATES = ("pending", "error")
+
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BACKOFF_BASE = 60.0           # 1 мин, 2 мин, 4 мин, ...
+DEFAULT_BACKOFF_MAX  = 24 * 3600.0
+
+SCHEMA = REFINE_JOBS_SCHEMA   # общая схема vocab.db — в vocab_store
+
+# SQL для BatchWriter — состояние задания пишется в той же транзакции, что и слово
+DONE_SQL = """
+    UPDATE refine_jobs SET state=?, lastError=NULL, updatedAt=? WHERE wordId=?
+"""
+FAIL_SQL = """
+    UPDATE refine_jobs SET state='error', lastError=?, nextAttemptAt=?, updatedAt=? WHERE wordId=?
+"""
+
+
+class JobQueue:
+    """Очередь refine_jobs поверх соединения с vocab.db."""
+
+    def __init__(self, conn: sqlite3.Connection,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 backoff_base: float = DEFAULT_BACKOFF_BASE,
+                 backoff_max: float = DEFAULT_BACKOFF_MAX):
+        self.conn         = conn
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max  = backoff_max
+        conn.executescript(SCHEMA)
+
+    # ─── Наполнение ───────────────────────────────────────────
+
+    def enqueue(self, empty_values: tuple) -> int:
+        """
+        Добавляет слова без субтитров, которых ещё нет в очереди, и сбрасывает
+        задания, у слова которых сменился videoId. Возвращает число новых/сброшенных.
+        """
+        now = time.time()
+        placeholders = ",".join("?" * len(empty_values))
+        with self.conn:
+            before = self.conn.total_changes
+            self.conn.execute(f"""
+                INSERT INTO refine_jobs (wordId, videoId, state, updatedAt)
+                SELECT id, videoId, 'pending', ? FROM words
+                WHERE  id IS NOT NULL
+                  AND  COALESCE(videoId, '') != ''
+                  AND  length(COALESCE(original,'')) >= 2
+                  AND  (subtitleText IS NULL OR TRIM(subtitleText) IN ({placeholders}))
+                ON CONFLICT(wordId) DO UPDATE SET
+                    videoId = excluded.videoId, state = 'pending', attempts = 0,
+                    lastError = NULL, nextAttemptAt = 0, updatedAt = excluded.updatedAt
+                WHERE refine_jobs.videoId != excluded.videoId
+            """, (now, *empty_values))
+            changed = self.conn.total_changes - before
+            # Слова, удалённые из словаря, больше не ждут обработки
+            self.conn.execute("""
+                DELETE FROM refine_jobs
+                WHERE NOT EXISTS (SELECT 1 FROM words WHERE words.id = refine_jobs.wordId)
+            """)
+        return changed
+
+    def recover(self) -> int:
+        """Возвращает в очередь задания, оставшиеся в 'running' после падения."""
+        with self.conn:
+            cur = self.conn.execute("""
+                UPDATE refine_jobs SET state='pending', updatedAt=? WHERE state='running'
+            """, (time.time(),))
+        return cur.rowcount
+
+    def requeue(self, states: tuple[str, ...]) -> int:
+        """Переводит задания в указанных состояниях обратно в pending."""
+        placeholders = ",".join("?" * len(states))
+        with self.conn:
+            cur = self.conn.execute(f"""
+                UPDATE refine_jobs SET state='pending', attempts=0, nextAttemptAt=0, updatedAt=?
+                WHERE state IN ({placeholders})
+            """, (time.time(), *states))
+        return cur.rowcount
+
+    # ─── Выдача заданий ───────────────────────────────────────
+
+    def claim(self, max_words: int) -> list[tuple]:
+        """
+        Забирает готовые задания целыми видео (не больше max_words слов, но
+        минимум одно видео) и помечает их running.
+        Возвращает [(wordId, rowid, original, videoId)].
+        """
+        now = time.time()
+        placeholders = ",".join("?" * len(READY_STATES))
+        ready = f"""
+            state IN ({placeholders}) AND nextAttemptAt <= ? AND attempts < ?
+        """
+        args = (*READY_STATES, now, self.max_attempts)
+
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            videos = self.conn.execute(f"""
+                SELECT videoId, COUNT(*) FROM refine_jobs
+                WHERE {ready}
+                GROUP BY videoId
+                ORDER BY MIN(nextAttemptAt), videoId
+                LIMIT ?
+            """, (*args, max_words)).fetchall()
+
+            chosen, total = [], 0
+            for video_id, n in videos:
+                if chosen and total + n > max_words:
+                    break
+                chosen.append(video_id)
+                total += n
+            if not chosen:
+                return []
+
+            vid_marks = ",".join("?" * len(chosen))
+            rows = self.conn.execute(f"""
+                SELECT j.wordId, w.rowid, w.original, j.videoId
+                FROM   refine_jobs j JOIN words w ON w.id = j.wordId
+                WHERE  j.videoId IN ({vid_marks}) AND {ready}
+                ORDER  BY j.videoId
+            """, (*chosen, *args)).fetchall()
+            self.conn.executemany("""
+                UPDATE refine_jobs SET state='running', attempts=attempts+1, updatedAt=?
+                WHERE wordId=?
+            """, [(now, r[0]) for r in rows])
+        return rows
+
+    # ─── Результаты ───────────────────────────────────────────
+
+    def backoff(self, attempts: int) -> float:
+        return min(self.backoff_max, self.backoff_base * 2 ** max(0, attempts - 1))
+
+    def attempts(self, word_id: float) -> int:
+        row = self.conn.execute("SELECT attempts FROM refine_jobs WHERE wordId=?",
+                                (word_id,)).fetchone()
+        return row[0] if row else 0
+
+    def done_params(self, word_id: float, state: str) -> tuple:
+        """Параметры DONE_SQL: state — 'done' | 'no_subs' | 'not_found'."""
+        return state, time.time(), word_id
+
+    def fail_params(self, word_id: float, error: str, attempts: Optional[int] = None) -> tuple:
+        """Параметры FAIL_SQL со следующей попыткой через экспоненциальную паузу."""
+        now = time.time()
+        if attempts is None:
+            attempts = self.attempts(word_id)
+        return error[:500], now + self.backoff(attempts), now, word_id
+
+    # ─── Статус ───────────────────────────────────────────────
+
+    def status(self) -> dict[str, int]:
+        counts = dict.fromkeys(STATES, 0)
+        for state, n in self.conn.execute("SELECT state, COUNT(*) FROM refine_jobs GROUP BY state"):
+            counts[state] = n
+        return counts
+
+    def print_status(self) -> None:
+        now = time.time()
+        counts = self.status()
+        placeholders = ",".join("?" * len(READY_STATES))
+        ready, scheduled, exhausted = self.conn.execute(f"""
+            SELECT
+              SUM(nextAttemptAt <= ? AND attempts <  ?),
+              SUM(nextAttemptAt >  ? AND attempts <  ?),
+              SUM(attempts >= ?)
+            FROM refine_jobs WHERE state IN ({placeholders})
+        """, (now, self.max_attempts, now, self.max_attempts, self.max_attempts,
+              *READY_STATES)).fetchone()
+
+        print("📊 Очередь refine_jobs:")
+        for state in STATES:
+            print(f"  {state:<10} {counts[state]:>7}")
+        print(f"  {'—' * 18}")
+        print(f"  готово к запуску:     {ready or 0}")
+        print(f"  ждут повтора:         {scheduled or 0}")
+        print(f"  попытки исчерпаны:    {exhausted or 0}")
+        nxt = self.conn.execute(f"""
+            SELECT MIN(nextAttemptAt) FROM refine_jobs
+            WHERE state IN ({placeholders}) AND nextAttemptAt > ? AND attempts < ?
+        """, (*READY_STATES, now, self.max_attempts)).fetchone()[0]
+        if nxt:
+            print(f"  следующий повтор через {int(nxt - now)}с")
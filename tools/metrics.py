@@ -0,0 +1,245 @@
+"""
+metrics.py
+----------
+Телеметрия инструментов в tools/: гистограммы времени по стадиям,
+счётчики исходов и скачанные байты.
+
+Один общий реестр METRICS на процесс — его пишут и инструменты, и
+провайдеры субтитров, и BatchWriter. Экспорт — JSON и textfile для
+node_exporter (Prometheus) в конце запуска и каждые --metrics-interval
+секунд во время него; запись атомарная (временный файл + os.replace).
+
+  with METRICS.time("match"):
+      ...
+  METRICS.inc("words_found")
+  METRICS.sleep(random.uniform(3, 6))   # паузы тоже видны как стадия
+
+Профилирование горячего цикла: with profiled(args.profile): ...
+"""
+
+from __future__ import annotations
+
+import bisect
+import cProfile
+import json
+import os
+import pstats
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+# Границы корзин гистограмм, секунды
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DEFAULT_INTERVAL = 30.0
+PROM_PREFIX = "segment_tools"
+
+
+class Histogram:
+    """Гистограмма в стиле Prometheus: счётчики по корзинам, сумма и число."""
+
+    __slots__ = ("buckets", "counts", "sum", "count", "max")
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts  = [0] * (len(buckets) + 1)  # последняя — +Inf
+        self.sum     = 0.0
+        self.count   = 0
+        self.max     = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum   += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля по верхней границе корзины."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+
+class Metrics:
+    """Реестр стадий и счётчиков одного запуска инструмента."""
+
+    def __init__(self, tool: str = "tools"):
+        self.tool      = tool
+        self.stages:   dict[str, Histogram] = {}
+        self.counters: dict[str, float] = {}
+        self.started   = time.time()
+        self.json_path: Optional[str] = None
+        self.prom_path: Optional[str] = None
+        self._lock     = threading.Lock()
+        self._stop     = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ─── Запись ───────────────────────────────────────────────
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            hist = self.stages.get(stage)
+            if hist is None:
+                hist = self.stages[stage] = Histogram()
+            hist.observe(seconds)
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t0)
+
+    def inc(self, name: str, n: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def sleep(self, seconds: float) -> None:
+        """time.sleep, учтённый как стадия "sleep"."""
+        if seconds <= 0:
+            return
+        with self.time("sleep"):
+            time.sleep(seconds)
+
+    # ─── Экспорт ──────────────────────────────────────────────
+
+    def configure(self, tool: str, json_path: Optional[str] = None,
+                  prom_path: Optional[str] = None,
+                  interval: float = DEFAULT_INTERVAL) -> None:
+        """Имя инструмента, файлы экспорта и фоновый периодический экспорт."""
+        self.tool      = tool
+        self.json_path = json_path
+        self.prom_path = prom_path
+        if (json_path or prom_path) and interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._loop, args=(interval,),
+                                            name="metrics-export", daemon=True)
+            self._thread.start()
+
+    def _loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            self.export()
+
+    def close(self) -> None:
+        """Останавливает фоновый экспорт и пишет итоговые файлы."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.export()
+
+    def to_json(self) -> dict:
+        with self._lock:
+            stages = {
+                name: {"count": h.count, "sum": round(h.sum, 6), "max": round(h.max, 6),
+                       "p50": h.quantile(0.5), "p95": h.quantile(0.95),
+                       "buckets": dict(zip([*map(str, h.buckets), "+Inf"], h.counts))}
+                for name, h in sorted(self.stages.items())
+            }
+            counters = dict(sorted(self.counters.items()))
+        return {"tool": self.tool, "startedAt": self.started, "updatedAt": time.time(),
+                "elapsed": round(time.time() - self.started, 3),
+                "stages": stages, "counters": counters}
+
+    def to_prometheus(self) -> str:
+        tool = self.tool.replace('"', "")
+        p    = PROM_PREFIX
+        lines = [f"# HELP {p}_stage_seconds Время стадий инструментов tools/",
+                 f"# TYPE {p}_stage_seconds histogram"]
+        with self._lock:
+            for name, h in sorted(self.stages.items()):
+                labels = f'tool="{tool}",stage="{name}"'
+                cumulative = 0
+                for le, n in zip([*map(str, h.buckets), "+Inf"], h.counts):
+                    cumulative += n
+                    lines.append(f'{p}_stage_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f"{p}_stage_seconds_sum{{{labels}}} {h.sum:.6f}")
+                lines.append(f"{p}_stage_seconds_count{{{labels}}} {h.count}")
+            lines += [f"# HELP {p}_events_total Счётчики исходов и объёмов",
+                      f"# TYPE {p}_events_total counter"]
+            for name, value in sorted(self.counters.items()):
+                lines.append(f'{p}_events_total{{tool="{tool}",event="{name}"}} {value:g}')
+        lines += [f"# TYPE {p}_last_run_timestamp_seconds gauge",
+                  f'{p}_last_run_timestamp_seconds{{tool="{tool}"}} {time.time():.0f}']
+        return "\n".join(lines) + "\n"
+
+    def export(self) -> None:
+        if self.json_path:
+            _write_atomic(self.json_path, json.dumps(self.to_json(), ensure_ascii=False, indent=2))
+        if self.prom_path:
+            _write_atomic(self.prom_path, self.to_prometheus())
+
+    def summary(self) -> str:
+        """Короткая таблица для конца запуска: где ушло время."""
+        data = self.to_json()
+        if not data["stages"] and not data["counters"]:
+            return "📈 Метрики: пусто"
+        lines = [f"📈 Стадии ({data['elapsed']:.1f}с всего):"]
+        for name, s in sorted(data["stages"].items(), key=lambda kv: -kv[1]["sum"]):
+            avg = s["sum"] / s["count"] if s["count"] else 0.0
+            lines.append(f"  {name:<10} {s['sum']:8.2f}с  ×{s['count']:<5} "
+                         f"ср. {avg * 1000:.0f} мс, p95 ≤ {s['p95'] * 1000:.0f} мс")
+        if data["counters"]:
+            lines.append("  " + "  ".join(f"{k}={v:g}" for k, v in data["counters"].items()))
+        return "\n".join(lines)
+
+
+def _write_atomic(path: str, text: str) -> None:
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=folder)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+METRICS = Metrics()
+
+
+@contextmanager
+def profiled(path: Optional[str], top: int = 20) -> Iterator[None]:
+    """cProfile на время блока: статистика в path (.prof) и топ по cumulative в stdout."""
+    if not path:
+        yield
+        return
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        prof.dump_stats(path)
+        print(f"🔬 Профиль: {path}")
+        pstats.Stats(prof).sort_stats("cumulative").print_stats(top)
+
+
+def add_metrics_args(p) -> None:
+    """Общие CLI-флаги телеметрии."""
+    p.add_argument("--metrics-json", default=None, metavar="PATH",
+                   help="Писать метрики в JSON (в конце и периодически)")
+    p.add_argument("--metrics-prom", default=None, metavar="PATH",
+                   help="Писать метрики в textfile для Prometheus node_exporter (*.prom)")
+    p.add_argument("--metrics-interval", type=float, default=DEFAULT_INTERVAL, metavar="SEC",
+                   help=f"Период промежуточного экспорта (default: {DEFAULT_INTERVAL:g})")
+    p.add_argument("--profile", default=None, metavar="PATH",
+                   help="cProfile горячего цикла в PATH (.prof)")
+
+
+def metrics_from_args(args, tool: str) -> Metrics:
+    METRICS.configure(tool, args.metrics_json, args.metrics_prom, args.metrics_interval)
+    return METRICS
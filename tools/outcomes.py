@@ -0,0 +1,150 @@
+"""
+outcomes.py
+-----------
+Отрицательные исходы обработки (таблица negative_outcomes в vocab.db) —
+вместо строки "Check video for context" в words.subtitleText.
+
+Ключи:
+  (videoId, '')       no_subs    у видео нет английских субтитров — для всех его слов
+  (videoId, термин)   not_found  слова нет в транскрипте этого видео
+
+У записи есть срок retryAfter: до него инструменты не ходят в сеть за этим
+видео / словом, после — запись считается истёкшей и видео проверяется
+заново. Термин — terms.term_key(), так что "Apple" и "apple " — одна запись.
+no_subs запоминается только по ответу сети (network=True): нет локального
+файла субтитров — это не повод неделю не ходить за видео в YouTube.
+
+  outcomes = OutcomeStore(conn)
+  if outcomes.blocked(video_id, word):
+      ...  # пропустить без сети
+  outcomes.add_to(writer, video_id, "no_subs")   # или сразу: outcomes.save(...)
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import time
+from typing import Optional
+
+from terms import term_key
+from vocab_store import NEGATIVE_OUTCOMES_SCHEMA
+
+REASONS = ("no_subs", "not_found")
+DEFAULT_TTL_DAYS = {"no_subs": 7.0, "not_found": 30.0}
+
+SCHEMA = NEGATIVE_OUTCOMES_SCHEMA   # общая схема vocab.db — в vocab_store
+
+RECORD_SQL = """
+    INSERT OR REPLACE INTO negative_outcomes (videoId, term, reason, retryAfter, updatedAt)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+
+class OutcomeStore:
+    """
+    Действующие отрицательные исходы в памяти (читаются один раз при
+    создании) плюс SQL для их записи — через BatchWriter или сразу.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, ttl_days: Optional[dict] = None,
+                 enabled: bool = True, network: bool = True):
+        self.conn    = conn
+        self.network = network   # False — источник локальный, no_subs не записываем
+        self.ttl     = {r: d * 86400 for r, d in {**DEFAULT_TTL_DAYS, **(ttl_days or {})}.items()}
+        self.enabled = enabled
+        self.skipped = 0
+        conn.executescript(SCHEMA)
+        # term_key() в SQL — чтобы отсеивать известные исходы прямо в SELECT
+        conn.create_function("term_key", 1, term_key, deterministic=True)
+        self._active: dict[tuple[str, str], str] = {}
+        if enabled:
+            rows = conn.execute("SELECT videoId, term, reason FROM negative_outcomes "
+                                "WHERE retryAfter > ?", (time.time(),))
+            self._active = {(v, t): r for v, t, r in rows}
+
+    def blocked(self, video_id: str, word: Optional[str] = None) -> Optional[str]:
+        """Причина пропустить видео (или слово в нём) без сети; None — можно работать."""
+        if not self.enabled or not video_id:
+            return None
+        reason = self._active.get((video_id, ""))
+        if reason is None and word:
+            reason = self._active.get((video_id, term_key(word)))
+        if reason is not None:
+            self.skipped += 1
+        return reason
+
+    def sql_filter(self, table: str = "words") -> tuple[str, tuple]:
+        """
+        Условие WHERE "нет действующего исхода" для строк table (videoId, original)
+        и его параметры; иначе LIMIT выбирал бы одни и те же заблокированные слова.
+        """
+        if not self.enabled:
+            return "1", ()
+        return f"""NOT EXISTS (
+                SELECT 1 FROM negative_outcomes n
+                WHERE  n.videoId = {table}.videoId
+                  AND  n.term IN ('', term_key({table}.original))
+                  AND  n.retryAfter > ?)""", (time.time(),)
+
+    def record(self, video_id: str, reason: str,
+               word: Optional[str] = None) -> Optional[tuple[str, tuple]]:
+        """
+        Отмечает исход и возвращает (sql, params) для BatchWriter.add, или None,
+        если такой исход в этом запуске уже записан.
+        """
+        if reason not in REASONS:
+            raise ValueError(f"неизвестная причина: {reason}")
+        if reason == "no_subs" and not self.network:
+            return None
+        key = (video_id, "" if reason == "no_subs" or not word else term_key(word))
+        if self._active.get(key) == reason:
+            return None
+        self._active[key] = reason
+        now = time.time()
+        return RECORD_SQL, (*key, reason, now + self.ttl[reason], now)
+
+    def add_to(self, writer, video_id: str, reason: str, word: Optional[str] = None) -> None:
+        """record() в пачку BatchWriter — запишется вместе с результатами слов."""
+        item = self.record(video_id, reason, word)
+        if item is not None:
+            writer.add(*item)
+
+    def save(self, video_id: str, reason: str, word: Optional[str] = None) -> None:
+        """record() и сразу запись в БД — для инструментов без BatchWriter."""
+        item = self.record(video_id, reason, word)
+        if item is not None:
+            with self.conn:
+                self.conn.execute(*item)
+
+    def purge(self) -> int:
+        """Удаляет истёкшие записи."""
+        with self.conn:
+            cur = self.conn.execute("DELETE FROM negative_outcomes WHERE retryAfter <= ?",
+                                    (time.time(),))
+        return cur.rowcount
+
+    def summary(self) -> str:
+        counts = {r: 0 for r in REASONS}
+        for reason in self._active.values():
+            counts[reason] = counts.get(reason, 0) + 1
+        return (f"🚫 Отрицательные исходы: пропущено без сети {self.skipped}; действуют — "
+                f"видео без субтитров {counts['no_subs']}, слово не найдено {counts['not_found']}")
+
+
+def add_outcome_args(p) -> None:
+    """Общие CLI-флаги таблицы отрицательных исходов."""
+    p.add_argument("--no-subs-ttl-days", type=float, default=DEFAULT_TTL_DAYS["no_subs"],
+                   help="Через сколько дней перепроверять видео без субтитров "
+                        f"(default: {DEFAULT_TTL_DAYS['no_subs']:g})")
+    p.add_argument("--not-found-ttl-days", type=float, default=DEFAULT_TTL_DAYS["not_found"],
+                   help="Через сколько дней снова искать слово, не найденное в видео "
+                        f"(default: {DEFAULT_TTL_DAYS['not_found']:g})")
+    p.add_argument("--ignore-outcomes", action="store_true",
+                   help="Не пропускать известные отрицательные исходы (всё равно записывать новые)")
+
+
+def outcomes_from_args(conn: sqlite3.Connection, args, network: bool = True) -> OutcomeStore:
+    """network — субтитры берутся из сети (для локальных файлов no_subs не запоминается)."""
+    return OutcomeStore(conn, {"no_subs": args.no_subs_ttl_days,
+                               "not_found": args.not_found_ttl_days},
+                        enabled=not args.ignore_outcomes, network=network)
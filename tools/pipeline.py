@@ -0,0 +1,206 @@
+"""
+pipeline.py
+-----------
+Конвейер fetch → parse/match → write для инструментов в tools/.
+
+  • N потоков загрузки берут задания из ограниченной очереди;
+  • один поток разбора/поиска превращает результат загрузки в записи для БД;
+  • запись в БД идёт в вызывающем (главном) потоке — там же, где создано
+    соединение sqlite, и там же ловится Ctrl+C.
+
+Общий TokenBucket ограничивает суммарную частоту исходящих запросов,
+поэтому число потоков повышает пропускную способность, но не темп
+обращений к YouTube. Функции fetch/process передаются снаружи, так что
+конвейер можно гонять офлайн на заглушке провайдера субтитров.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Optional
+
+_DONE = object()
+_POLL = 0.2
+
+
+class TokenBucket:
+    """Потокобезопасный token bucket: не более rate запросов в секунду, всплеск до burst."""
+
+    def __init__(self, rate: float, burst: float = 1.0,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        if rate <= 0:
+            raise ValueError("rate должен быть > 0")
+        self.rate   = rate
+        self.burst  = max(1.0, burst)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.burst
+        self._last   = clock()
+        self._lock   = threading.Lock()
+        self.acquired = 0
+        self.waited   = 0.0
+
+    def acquire(self, stop: Optional[threading.Event] = None) -> bool:
+        """Ждёт токен. Возвращает False, если за время ожидания выставлен stop."""
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    self.acquired += 1
+                    return True
+                wait = (1.0 - self._tokens) / self.rate
+
+            if stop is not None and stop.is_set():
+                return False
+            wait = min(wait, _POLL) if stop is not None else wait
+            self.waited += wait
+            self._sleep(wait)
+
+
+@dataclass
+class PipelineStats:
+    units:    int = 0
+    fetched:  int = 0
+    written:  int = 0
+    errors:   list = field(default_factory=list)
+
+
+def _put(q: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    """put в ограниченную очередь, не зависая навсегда после stop."""
+    while True:
+        try:
+            q.put(item, timeout=_POLL)
+            return True
+        except queue.Full:
+            if stop.is_set():
+                return False
+
+
+def _get(q: queue.Queue, stop: threading.Event) -> Any:
+    while True:
+        try:
+            return q.get(timeout=_POLL)
+        except queue.Empty:
+            if stop.is_set():
+                return _DONE
+
+
+def run_pipeline(units: Iterable[Any],
+                 fetch: Callable[[Any], Any],
+                 process: Callable[[Any, Any], Iterable[Any]],
+                 sink: Callable[[Any], None],
+                 workers: int = 4,
+                 queue_size: int = 16,
+                 stop: Optional[threading.Event] = None) -> PipelineStats:
+    """
+    Прогоняет units через конвейер.
+
+      fetch(unit)            — в потоках загрузки (сеть, кеш);
+      process(unit, fetched) — в потоке разбора, возвращает записи;
+      sink(record)           — в вызывающем потоке (БД).
+
+    Ошибка в любой стадии останавливает конвейер и пробрасывается наружу.
+    """
+    stop      = stop or threading.Event()
+    workers   = max(1, workers)
+    units_q   = queue.Queue(maxsize=queue_size)
+    fetched_q = queue.Queue(maxsize=queue_size)
+    out_q     = queue.Queue(maxsize=queue_size * 4)
+    stats     = PipelineStats()
+    lock      = threading.Lock()
+
+    def fail(exc: BaseException) -> None:
+        with lock:
+            stats.errors.append(exc)
+        stop.set()
+
+    def feeder() -> None:
+        try:
+            for unit in units:
+                if stop.is_set() or not _put(units_q, unit, stop):
+                    break
+                with lock:
+                    stats.units += 1
+        except BaseException as exc:
+            fail(exc)
+        finally:
+            for _ in range(workers):
+                _put(units_q, _DONE, stop)
+
+    def fetcher() -> None:
+        try:
+            while True:
+                unit = _get(units_q, stop)
+                if unit is _DONE or stop.is_set():
+                    break
+                result = fetch(unit)
+                with lock:
+                    stats.fetched += 1
+                if not _put(fetched_q, (unit, result), stop):
+                    break
+        except BaseException as exc:
+            fail(exc)
+        finally:
+            _put(fetched_q, _DONE, stop)
+
+    def matcher() -> None:
+        finished = 0
+        try:
+            while finished < workers:
+                item = _get(fetched_q, stop)
+                if item is _DONE:
+                    if stop.is_set():
+                        break
+                    finished += 1
+                    continue
+                unit, result = item
+                for record in process(unit, result):
+                    if not _put(out_q, record, stop):
+                        return
+        except BaseException as exc:
+            fail(exc)
+        finally:
+            # Главный поток ждёт маркер, даже если конвейер остановлен
+            out_q.put(_DONE)
+
+    threads = [threading.Thread(target=feeder, name="feeder", daemon=True),
+               threading.Thread(target=matcher, name="matcher", daemon=True)]
+    threads += [threading.Thread(target=fetcher, name=f"fetch-{i}", daemon=True)
+                for i in range(workers)]
+    for t in threads:
+        t.start()
+
+    try:
+        while True:
+            record = out_q.get()
+            if record is _DONE:
+                break
+            sink(record)
+            stats.written += 1
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        # Дописываем то, что поток разбора уже успел выдать
+        while True:
+            try:
+                record = out_q.get_nowait()
+            except queue.Empty:
+                break
+            if record is not _DONE:
+                sink(record)
+                stats.written += 1
+        stop.set()
+        for t in threads:
+            t.join(timeout=5)
+
+    if stats.errors:
+        raise stats.errors[0]
+    return stats
@@ -14,6 +14,26 @@ refine_segments.py v5
   # Просто с cookies (без смены IP):
   python refine_segments.py --db ./vocab.db --cookies-file ./cookies.txt
 
+  # Одна загрузка субтитров на видео (все слова видео за раз):
+  python refine_segments.py --db ./vocab.db --group-by-video
+
+  # Конвейер: 4 потока загрузки при прежнем общем темпе запросов:
+  python refine_segments.py --db ./vocab.db --workers 4
+
+  # Долговечная очередь заданий (продолжает с места остановки) и её статус:
+  python refine_segments.py --db ./vocab.db --queue
+  python refine_segments.py --db ./vocab.db --queue-status
+
+  # Другой источник субтитров (youtube-transcript-api или папка с файлами):
+  python refine_segments.py --db ./vocab.db --provider yta
+  python refine_segments.py --db ./vocab.db --provider file --transcripts-dir ./subs
+
+  # Офлайн по архиву субтитров (папка или .tar.gz), без единого запроса в сеть:
+  python refine_segments.py --db ./vocab.db --corpus ./subs_archive.tar.gz --all-words --limit 100000
+
+  # Новые параметры нарезки — пересчитать готовые клипы по локальным транскриптам:
+  python refine_segments.py --db ./vocab.db --recompute --max-duration 10
+
 Установка Tor:
   pip install requests[socks] stem
   Скачай Tor: https://www.torproject.org/download/tor/
@@ -24,19 +44,29 @@ from __future__ import annotations
 
 import argparse
 import json
-import re
 import random
 import sqlite3
+import threading
 import time
-from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Optional
-
-try:
-    from yt_dlp import YoutubeDL
-except ImportError:
-    print("❌ pip install yt-dlp")
-    raise SystemExit(1)
+from typing import Callable, Optional
+
+from corpus import CorpusReader
+from db_writer import BatchWriter, add_writer_args, writer_from_args
+from inflections import is_exact
+from job_queue import DEFAULT_BACKOFF_BASE, DEFAULT_MAX_ATTEMPTS, DONE_SQL, FAIL_SQL, JobQueue
+from metrics import METRICS, add_metrics_args, metrics_from_args, profiled
+from outcomes import OutcomeStore, add_outcome_args, outcomes_from_args
+from pipeline import TokenBucket, run_pipeline
+from terms import dedupe_rows, dedupe_summary
+from transcript_cache import TranscriptCache, add_cache_args, cache_from_args, valid_key
+from transcript_providers import (LocalFileProvider, NoTranscript, TranscriptProvider,
+                                  add_provider_args, is_network, provider_from_args)
+from transcripts import (CLIP_ALGO_VERSION, CLIP_MODES, WORD_CLIP_MAX, WORD_CLIP_MIN, Chunk,
+                         Transcript)
+from vocab_store import connect
+from word_changes import AllWords, add_change_args, changes_from_args
+from word_index import WordIndex
 
 
 # ─── Tor / прокси ─────────────────────────────────────────────
@@ -55,6 +85,10 @@ class ProxyRotator:
         self.tor_control = tor_control_port
         self.tor_password = tor_password
         self._tor_controller = None
+        # Потоки загрузки ловят 429 одновременно: смена IP под замком и только
+        # одна на поколение прокси, которым пользовались запросы
+        self._lock      = threading.Lock()
+        self.generation = 0
 
         if mode == "tor":
             self._init_tor()
@@ -112,27 +146,45 @@ class ProxyRotator:
             return self.proxies[self.proxy_idx % len(self.proxies)]
         return None
 
-    def rotate(self) -> str | None:
-        """Меняет IP. Возвращает новый прокси."""
-        if self.mode == "tor":
-            return self._rotate_tor()
-        if self.mode == "list":
-            return self._rotate_list()
-        return None
+    def snapshot(self) -> tuple[str | None, int]:
+        """Текущий прокси и его поколение — для rotate(seen=...)."""
+        with self._lock:
+            return self.current_proxy, self.generation
+
+    def rotate(self, seen: int | None = None, on_rotate: Callable[[], None] | None = None) -> bool:
+        """
+        Меняет IP. seen — поколение прокси, на котором запрос получил 429:
+        если другой поток уже сменил IP после него, вторую смену не делаем.
+        on_rotate выполняется под тем же замком (сброс соединений старого IP).
+        Возвращает True, если IP сменили в этом вызове.
+        """
+        with self._lock:
+            if seen is not None and seen != self.generation:
+                return False
+            if self.mode == "tor":
+                self._rotate_tor()
+            elif self.mode == "list":
+                self._rotate_list()
+            else:
+                return False
+            self.generation += 1
+            if on_rotate is not None:
+                on_rotate()
+            return True
 
     def _rotate_tor(self) -> str:
         if self._tor_controller:
             try:
                 from stem import Signal
                 self._tor_controller.signal(Signal.NEWNYM)
-                time.sleep(3)  # Tor нужно время на смену цепочки
+                METRICS.sleep(3)  # Tor нужно время на смену цепочки
                 print("  🔄 Tor: новый IP получен")
             except Exception as e:
                 print(f"  ⚠️  Ошибка смены Tor IP: {e}")
         else:
             # Без контроллера просто ждём — Tor сам меняет цепочку раз в 10 мин
             print("  ⏳ Tor без контроллера — ждём 15с...")
-            time.sleep(15)
+            METRICS.sleep(15)
         return f"socks5://{self.tor_host}:{self.tor_port}"
 
     def _rotate_list(self) -> str | None:
@@ -160,339 +212,851 @@ def load_proxy_list(path: str) -> list[str]:
 
 # ─── Структуры ────────────────────────────────────────────────
 
-@dataclass
-class Chunk:
-    text:  str
-    start: float
-    end:   float
-
 EMPTY_VALUES = ("", "Check video for context", None)
 
-DEFAULT_COLUMNS = {
-    "startTime":         "REAL",
-    "endTime":           "REAL",
-    "subtitleText":      "TEXT",
-    "subtitleLang":      "TEXT",
-    "subtitleUpdatedAt": "TEXT",
-}
-
-
-# ─── YDL ──────────────────────────────────────────────────────
-
-def _build_ydl_opts(proxy: str | None, cookies_file: str | None) -> dict:
-    opts = {
-        "quiet":             True,
-        "no_warnings":       True,
-        "skip_download":     True,
-        "extract_flat":      False,
-        "writesubtitles":    True,
-        "writeautomaticsub": True,
-        "subtitleslangs":    ["en"],
-        "subtitlesformat":   "json3",
-        "retries":           3,
-        "sleep_interval":    1,
-        "max_sleep_interval": 5,
-        "user_agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/124.0.0.0 Safari/537.36"
-        ),
-    }
-    if proxy:
-        opts["proxy"] = proxy
-    if cookies_file:
-        opts["cookiefile"] = cookies_file
-    return opts
-
-
-def fetch_chunks(video_id: str, proxy: str | None,
-                 cookies_file: str | None) -> tuple[list[Chunk], str]:
-    url      = f"https://www.youtube.com/watch?v={video_id}"
-    ydl_opts = _build_ydl_opts(proxy, cookies_file)
-
-    with YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(url, download=False)
-
-    if not info:
-        raise RuntimeError("yt-dlp вернул пустой результат")
-
-    subs_url = lang = None
-    for key in ("subtitles", "automatic_captions"):
-        lang_data = (info.get(key) or {}).get("en", [])
-        for fmt in lang_data:
-            if fmt.get("ext") in ("json3", "srv3"):
-                subs_url = fmt.get("url")
-                lang = "en"
-                break
-        if subs_url:
-            break
-
-    if not subs_url:
-        raise RuntimeError("Субтитры на английском не найдены")
+UPDATE_FOUND_SQL = """
+    UPDATE words
+    SET startTime=?, endTime=?, subtitleText=?, subtitleLang=?, subtitleUpdatedAt=?
+    WHERE rowid=?
+"""
 
-    # Скачиваем через yt-dlp (с теми же cookies/proxy)
-    with YoutubeDL({**ydl_opts, "quiet": True}) as ydl:
-        raw = ydl.urlopen(subs_url).read().decode("utf-8")
+# --recompute: язык субтитров тот же, меняется только клип
+UPDATE_CLIP_SQL = """
+    UPDATE words
+    SET startTime=?, endTime=?, subtitleText=?, subtitleUpdatedAt=?
+    WHERE rowid=?
+"""
 
-    data   = json.loads(raw)
-    chunks = _parse_json3(data)
-    if not chunks:
-        raise RuntimeError("Субтитры пустые после парсинга")
+# Подпись клипа строки words (vocab_store.CLIP_PARAMS_SCHEMA): params, state, updatedAt, rowid
+STAMP_PARAMS_SQL = """
+    INSERT OR REPLACE INTO clip_params (wordId, original, params, state, updatedAt)
+    SELECT id, COALESCE(original, ''), ?, ?, ? FROM words WHERE rowid=? AND id IS NOT NULL
+"""
 
-    return chunks, lang or "en"
 
+# ─── БД ───────────────────────────────────────────────────────
 
-def _parse_json3(data: dict) -> list[Chunk]:
-    result: list[Chunk] = []
-    for event in data.get("events", []):
-        start_ms = event.get("tStartMs", 0)
-        dur_ms   = event.get("dDurationMs", 0)
-        text = "".join(s.get("utf8", "") for s in event.get("segs", [])).strip()
-        text = _clean(text)
-        if text:
-            result.append(Chunk(text=text,
-                                start=start_ms / 1000.0,
-                                end=(start_ms + dur_ms) / 1000.0))
-    return result
+def select_words(cur: sqlite3.Cursor, limit: int,
+                 reprocess_long: float = 0.0, all_words: bool = False,
+                 outcomes: Optional[OutcomeStore] = None,
+                 changes=None) -> list[tuple]:
+    # --changed-only: только слова, изменившиеся после прошлого запуска (word_changes)
+    changes = changes if changes is not None else AllWords()
+    changed, changed_params = changes.sql_filter()
+    # С --changed-only — по возрастанию версии, чтобы отметка не обогнала LIMIT
+    order = changes.sql_order()
+    if all_words:
+        # Все слова с привязанным видео — для полного пересчёта (например, из корпуса)
+        cur.execute(f"""
+            SELECT rowid, original, videoId FROM words
+            WHERE  COALESCE(videoId, '') != ''
+              AND  length(COALESCE(original,'')) >= 2
+              AND  {changed}
+            {order}
+            LIMIT  ?
+        """, (*changed_params, limit))
+    elif reprocess_long > 0:
+        # Перезаписать записи где endTime - startTime > лимита
+        cur.execute(f"""
+            SELECT rowid, original, videoId FROM words
+            WHERE  COALESCE(videoId, '') != ''
+              AND  length(COALESCE(original,'')) >= 2
+              AND  subtitleText IS NOT NULL
+              AND  TRIM(subtitleText) != ''
+              AND  (endTime - startTime) > ?
+              AND  {changed}
+            {order}
+            LIMIT  ?
+        """, (reprocess_long, *changed_params, limit))
+    else:
+        placeholders = ",".join("?" * len(EMPTY_VALUES))
+        # Слова с действующим отрицательным исходом не занимают место в LIMIT
+        known, known_params = outcomes.sql_filter() if outcomes is not None else ("1", ())
+        cur.execute(f"""
+            SELECT rowid, original, videoId FROM words
+            WHERE  COALESCE(videoId, '') != ''
+              AND  length(COALESCE(original,'')) >= 2
+              AND  (subtitleText IS NULL OR TRIM(subtitleText) IN ({placeholders}))
+              AND  {known}
+              AND  {changed}
+            {order}
+            LIMIT  ?
+        """, (*EMPTY_VALUES, *known_params, *changed_params, limit))
+    rows = cur.fetchall()
+    changes.selected(rows, limit)
+    return rows
 
 
-def _clean(text: str) -> str:
-    text = text.replace("\n", " ")
-    text = re.sub(r"\[(?:music|applause|laughter|noise|\s)+\]", "", text, flags=re.IGNORECASE)
-    return re.sub(r"\s+", " ", text).strip()
+def select_recompute(cur: sqlite3.Cursor, signature: str,
+                     reprocess_long: float = 0.0) -> list[tuple]:
+    """
+    Все готовые клипы, нарезанные не с текущими параметрами: без подписи в
+    clip_params (старые записи) или с другой подписью refine_segments. Клипы
+    других инструментов (clip_ranker) не трогаем. Без LIMIT и по videoId:
+    --limit считается в recompute() только по словам с локальным транскриптом.
+    """
+    # NOT IN с NULL в списке всегда ложно — NULL отсекает IS NOT NULL
+    filled = [v for v in EMPTY_VALUES if v is not None]
+    placeholders = ",".join("?" * len(filled))
+    cur.execute(f"""
+        SELECT w.rowid, w.original, w.videoId, w.startTime, w.endTime, w.subtitleText
+        FROM   words w
+        LEFT   JOIN clip_params p ON p.wordId = w.id AND p.original = COALESCE(w.original, '')
+        WHERE  w.id IS NOT NULL
+          AND  COALESCE(w.videoId, '') != ''
+          AND  length(COALESCE(w.original,'')) >= 2
+          AND  w.subtitleText IS NOT NULL AND TRIM(w.subtitleText) NOT IN ({placeholders})
+          AND  (p.params IS NULL OR (p.params LIKE 'refine_segments %' AND p.params != ?))
+          AND  (? <= 0 OR (w.endTime - w.startTime) > ?)
+        ORDER  BY w.videoId
+    """, (*filled, signature, reprocess_long, reprocess_long))
+    return cur.fetchall()
 
 
-# ─── Поиск слова ──────────────────────────────────────────────
+# ─── Основной цикл ────────────────────────────────────────────
 
-def find_sentence(chunks: list[Chunk], word: str,
-                  max_expand: int = 6,
-                  max_duration: float = 15.0) -> Optional[tuple[float, float, str]]:
+class SubtitleFetcher:
     """
-    Ищет слово в субтитрах и возвращает фрагмент не длиннее max_duration секунд.
-    Центрирует окно вокруг чанка со словом.
+    Загрузка субтитров одного видео: сначала кеш, затем сеть с ротацией IP при 429.
+    Один объект на запуск; в конвейере его разделяют потоки загрузки.
     """
-    pattern = re.compile(r"(?<!\w)" + re.escape(word) + r"(?!\w)", re.IGNORECASE)
-    hit = next((i for i, c in enumerate(chunks) if pattern.search(c.text)), None)
-    if hit is None:
-        return None
 
-    # Расширяем влево до границы предложения
-    left = hit
-    while left > 0 and (hit - left) < max_expand:
-        if re.search(r"[.!?…]\s*$", chunks[left - 1].text):
-            break
-        left -= 1
+    def __init__(self, rotator: ProxyRotator, provider: TranscriptProvider,
+                 cache: Optional[TranscriptCache] = None,
+                 index: Optional[WordIndex] = None,
+                 limiter: Optional[TokenBucket] = None,
+                 verbose: bool = True,
+                 outcomes: Optional[OutcomeStore] = None):
+        self.rotator      = rotator
+        self.provider     = provider
+        self.cache        = cache
+        self.index        = index
+        self.limiter      = limiter
+        self.verbose      = verbose
+        self.outcomes     = outcomes
+        self.stop         = threading.Event()
+        self.errors: dict[str, str] = {}   # videoId → текст последней ошибки
+
+    def _log(self, msg: str, end: str = "\n") -> None:
+        if self.verbose:
+            print(msg, end=end, flush=True)
+
+    def used_network(self, outcome: str) -> bool:
+        """Был ли за этим исходом запрос в сеть — после него нужна пауза."""
+        return self.provider.network and outcome not in ("cached", "known_no_subs")
+
+    def fetch(self, video_id: str) -> tuple[Optional[list[Chunk]], Optional[str], str]:
+        """
+        Возвращает (chunks, lang, outcome), где outcome:
+        "ok" | "cached" | "no_subs" | "known_no_subs" | "error"
+        (known_no_subs — уже известно, что субтитров нет; сеть не трогали).
+        """
+        chunks, lang, outcome = self._fetch(video_id)
+        METRICS.inc(f"video_{outcome}")
+        return chunks, lang, outcome
+
+    def _fetch(self, video_id: str) -> tuple[Optional[list[Chunk]], Optional[str], str]:
+        if self.cache is not None:
+            chunks = self.cache.get(video_id, "en", self.provider.name)
+            if chunks:
+                self._log("💾", end=" ")
+                return chunks, "en", "cached"
+
+        # Известно, что субтитров нет (negative_outcomes) — в сеть не идём
+        if self.outcomes is not None and self.outcomes.blocked(video_id) == "no_subs":
+            self._log("⏭  нет субтитров (известно)")
+            return None, None, "known_no_subs"
+
+        rotator     = self.rotator
+        max_retries = max(1, len(rotator.proxies) if rotator.mode == "list" else 3)
 
-    # Расширяем вправо до границы предложения
-    right = hit
-    while right < len(chunks) - 1 and (right - hit) < max_expand:
-        if re.search(r"[.!?…]\s*$", chunks[right].text):
-            break
-        right += 1
-        if re.search(r"[.!?…]\s*$", chunks[right].text):
-            break
+        for attempt in range(1, max_retries + 2):
+            # Общий лимит частоты запросов на все потоки
+            if self.limiter is not None:
+                with METRICS.time("rate_wait"):
+                    acquired = self.limiter.acquire(self.stop)
+                if not acquired:
+                    return None, None, "error"
+            try:
+                proxy, generation = rotator.snapshot()
+                chunks, lang, kind = self.provider.fetch(video_id, "en", proxy)
+                if self.cache is not None and self.provider.cacheable:
+                    self.cache.put(video_id, lang, self.provider.name, chunks, kind)
+                if self.index is not None:
+                    self.index.add(video_id, lang, self.provider.name, chunks)
+                return chunks, lang, "ok"
 
-    # Обрезаем если фрагмент длиннее max_duration секунд
-    # Центрируем окно вокруг чанка со словом
-    word_start = chunks[hit].start
-    word_end   = chunks[hit].end
-    half       = max_duration / 2.0
+            except KeyboardInterrupt:
+                raise
 
-    clip_start = max(chunks[left].start, word_start - half)
-    clip_end   = clip_start + max_duration
+            except Exception as exc:
+                msg = str(exc)
+                is_rate  = any(x in msg for x in ("429", "Too Many", "blocked", "Forbidden", "403"))
+                no_subs  = isinstance(exc, NoTranscript) or "не найдены" in msg or "no subtitle" in msg.lower() or "not found" in msg.lower()
 
-    # Сужаем left/right чтобы вписаться в окно
-    while left < hit and chunks[left].start < clip_start:
-        left += 1
-    while right > hit and chunks[right].end > clip_end:
-        right -= 1
+                if no_subs:
+                    self._log("⚠️  нет субтитров")
+                    return None, None, "no_subs"
 
-    # Финальная проверка длины — если всё ещё длиннее, берём только чанк со словом
-    final_start = chunks[left].start
-    final_end   = chunks[right].end
-    if final_end - final_start > max_duration:
-        left = right = hit
-        final_start = chunks[hit].start
-        final_end   = chunks[hit].end
+                self.errors[video_id] = msg
 
-    sentence = re.sub(r"\s+", " ",
-                      " ".join(c.text for c in chunks[left:right + 1])).strip()
+                if is_rate:
+                    self._log(f"❌ 429", end="")
+                    if attempt <= max_retries:
+                        self._log(f" — меняю IP (попытка {attempt})...", end=" ")
+                        METRICS.inc("retried")
+                        # соединения старого IP не переиспользуем; если IP уже
+                        # сменил соседний поток — просто повторяем с новым
+                        rotator.rotate(generation, self.provider.reset)
+                        continue  # повторяем с новым IP
+                    self._log(f" — попытки исчерпаны")
+                else:
+                    self._log(f"❌ {msg[:80]}")
 
-    # Небольшой контекст вокруг (но не выходим за max_duration)
-    pad_start = max(0.0, final_start - 0.5)
-    pad_end   = final_end + 0.5
-    if pad_end - pad_start > max_duration:
-        pad_end = pad_start + max_duration
+                return None, None, "error"
 
-    return round(pad_start, 2), round(pad_end, 2), sentence
+        return None, None, "error"
 
+    def close(self) -> None:
+        self.provider.close()
 
-# ─── БД ───────────────────────────────────────────────────────
 
-def ensure_columns(cur: sqlite3.Cursor) -> None:
-    cur.execute("PRAGMA table_info(words)")
-    existing = {row[1] for row in cur.fetchall()}
-    for col, typ in DEFAULT_COLUMNS.items():
-        if col not in existing:
-            cur.execute(f"ALTER TABLE words ADD COLUMN {col} {typ}")
-            print(f"  ✚ Добавлена колонка: {col}")
+def group_by_video(rows: list[tuple]) -> dict[str, list[tuple[int, str]]]:
+    """Группирует (rowid, word, videoId) по videoId, сохраняя порядок появления."""
+    groups: dict[str, list[tuple[int, str]]] = {}
+    for rowid, word, video_id in rows:
+        if not word or not video_id:
+            continue
+        groups.setdefault(video_id, []).append((rowid, word))
+    return groups
 
 
-def select_words(cur: sqlite3.Cursor, limit: int,
-                 reprocess_long: float = 0.0) -> list[tuple]:
-    if reprocess_long > 0:
-        # Перезаписать записи где endTime - startTime > лимита
-        cur.execute("""
-            SELECT rowid, original, videoId FROM words
-            WHERE  COALESCE(videoId, '') != ''
-              AND  length(COALESCE(original,'')) >= 2
-              AND  subtitleText IS NOT NULL
-              AND  TRIM(subtitleText) != ''
-              AND  (endTime - startTime) > ?
-            LIMIT  ?
-        """, (reprocess_long, limit))
-    else:
-        placeholders = ",".join("?" * len(EMPTY_VALUES))
-        cur.execute(f"""
-            SELECT rowid, original, videoId FROM words
-            WHERE  COALESCE(videoId, '') != ''
-              AND  length(COALESCE(original,'')) >= 2
-              AND  (subtitleText IS NULL OR TRIM(subtitleText) IN ({placeholders}))
-            LIMIT  ?
-        """, (*EMPTY_VALUES, limit))
-    return cur.fetchall()
+def clip_options(args: argparse.Namespace) -> dict:
+    """Параметры нарезки клипа для find_sentence(s) из CLI."""
+    return {"max_duration": args.max_duration, "mode": args.clip_mode,
+            "clip_min": args.clip_min, "clip_max": args.clip_max,
+            "inflect": not args.exact_only}
 
 
-# ─── Основной цикл ────────────────────────────────────────────
+def params_signature(tool: str, options: dict) -> str:
+    """
+    Подпись клипа в clip_params: инструмент, версия алгоритма нарезки и параметры,
+    например 'refine_segments {"clip_max":6.0,...,"v":1}'.
+    """
+    return f"{tool} " + json.dumps({**options, "v": CLIP_ALGO_VERSION},
+                                   sort_keys=True, separators=(",", ":"))
 
-def refine(args: argparse.Namespace) -> None:
 
-    # Инициализируем ротатор прокси
+def clip_signature(args: argparse.Namespace) -> str:
+    return params_signature("refine_segments", clip_options(args))
+
+
+def match_words(args: argparse.Namespace, chunks: list[Chunk],
+                words: list[str]) -> dict[str, Optional[tuple[float, float, str]]]:
+    """find_sentences() с параметрами CLI; считает совпадения точной формы и словоформ."""
+    with METRICS.time("match"):
+        matches = Transcript(chunks).find_matches(words, **clip_options(args))
+    result = {}
+    for word, m in matches.items():
+        if m is None:
+            result[word] = None
+            continue
+        clip, form = m
+        METRICS.inc("match_exact" if is_exact(word, form) else "match_inflected")
+        result[word] = clip
+    return result
+
+
+def match_summary() -> str:
+    counters = METRICS.counters
+    return (f"🔤 Совпадения: точная форма {counters.get('match_exact', 0):g}, "
+            f"словоформа {counters.get('match_inflected', 0):g}")
+
+
+def make_rotator(args: argparse.Namespace) -> Optional[ProxyRotator]:
     if args.tor:
-        rotator = ProxyRotator(
+        return ProxyRotator(
             mode="tor",
             tor_host=args.tor_host,
             tor_port=args.tor_port,
             tor_control_port=args.tor_control_port,
             tor_password=args.tor_password,
         )
-    elif args.proxy_list:
+    if args.proxy_list:
         proxies = load_proxy_list(args.proxy_list)
         if not proxies:
             print("❌ Файл прокси пустой!")
-            return
-        rotator = ProxyRotator(mode="list", proxies=proxies)
-    elif args.proxy:
-        rotator = ProxyRotator(mode="list", proxies=[args.proxy])
-    else:
-        rotator = ProxyRotator(mode="none")
+            return None
+        return ProxyRotator(mode="list", proxies=proxies)
+    if args.proxy:
+        return ProxyRotator(mode="list", proxies=[args.proxy])
+    return ProxyRotator(mode="none")
+
+
+class ResultWriter:
+    """
+    Запись результата по слову: UPDATE words и, в режиме --queue,
+    состояние задания refine_jobs — в одной пачке BatchWriter.
+    fanout (terms.dedupe_rows) раскладывает результат на все строки того же
+    термина и видео; отрицательные исходы пишутся в negative_outcomes,
+    clip_params (params_signature) — подпись найденных клипов в таблице clip_params.
+    """
+
+    def __init__(self, writer: BatchWriter, queue: Optional[JobQueue] = None,
+                 job_ids: Optional[dict[int, float]] = None,
+                 fanout: Optional[dict[int, list[int]]] = None,
+                 outcomes: Optional[OutcomeStore] = None,
+                 clip_params: Optional[str] = None):
+        self.writer      = writer
+        self.queue       = queue
+        self.job_ids     = job_ids or {}
+        self.fanout      = fanout or {}
+        self.outcomes    = outcomes
+        self.clip_params = clip_params
+
+    def _rows(self, rowid: int) -> list[int]:
+        return self.fanout.get(rowid) or [rowid]
+
+    def found(self, rowid: int, start: float, end: float, sentence: str,
+              lang: str, now_iso: str) -> None:
+        for r in self._rows(rowid):
+            METRICS.inc("words_found")
+            self.writer.add(UPDATE_FOUND_SQL, (start, end, sentence, lang, now_iso, r))
+            if self.clip_params is not None:
+                self.writer.add(STAMP_PARAMS_SQL, (self.clip_params, "clip", time.time(), r))
+            self._job_done(r, "done")
+
+    def missing(self, rowid: int, reason: str, video_id: str, word: str) -> None:
+        """reason: "no_subs" | "not_found"."""
+        for r in self._rows(rowid):
+            METRICS.inc(f"words_{reason}")
+            self._job_done(r, reason)
+        if self.outcomes is not None:
+            self.outcomes.add_to(self.writer, video_id, reason, word)
+
+    def skip_known(self, rows: list[tuple]) -> list[tuple]:
+        """Убирает слова с действующим отрицательным исходом — без сети и без поиска."""
+        if self.outcomes is None:
+            return rows
+        kept = []
+        for rowid, word, video_id in rows:
+            reason = self.outcomes.blocked(video_id, word)
+            if reason is None:
+                kept.append((rowid, word, video_id))
+                continue
+            for r in self._rows(rowid):
+                METRICS.inc(f"skipped_{reason}")
+                self._job_done(r, reason)
+        return kept
+
+    def failed(self, rowid: int, error: str) -> None:
+        for r in self._rows(rowid):
+            METRICS.inc("words_error")
+            word_id = self.job_ids.get(r)
+            if self.queue is not None and word_id is not None:
+                self.writer.add(FAIL_SQL, self.queue.fail_params(word_id, error))
+
+    def _job_done(self, rowid: int, state: str) -> None:
+        word_id = self.job_ids.get(rowid)
+        if self.queue is not None and word_id is not None:
+            self.writer.add(DONE_SQL, self.queue.done_params(word_id, state))
+
 
-    conn = sqlite3.connect(args.db)
+def refine(args: argparse.Namespace) -> None:
+
+    metrics_from_args(args, "refine_segments")
+    conn = connect(args.db)
     cur  = conn.cursor()
-    ensure_columns(cur)
-    conn.commit()
 
-    rows = select_words(cur, args.limit, reprocess_long=getattr(args, "reprocess_long", 0.0))
-    if not rows:
-        print("✨ Нет слов для обработки.")
+    if args.queue_status:
+        JobQueue(conn, max_attempts=args.max_attempts).print_status()
+        conn.close()
+        return
+
+    if args.corpus:
+        refine_corpus(args, conn)
+        return
+
+    if args.recompute:
+        recompute(args, conn)
+        return
+
+    outcomes = outcomes_from_args(conn, args, network=is_network(args.provider))
+    outcomes.purge()
+
+    # Инициализируем ротатор прокси
+    rotator = make_rotator(args)
+    if rotator is None:
         conn.close()
         return
 
-    print(f"📋 Слов к обработке: {len(rows)}")
+    cache = cache_from_args(args)
+    index = WordIndex.for_cache(cache) if cache is not None else None
+
+    queue   = None
+    changes = AllWords()   # у очереди свои состояния заданий
+    if args.queue:
+        queue = JobQueue(conn, max_attempts=args.max_attempts,
+                         backoff_base=args.retry_backoff)
+        recovered = queue.recover()
+        added     = queue.enqueue(EMPTY_VALUES)
+        print(f"📬 Очередь: +{added} заданий, возвращено после сбоя: {recovered}")
+        batches = claim_batches(queue, args.limit, args.queue_batch)
+    else:
+        changes = changes_from_args(conn, args, "refine_segments")
+        rows = select_words(cur, args.limit, reprocess_long=getattr(args, "reprocess_long", 0.0),
+                            all_words=args.all_words, outcomes=outcomes, changes=changes)
+        if not rows:
+            changes.commit()
+            print("✨ Нет слов для обработки.")
+            conn.close()
+            return
+        print(f"📋 Слов к обработке: {len(rows)}")
+        batches = iter([(rows, {})])
+    batches = dedupe_batches(batches)
+
     if rotator.current_proxy:
         print(f"  🌐 Прокси: {rotator.current_proxy}")
     if args.cookies_file:
         print(f"  🍪 Cookies: {args.cookies_file}")
+    if cache is not None:
+        print(f"  💾 Кеш: {cache.root}")
     print()
 
-    ok = fail_count = 0
+    provider = provider_from_args(args, args.cookies_file)
+    fetcher  = SubtitleFetcher(rotator, provider, cache, index, outcomes=outcomes)
+    writer  = writer_from_args(conn, args)
+    try:
+        # При выходе из with (в том числе по Ctrl+C) накопленное дописывается в БД
+        with writer, profiled(args.profile):
+            for batch_rows, job_ids, fanout in batches:
+                results = ResultWriter(writer, queue, job_ids, fanout, outcomes,
+                                       clip_signature(args))
+                batch_rows = results.skip_known(batch_rows)
+                if args.workers > 1:
+                    refine_pipeline(args, fetcher, results, batch_rows)
+                elif args.group_by_video or queue is not None:
+                    refine_grouped(args, fetcher, results, batch_rows)
+                else:
+                    refine_rows(args, fetcher, results, batch_rows)
+                if fetcher.stop.is_set():
+                    break
+                writer.flush()  # очередь видит результаты пачки до следующего claim
+            else:
+                changes.commit()
+    except KeyboardInterrupt:
+        print("\n⛔ Прервано.")
+    finally:
+        print(writer.summary())
+        if cache is not None:
+            print(cache.summary())
+        if queue is not None:
+            queue.print_status()
+        print(dedupe_report())
+        print(outcomes.summary())
+        if changes.summary():
+            print(changes.summary())
+        print(match_summary())
+        print(METRICS.summary())
+        METRICS.close()
+        fetcher.close()
+        conn.close()
 
-    for idx, (rowid, word, video_id) in enumerate(rows, 1):
-        if not word or not video_id:
-            continue
 
-        print(f"[{idx}/{len(rows)}] 🔍 '{word}' ({video_id})", end=" ... ", flush=True)
+def dedupe_batches(batches):
+    """Одна строка на (термин, видео) в каждой пачке; итог по сэкономленным повторам — в METRICS."""
+    for rows, job_ids in batches:
+        unique, fanout = dedupe_rows(rows)
+        METRICS.inc("rows_selected", len(rows))
+        METRICS.inc("terms_unique", len(unique))
+        yield unique, job_ids, fanout
 
-        # Пробуем загрузить субтитры — при 429 меняем IP и повторяем
-        max_retries = max(1, len(rotator.proxies) if rotator.mode == "list" else 3)
-        chunks = lang = None
 
-        for attempt in range(1, max_retries + 2):
-            try:
-                chunks, lang = fetch_chunks(video_id, rotator.current_proxy, args.cookies_file)
-                fail_count = 0
-                break
+def dedupe_report() -> str:
+    counters = METRICS.counters
+    return dedupe_summary(int(counters.get("rows_selected", 0)),
+                          int(counters.get("terms_unique", 0)))
 
-            except KeyboardInterrupt:
-                print("\n⛔ Прервано.")
-                conn.close()
-                return
 
-            except Exception as exc:
-                msg = str(exc)
-                is_rate  = any(x in msg for x in ("429", "Too Many", "blocked", "Forbidden", "403"))
-                no_subs  = "не найдены" in msg or "no subtitle" in msg.lower() or "not found" in msg.lower()
+def claim_batches(queue: JobQueue, limit: int, batch_size: int):
+    """Пачки заданий из очереди, пока не наберётся limit слов или очередь не опустеет."""
+    taken = 0
+    while taken < limit:
+        claimed = queue.claim(min(batch_size, limit - taken))
+        if not claimed:
+            if taken == 0:
+                print("✨ В очереди нет готовых заданий.")
+            return
+        taken += len(claimed)
+        print(f"📋 Взято из очереди: {len(claimed)} слов (всего {taken})")
+        rows    = [(rowid, word, video_id) for _word_id, rowid, word, video_id in claimed]
+        job_ids = {rowid: word_id for word_id, rowid, _word, _video in claimed}
+        yield rows, job_ids
 
-                if no_subs:
-                    print("⚠️  нет субтитров")
-                    cur.execute("UPDATE words SET subtitleText=? WHERE rowid=?",
-                                ("Check video for context", rowid))
-                    conn.commit()
-                    chunks = None
-                    break
 
-                if is_rate:
-                    print(f"❌ 429", end="")
-                    if attempt <= max_retries:
-                        print(f" — меняю IP (попытка {attempt})...", end=" ", flush=True)
-                        rotator.rotate()
-                        continue  # повторяем с новым IP
-                    else:
-                        print(f" — попытки исчерпаны")
-                        fail_count += 1
+def refine_rows(args: argparse.Namespace, fetcher: SubtitleFetcher,
+                results: ResultWriter, rows: list[tuple]) -> None:
+    """Обычный режим: по одному слову за раз."""
+    ok = fail_count = 0
 
-                else:
-                    print(f"❌ {msg[:80]}")
-                    fail_count += 1
+    for idx, (rowid, word, video_id) in enumerate(rows, 1):
+        if not word or not video_id:
+            continue
 
-                break
+        print(f"[{idx}/{len(rows)}] 🔍 '{word}' ({video_id})", end=" ... ", flush=True)
+
+        # Пробуем загрузить субтитры — при 429 меняем IP и повторяем
+        chunks, lang, outcome = fetcher.fetch(video_id)
+
+        if outcome in ("ok", "cached"):
+            fail_count = 0
+        elif outcome in ("no_subs", "known_no_subs"):
+            results.missing(rowid, "no_subs", video_id, word)
+        else:
+            results.failed(rowid, fetcher.errors.get(video_id, outcome))
+            fail_count += 1
 
         if fail_count >= args.max_consecutive_errors:
             print(f"🛑 {fail_count} ошибок подряд — останавливаюсь.")
+            fetcher.stop.set()   # как в конвейере: отметку --changed-only не сдвигать
             break
 
         if chunks is None:
-            if idx < len(rows):
-                time.sleep(random.uniform(1, 3))
+            if fetcher.used_network(outcome) and idx < len(rows):
+                METRICS.sleep(random.uniform(1, 3))
             continue
 
+        network_used = fetcher.used_network(outcome)
+
         # Ищем слово в субтитрах
-        result = find_sentence(chunks, word, max_duration=args.max_duration)
+        result = match_words(args, chunks, [word])[word]
         if result is None:
             print("⚠️  слово не найдено в субтитрах")
-            cur.execute("UPDATE words SET subtitleText=? WHERE rowid=?",
-                        ("Check video for context", rowid))
-            conn.commit()
+            results.missing(rowid, "not_found", video_id, word)
         else:
             start, end, sentence = result
             now_iso = datetime.now(timezone.utc).isoformat(timespec="seconds")
-            cur.execute("""
-                UPDATE words
-                SET startTime=?, endTime=?, subtitleText=?, subtitleLang=?, subtitleUpdatedAt=?
-                WHERE rowid=?
-            """, (start, end, sentence, lang, now_iso, rowid))
-            conn.commit()
             preview = sentence[:70] + ("…" if len(sentence) > 70 else "")
             print(f"✅ [{start}s–{end}s]  «{preview}»")
+            results.found(rowid, start, end, sentence, lang, now_iso)
             ok += 1
 
-        if idx < len(rows):
-            time.sleep(random.uniform(args.sleep_min, args.sleep_max))
+        # Пауза нужна только после обращения к сети
+        if network_used and idx < len(rows):
+            METRICS.sleep(random.uniform(args.sleep_min, args.sleep_max))
 
-    conn.close()
     print(f"\n🏁 Готово!  ✅ {ok}  ❌ {len(rows) - ok}")
 
 
+def refine_grouped(args: argparse.Namespace, fetcher: SubtitleFetcher,
+                   results: ResultWriter, rows: list[tuple]) -> None:
+    """
+    Режим --group-by-video: субтитры каждого видео качаются один раз,
+    все слова этого видео ищутся в одном транскрипте и пишутся вместе.
+    """
+    groups = group_by_video(rows)
+    total_words = sum(len(items) for items in groups.values())
+    print(f"🎬 Уникальных видео: {len(groups)} (слов: {total_words})\n")
+
+    fetched = cached = ok = fail_count = 0
+
+    for idx, (video_id, items) in enumerate(groups.items(), 1):
+        print(f"[{idx}/{len(groups)}] 🎬 {video_id} ({len(items)} сл.)", end=" ... ", flush=True)
+
+        chunks, lang, outcome = fetcher.fetch(video_id)
+
+        if outcome in ("ok", "cached"):
+            fail_count = 0
+            if outcome == "ok":
+                fetched += 1
+            else:
+                cached += 1
+            print(f"📥 {len(chunks)} чанков")
+        elif outcome in ("no_subs", "known_no_subs"):
+            for rowid, word in items:
+                results.missing(rowid, "no_subs", video_id, word)
+        else:
+            for rowid, _ in items:
+                results.failed(rowid, fetcher.errors.get(video_id, outcome))
+            fail_count += 1
+
+        if fail_count >= args.max_consecutive_errors:
+            print(f"🛑 {fail_count} ошибок подряд — останавливаюсь.")
+            fetcher.stop.set()   # как в конвейере: отметку --changed-only не сдвигать
+            break
+
+        if chunks is None:
+            if fetcher.used_network(outcome) and idx < len(groups):
+                METRICS.sleep(random.uniform(1, 3))
+            continue
+
+        now_iso = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        matches = match_words(args, chunks, [word for _, word in items])
+        for rowid, word in items:
+            result = matches[word]
+            if result is None:
+                print(f"    ⚠️  '{word}' не найдено в субтитрах")
+                results.missing(rowid, "not_found", video_id, word)
+            else:
+                start, end, sentence = result
+                results.found(rowid, start, end, sentence, lang, now_iso)
+                print(f"    ✅ '{word}' [{start}s–{end}s]")
+                ok += 1
+
+        if fetcher.used_network(outcome) and idx < len(groups):
+            METRICS.sleep(random.uniform(args.sleep_min, args.sleep_max))
+
+    print(f"\n🏁 Готово!  🎬 видео скачано: {fetched}/{len(groups)} (из кеша: {cached})  "
+          f"✅ слов найдено: {ok}/{total_words}")
+
+
+def refine_pipeline(args: argparse.Namespace, fetcher: SubtitleFetcher,
+                    results: ResultWriter, rows: list[tuple]) -> None:
+    """
+    Режим --workers N: видео качаются в N потоков, поиск слов идёт в отдельном
+    потоке, запись — в главном. Вместо пауз sleep_min..sleep_max общий
+    token bucket держит суммарный темп запросов не выше прежнего.
+    """
+    groups = group_by_video(rows)
+    total_words = sum(len(items) for items in groups.values())
+
+    rate = args.rate or 1.0 / ((args.sleep_min + args.sleep_max) / 2.0 or 1.0)
+    fetcher.limiter = TokenBucket(rate)
+    fetcher.verbose = False
+    print(f"🎬 Уникальных видео: {len(groups)} (слов: {total_words}), "
+          f"потоков: {args.workers}, лимит: {rate:.2f} запр/с\n")
+
+    counts = {"ok": 0, "cached": 0, "no_subs": 0, "known_no_subs": 0, "error": 0}
+    found  = 0
+    fail_count = 0
+    done = 0
+
+    def fetch(unit):
+        video_id, _items = unit
+        return fetcher.fetch(video_id)
+
+    def process(unit, fetched):
+        nonlocal found, fail_count, done
+        video_id, items = unit
+        chunks, lang, outcome = fetched
+        counts[outcome] += 1
+        done += 1
+        prefix = f"[{done}/{len(groups)}] 🎬 {video_id} ({len(items)} сл.)"
+
+        if outcome == "error":
+            if fetcher.stop.is_set():
+                return []  # загрузка прервана остановкой конвейера
+            fail_count += 1
+            error = fetcher.errors.get(video_id, outcome)
+            print(f"{prefix} ❌ {error[:60]}")
+            if fail_count >= args.max_consecutive_errors:
+                print(f"🛑 {fail_count} ошибок подряд — останавливаюсь.")
+                fetcher.stop.set()
+            return [("failed", (rowid, error)) for rowid, _ in items]
+        fail_count = 0
+
+        if outcome in ("no_subs", "known_no_subs"):
+            print(f"{prefix} ⚠️  нет субтитров")
+            return [("missing", (rowid, "no_subs", video_id, word)) for rowid, word in items]
+
+        now_iso = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        matches = match_words(args, chunks, [word for _, word in items])
+        records = []
+        for rowid, word in items:
+            result = matches[word]
+            if result is None:
+                records.append(("missing", (rowid, "not_found", video_id, word)))
+            else:
+                start, end, sentence = result
+                records.append(("found", (rowid, start, end, sentence, lang, now_iso)))
+        hits = sum(1 for r in matches.values() if r is not None)
+        found += hits
+        print(f"{prefix} {'💾' if outcome == 'cached' else '📥'} ✅ {hits}/{len(items)}")
+        return records
+
+    stats = run_pipeline(groups.items(), fetch, process,
+                         # Записи вида (метод ResultWriter, аргументы) — в главном потоке
+                         sink=lambda record: getattr(results, record[0])(*record[1]),
+                         workers=args.workers, stop=fetcher.stop)
+
+    print(f"\n🏁 Готово!  🎬 видео скачано: {counts['ok']}/{stats.units} "
+          f"(из кеша: {counts['cached']}, без субтитров: {counts['no_subs'] + counts['known_no_subs']}, "
+          f"ошибок: {counts['error']})  ✅ слов найдено: {found}/{total_words}")
+    print(f"⏱  token bucket: {fetcher.limiter.acquired} запросов, "
+          f"ожидание {fetcher.limiter.waited:.1f}с")
+
+
+def refine_corpus(args: argparse.Namespace, conn: sqlite3.Connection) -> None:
+    """
+    Режим --corpus: субтитры берутся из архива (папка или тарбол .json3/.vtt/.srt),
+    сеть не используется вовсе. Файлы читаются потоком; для каждого видео,
+    у которого есть слова к обработке, — пакетный поиск и запись как обычно.
+    Слова, видео которых в архиве нет, не трогаются.
+    """
+    # Своя отметка: слова, видео которых нет в корпусе, ждут сетевого запуска
+    changes = changes_from_args(conn, args, "refine_segments:corpus")
+    rows = select_words(conn.cursor(), args.limit,
+                        reprocess_long=getattr(args, "reprocess_long", 0.0),
+                        all_words=args.all_words, changes=changes)
+    if not rows:
+        changes.commit()
+        print("✨ Нет слов для обработки.")
+        conn.close()
+        return
+
+    rows, _job_ids, fanout = next(dedupe_batches(iter([(rows, {})])))
+    groups = group_by_video(rows)
+    total_words = sum(len(items) for items in groups.values())
+    print(f"📦 Корпус: {args.corpus}")
+    print(f"🎬 Видео со словами к обработке: {len(groups)} (слов: {total_words})\n")
+
+    cache   = cache_from_args(args)
+    index   = WordIndex.for_cache(cache) if cache is not None else None
+    reader  = CorpusReader(args.corpus)
+    writer  = writer_from_args(conn, args)
+    results = ResultWriter(writer, fanout=fanout, outcomes=outcomes_from_args(conn, args),
+                           clip_params=clip_signature(args))
+    videos = found = 0
+    t0 = time.perf_counter()
+    try:
+        with writer, profiled(args.profile):
+            for video_id, lang, fmt, chunks in reader:
+                # Складываем в общий кеш/индекс — пригодится сетевым инструментам.
+                # Нестандартное имя файла ("урок 1.vtt") ключом кеша не станет —
+                # такой файл только сопоставляем со словами
+                if cache is not None and valid_key(video_id, lang[:2], fmt):
+                    cache.put(video_id, lang[:2], fmt, chunks)
+                    if index is not None:
+                        index.add(video_id, lang[:2], fmt, chunks)
+                elif cache is not None:
+                    METRICS.inc("corpus_not_cached")
+                    print(f"  ⚠️  {video_id!r}: имя не годится для кеша — файл не кешируется")
+
+                items = groups.pop(video_id, None)
+                if not items:
+                    continue
+                videos += 1
+                now_iso = datetime.now(timezone.utc).isoformat(timespec="seconds")
+                matches = match_words(args, chunks, [word for _, word in items])
+                hits = 0
+                for rowid, word in items:
+                    result = matches[word]
+                    if result is None:
+                        results.missing(rowid, "not_found", video_id, word)
+                    else:
+                        start, end, sentence = result
+                        results.found(rowid, start, end, sentence, lang[:2], now_iso)
+                        hits += 1
+                found += hits
+                print(f"[{videos}] 🎬 {video_id} ({fmt}) ✅ {hits}/{len(items)}")
+        changes.commit()
+    except KeyboardInterrupt:
+        print("\n⛔ Прервано.")
+    finally:
+        elapsed = time.perf_counter() - t0
+        rest = sum(len(items) for items in groups.values())
+        print(f"\n🏁 Готово за {elapsed:.1f}с!  🎬 видео из корпуса: {videos}  "
+              f"✅ слов найдено: {found}/{total_words}  ⏭  нет в корпусе: {rest}")
+        print(reader.summary())
+        print(writer.summary())
+        print(dedupe_report())
+        print(match_summary())
+        print(METRICS.summary())
+        METRICS.close()
+        conn.close()
+
+
+def recompute(args: argparse.Namespace, conn: sqlite3.Connection) -> None:
+    """
+    Режим --recompute: параметры нарезки поменялись — клипы пересчитываются
+    по локальным транскриптам (кеш или --provider file), сеть не используется.
+    Полностью переписываются только строки, чей клип изменился; у остальных
+    обновляется лишь подпись в clip_params, чтобы их не выбирать снова. Слова,
+    которые с новыми параметрами не находятся, сохраняют старый клип и
+    получают подпись с состоянием lost. Видео без локального транскрипта
+    пропускаются и не занимают место в --limit.
+    """
+    signature = clip_signature(args)
+    rows = select_recompute(conn.cursor(), signature, getattr(args, "reprocess_long", 0.0))
+    if not rows:
+        print("✨ Все клипы уже нарезаны с текущими параметрами.")
+        conn.close()
+        return
+
+    stored = {rowid: (start, end, text) for rowid, _w, _v, start, end, text in rows}
+    groups = group_by_video([(rowid, word, video_id) for rowid, word, video_id, *_ in rows])
+    print(f"♻️  Клипов со старыми параметрами: {len(rows)} слов в {len(groups)} видео "
+          f"(обработать до {args.limit})")
+    print(f"   параметры: {signature}\n")
+
+    cache = cache_from_args(args)
+    local = LocalFileProvider(args.transcripts_dir) if args.provider == "file" else None
+    # Транскрипт мог попасть в кеш от любого сетевого провайдера
+    formats = [f for f in dict.fromkeys((args.provider, "json3", "yta")) if f != "file"]
+
+    def load(video_id: str) -> Optional[list[Chunk]]:
+        if local is not None:
+            try:
+                return local.fetch(video_id)[0]
+            except NoTranscript:
+                return None
+        for fmt in formats if cache is not None else ():
+            chunks = cache.get(video_id, "en", fmt)
+            if chunks:
+                return chunks
+        return None
+
+    writer = writer_from_args(conn, args)
+    counts = {"changed": 0, "unchanged": 0, "lost": 0, "no_local": 0}
+    try:
+        with writer, profiled(args.profile):
+            processed = 0
+            for video_id, items in groups.items():
+                if processed >= args.limit:
+                    break
+                chunks = load(video_id)
+                if chunks is None:
+                    counts["no_local"] += len(items)
+                    continue
+                processed += len(items)
+                now, now_iso = time.time(), datetime.now(timezone.utc).isoformat(timespec="seconds")
+                matches = match_words(args, chunks, [word for _, word in items])
+                changed = 0
+                for rowid, word in items:
+                    result = matches[word]
+                    if result is None:
+                        # С новыми параметрами слово не находится — старый клип оставляем
+                        counts["lost"] += 1
+                        writer.add(STAMP_PARAMS_SQL, (signature, "lost", now, rowid))
+                        continue
+                    start, end, sentence = result
+                    old_start, old_end, old_text = stored[rowid]
+                    if (old_text == sentence and old_start is not None and old_end is not None
+                            and abs(old_start - start) < 1e-6 and abs(old_end - end) < 1e-6):
+                        counts["unchanged"] += 1
+                    else:
+                        counts["changed"] += 1
+                        changed += 1
+                        writer.add(UPDATE_CLIP_SQL, (start, end, sentence, now_iso, rowid))
+                    writer.add(STAMP_PARAMS_SQL, (signature, "clip", now, rowid))
+                print(f"[{processed}/{args.limit}] 🎬 {video_id}: изменено {changed}/{len(items)}")
+    except KeyboardInterrupt:
+        print("\n⛔ Прервано.")
+    finally:
+        for key, value in counts.items():
+            METRICS.inc(f"recompute_{key}", value)
+        print(f"\n🏁 Пересчёт: изменилось {counts['changed']}, без изменений {counts['unchanged']}, "
+              f"не найдено с новыми параметрами {counts['lost']}, "
+              f"нет локального транскрипта {counts['no_local']}")
+        print(writer.summary())
+        if cache is not None:
+            print(cache.summary())
+        print(match_summary())
+        print(METRICS.summary())
+        METRICS.close()
+        conn.close()
+
+
 # ─── CLI ──────────────────────────────────────────────────────
 
 def main() -> None:
@@ -544,8 +1108,51 @@ def main() -> None:
     p.add_argument("--max-consecutive-errors", type=int,  default=10)
     p.add_argument("--max-duration", type=float, default=15.0,
                    help="Макс. длина фрагмента в секундах (default: 15)")
+    p.add_argument("--exact-only", action="store_true",
+                   help="Искать только исходную запись, без словоформ (running, took off)")
+    p.add_argument("--clip-mode", choices=CLIP_MODES, default="sentence",
+                   help="sentence — окно из целых чанков; word — вокруг метки самого "
+                        "слова до ближайшей паузы / границы предложения")
+    p.add_argument("--clip-min", type=float, default=WORD_CLIP_MIN,
+                   help=f"Мин. длина клипа в режиме word (default: {WORD_CLIP_MIN:g})")
+    p.add_argument("--clip-max", type=float, default=WORD_CLIP_MAX,
+                   help=f"Макс. длина клипа в режиме word (default: {WORD_CLIP_MAX:g})")
+    p.add_argument("--corpus", default=None, metavar="PATH",
+                   help="Офлайн: субтитры из папки или тарбола .json3/.vtt/.srt (без сети)")
+    p.add_argument("--all-words", action="store_true",
+                   help="Пересчитать все слова с videoId, а не только без субтитров")
     p.add_argument("--reprocess-long", type=float, default=0.0, metavar="SEC",
                    help="Перезаписать записи длиннее SEC секунд (напр. --reprocess-long 15)")
+    p.add_argument("--recompute", action="store_true",
+                   help="Пересчитать клипы, нарезанные с другими параметрами, по локальным "
+                        "транскриптам (кеш / --provider file), без сети")
+    p.add_argument("--group-by-video", action="store_true",
+                   help="Качать субтитры каждого видео один раз и искать все его слова разом")
+    p.add_argument("--workers", type=int, default=1,
+                   help="Потоков загрузки (>1 включает конвейер с группировкой по видео)")
+    p.add_argument("--rate", type=float, default=None, metavar="REQ_PER_SEC",
+                   help="Общий лимит запросов в секунду для --workers "
+                        "(default: 1 / средняя пауза sleep_min..sleep_max)")
+
+    # Очередь заданий
+    p.add_argument("--queue", action="store_true",
+                   help="Брать работу из долговечной очереди refine_jobs (с повтором ошибок)")
+    p.add_argument("--queue-status", action="store_true",
+                   help="Показать глубину очереди по состояниям и выйти")
+    p.add_argument("--queue-batch", type=int, default=50,
+                   help="Сколько слов забирать из очереди за раз")
+    p.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                   help="Максимум попыток на задание")
+    p.add_argument("--retry-backoff", type=float, default=DEFAULT_BACKOFF_BASE, metavar="SEC",
+                   help="Базовая пауза перед повтором (удваивается с каждой попыткой)")
+
+    # Источник субтитров, кеш и запись в БД
+    add_provider_args(p, default="json3")
+    add_cache_args(p)
+    add_outcome_args(p)
+    add_change_args(p)
+    add_writer_args(p)
+    add_metrics_args(p)
 
     args = p.parse_args()
     args.sleep_max = max(args.sleep_min, args.sleep_max)
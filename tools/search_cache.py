@@ -0,0 +1,135 @@
+"""
+search_cache.py
+---------------
+Кеш результатов поиска YouTube для check.py и youtube_fragment_mapper.py.
+
+Ключ — нормализованный запрос (terms.term_key), значение — ранжированный
+список кандидатов (id, название, канал, длительность) и время поиска.
+Хранится в search_cache.db рядом с кешем субтитров; записи старше TTL
+считаются промахом.
+
+Повторный запуск (после сбоя или для слова, у первого кандидата которого
+не оказалось субтитров) сначала проходит по сохранённому списку и только
+когда все кандидаты отсеяны — ищет заново, запрашивая больше результатов:
+
+  for entry in walk_candidates(searches, query, 3, search, skip):
+      ...  # первый подходящий — break
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import time
+from typing import Callable, Iterator, Optional
+
+from metrics import METRICS
+from terms import term_key
+
+FILENAME         = "search_cache.db"
+DEFAULT_TTL_DAYS = 14.0
+
+SCHEMA = """
+    PRAGMA journal_mode = WAL;
+    PRAGMA busy_timeout = 5000;
+
+    CREATE TABLE IF NOT EXISTS searches (
+        queryKey   TEXT PRIMARY KEY,
+        query      TEXT NOT NULL,
+        candidates TEXT NOT NULL,
+        searchedAt REAL NOT NULL
+    );
+"""
+
+
+def search_entry(entry: dict) -> dict:
+    """Кандидат из записи ytsearch (extract_flat): только то, что нужно инструментам."""
+    return {"id":       entry["id"],
+            "title":    entry.get("title") or "",
+            "channel":  entry.get("channel") or entry.get("uploader") or "",
+            "duration": entry.get("duration")}
+
+
+class SearchCache:
+    """SQLite-кеш запрос → кандидаты с TTL."""
+
+    def __init__(self, path: str, ttl: float = DEFAULT_TTL_DAYS * 86400):
+        self.path   = path
+        self.ttl    = ttl
+        self.hits   = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def get(self, query: str) -> Optional[list[dict]]:
+        row = self.conn.execute("SELECT candidates, searchedAt FROM searches WHERE queryKey=?",
+                                (term_key(query),)).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            self.misses += 1
+            METRICS.inc("search_cache_miss")
+            return None
+        self.hits += 1
+        METRICS.inc("search_cache_hit")
+        return json.loads(row[0])
+
+    def put(self, query: str, candidates: list[dict]) -> None:
+        with self.conn:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO searches (queryKey, query, candidates, searchedAt)
+                VALUES (?, ?, ?, ?)
+            """, (term_key(query), query, json.dumps(candidates, ensure_ascii=False), time.time()))
+
+    def purge(self) -> int:
+        with self.conn:
+            cur = self.conn.execute("DELETE FROM searches WHERE searchedAt < ?",
+                                    (time.time() - self.ttl,))
+        return cur.rowcount
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def summary(self) -> str:
+        return f"🔎 Кеш поиска: попаданий {self.hits}, промахов {self.misses}"
+
+
+def walk_candidates(cache: Optional[SearchCache], query: str, n: int,
+                    search: Callable[[int], list[dict]],
+                    skip: Callable[[str], bool] = lambda video_id: False) -> Iterator[dict]:
+    """
+    Кандидаты по запросу: сначала сохранённые, затем (если потребитель не
+    остановился — все не подошли) свежий поиск на n результатов больше.
+    skip(videoId) проверяется лениво, так что исходы, записанные во время
+    обхода, уже учитываются. Ошибки search() пробрасываются потребителю.
+    """
+    seen: set[str] = set()
+    cached = cache.get(query) if cache is not None else None
+    if cached is not None:
+        for entry in cached:
+            seen.add(entry["id"])
+            if not skip(entry["id"]):
+                yield entry
+        n += len(cached)
+
+    with METRICS.time("search"):
+        fresh = search(n)
+    if cache is not None:
+        cache.put(query, fresh)
+    for entry in fresh:
+        if entry["id"] not in seen and not skip(entry["id"]):
+            yield entry
+
+
+def add_search_cache_args(p) -> None:
+    p.add_argument("--search-ttl-days", type=float, default=DEFAULT_TTL_DAYS,
+                   help=f"Срок жизни результатов поиска в днях (default: {DEFAULT_TTL_DAYS:g})")
+    p.add_argument("--no-search-cache", action="store_true",
+                   help="Не использовать кеш результатов поиска")
+
+
+def search_cache_from_args(args) -> Optional[SearchCache]:
+    """Кеш поиска в папке кеша субтитров (--cache-dir)."""
+    if args.no_search_cache:
+        return None
+    return SearchCache(os.path.join(args.cache_dir, FILENAME), args.search_ttl_days * 86400)
@@ -0,0 +1,97 @@
+"""
+terms.py
+--------
+Канонический ключ слова: "Apple", "apple " и "take  off" / "take off" — это
+один термин. Инструменты работают с уникальными терминами, а результат
+раскладывают на все строки words с тем же ключом одним executemany по rowid
+(вместо UPDATE ... WHERE original=?, который молча задевает дубли одного
+написания и пропускает остальные).
+
+  terms = group_terms(cur.execute("SELECT rowid, original FROM words ...").fetchall())
+  for term in terms:
+      ... поиск по term.original ...
+      fan_out(conn, "UPDATE words SET videoId=? WHERE rowid=?", (video_id,), term.rowids)
+  print(dedupe_summary(len(rows), len(terms)))
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from vocab_store import iter_rows, update_many
+
+_QUOTES = str.maketrans({"’": "'", "‘": "'", "ʼ": "'", "`": "'"})
+
+
+def term_key(original: Optional[str]) -> str:
+    """NFKC, прямые апострофы, схлопнутые пробелы, casefold."""
+    if not original:
+        return ""
+    text = unicodedata.normalize("NFKC", original).translate(_QUOTES)
+    return " ".join(text.split()).casefold()
+
+
+@dataclass
+class Term:
+    key:      str
+    original: str                       # первое написание, без лишних пробелов
+    rowids:   list[int] = field(default_factory=list)
+
+
+def group_terms(rows: Iterable[tuple[int, str]]) -> list[Term]:
+    """(rowid, original) → уникальные термины в порядке первого появления."""
+    terms: dict[str, Term] = {}
+    for rowid, original in rows:
+        key = term_key(original)
+        if not key:
+            continue
+        term = terms.get(key)
+        if term is None:
+            term = terms[key] = Term(key, " ".join(original.split()))
+        term.rowids.append(rowid)
+    return list(terms.values())
+
+
+def dedupe_rows(rows: list[tuple[int, str, str]]
+                ) -> tuple[list[tuple[int, str, str]], dict[int, list[int]]]:
+    """
+    (rowid, original, videoId) → по одной строке на (термин, видео) и
+    fan-out: rowid оставленной строки → все rowid с тем же термином и видео.
+    """
+    kept: dict[tuple[str, str], tuple[int, str, str]] = {}
+    fanout: dict[int, list[int]] = {}
+    for rowid, original, video_id in rows:
+        key = (term_key(original), video_id or "")
+        first = kept.get(key)
+        if first is None:
+            kept[key] = (rowid, original, video_id)
+            fanout[rowid] = [rowid]
+        else:
+            fanout[first[0]].append(rowid)
+    return list(kept.values()), fanout
+
+
+def resolved_by_key(cur: sqlite3.Cursor, columns: tuple[str, ...],
+                    where: str) -> dict[str, tuple]:
+    """Ключ термина → значения columns первой строки, уже удовлетворяющей where."""
+    result: dict[str, tuple] = {}
+    for original, *values in iter_rows(cur.connection, f"SELECT original, {', '.join(columns)} "
+                                                       f"FROM words WHERE {where} ORDER BY rowid"):
+        result.setdefault(term_key(original), tuple(values))
+    return result
+
+
+def fan_out(conn: sqlite3.Connection, sql: str, values: tuple, rowids: list[int]) -> int:
+    """Один executemany на все строки термина: sql оканчивается на "WHERE rowid=?"."""
+    return update_many(conn, sql, ((*values, rowid) for rowid in rowids))
+
+
+def dedupe_summary(rows: int, terms: int, borrowed: int = 0) -> str:
+    saved = rows - terms
+    line  = f"🔁 Термины: {rows} строк → {terms} уникальных (сэкономлено повторов: {saved})"
+    if borrowed:
+        line += f", взято из готовых дублей без поиска: {borrowed}"
+    return line
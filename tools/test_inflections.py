@@ -0,0 +1,41 @@
+"""
+test_inflections.py
+-------------------
+Проверки словоформ на записях в том виде, как они лежат в vocab.db
+(с заглавной буквы: "Abandon", "Take off").
+
+  python -m pytest tools/test_inflections.py
+"""
+
+from inflections import forms_pattern, is_exact, word_forms
+
+
+def test_capitalized_entry_gets_forms():
+    forms = word_forms("Abandon")
+    assert forms[0] == "Abandon"
+    assert {"abandons", "abandoned", "abandoning"} <= set(forms)
+
+
+def test_capitalized_phrasal_verb():
+    forms = word_forms("Take off")
+    assert forms[0] == "Take off"
+    assert {"took off", "taking off", "taken off"} <= set(forms)
+
+
+def test_long_words_not_doubled():
+    forms = set(word_forms("Abandon"))
+    assert "abandonned" not in forms and "abandonning" not in forms
+    assert "visited" in word_forms("Visit")
+
+
+def test_doubling_one_syllable_and_stressed_final():
+    assert {"stopped", "stopping"} <= set(word_forms("Stop"))
+    assert {"admitted", "admitting"} <= set(word_forms("Admit"))
+    assert "beginning" in word_forms("Begin")
+
+
+def test_pattern_finds_inflected_form_of_db_entry():
+    match = forms_pattern("Abandon").search("They abandoned the ship at dawn.")
+    assert match is not None and match.group(0) == "abandoned"
+    assert not is_exact("Abandon", match.group(0))
+    assert is_exact("Abandon", "abandon")
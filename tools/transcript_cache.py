@@ -0,0 +1,249 @@
+"""
+transcript_cache.py
+-------------------
+Общий дисковый кеш распарсенных субтитров для всех инструментов в tools/.
+
+Ключ — (videoId, язык, формат источника). Значение — список Chunk и,
+если источник его знает, вид дорожки (manual | auto), сжатые zlib. Запись атомарная (временный файл + os.replace), поэтому
+несколько скриптов могут работать с одной папкой одновременно.
+Размер ограничен: при превышении лимита удаляются давно не читанные
+файлы (LRU по mtime, который обновляется при каждом попадании).
+Записи старше TTL считаются промахом и удаляются.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import tempfile
+import time
+import zlib
+from typing import Callable, Optional
+
+from metrics import METRICS
+from transcripts import Chunk
+
+DEFAULT_CACHE_DIR   = "./transcript_cache"
+DEFAULT_MAX_MB      = 512
+DEFAULT_TTL_DAYS    = 30
+CACHE_FORMAT_VERSION = 2   # 2: пословные метки json3 (Chunk.marks)
+# v1 — те же строки без меток: читаются как есть, чтобы не терять скачанное
+_READABLE_VERSIONS  = (1, CACHE_FORMAT_VERSION)
+
+_SAFE_PART = re.compile(r"^[A-Za-z0-9_-]+$")
+_SUFFIX    = ".json.z"
+
+
+def valid_key(video_id: str, lang: str, fmt: str) -> bool:
+    """Годится ли ключ для имени файла кеша (иначе path_for бросит ValueError)."""
+    return all(_SAFE_PART.match(part or "") for part in (video_id, lang, fmt))
+
+
+def _row(c: Chunk) -> list:
+    """[text, start, end] или [text, start, end, [[pos, t], ...]] при наличии меток слов."""
+    if c.marks:
+        return [c.text, c.start, c.end, [list(m) for m in c.marks]]
+    return [c.text, c.start, c.end]
+
+
+def _chunk(row: list) -> Chunk:
+    marks = tuple((pos, t) for pos, t in row[3]) if len(row) > 3 else None
+    return Chunk(text=row[0], start=row[1], end=row[2], marks=marks)
+
+
+class TranscriptCache:
+    """LRU-кеш транскриптов на диске с ограничением размера и TTL."""
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR,
+                 max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024,
+                 ttl: float = DEFAULT_TTL_DAYS * 86400):
+        self.root      = root
+        self.max_bytes = max_bytes
+        self.ttl       = ttl
+        self.hits      = 0
+        self.misses    = 0
+        self._approx_size: int | None = None
+        os.makedirs(root, exist_ok=True)
+
+    # ─── Ключи ────────────────────────────────────────────────
+
+    def path_for(self, video_id: str, lang: str, fmt: str) -> str:
+        for part in (video_id, lang, fmt):
+            if not _SAFE_PART.match(part or ""):
+                raise ValueError(f"Недопустимая часть ключа кеша: {part!r}")
+        return os.path.join(self.root, f"{video_id}.{lang}.{fmt}{_SUFFIX}")
+
+    def contains(self, video_id: str, lang: str, fmt: str) -> bool:
+        return os.path.exists(self.path_for(video_id, lang, fmt))
+
+    def keys(self) -> list[tuple[str, str, str]]:
+        """Все ключи (videoId, lang, fmt), лежащие сейчас в кеше."""
+        result = []
+        for e in self._entries():
+            if e.name.endswith(_SUFFIX) and not e.name.startswith(".tmp-"):
+                parts = e.name[:-len(_SUFFIX)].split(".")
+                if len(parts) == 3:
+                    result.append((parts[0], parts[1], parts[2]))
+        return result
+
+    # ─── Чтение / запись ──────────────────────────────────────
+
+    def get(self, video_id: str, lang: str, fmt: str) -> Optional[list[Chunk]]:
+        track = self.get_track(video_id, lang, fmt)
+        return None if track is None else track[0]
+
+    def get_track(self, video_id: str, lang: str,
+                  fmt: str) -> Optional[tuple[list[Chunk], Optional[str]]]:
+        """(chunks, kind): kind — manual | auto, None — источник его не сообщил."""
+        with METRICS.time("cache_read"):
+            track = self._get(video_id, lang, fmt)
+        METRICS.inc("cache_miss" if track is None else "cache_hit")
+        return track
+
+    def _get(self, video_id: str, lang: str,
+             fmt: str) -> Optional[tuple[list[Chunk], Optional[str]]]:
+        path = self.path_for(video_id, lang, fmt)
+        try:
+            with open(path, "rb") as f:
+                payload = json.loads(zlib.decompress(f.read()))
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError, zlib.error):
+            # Битый файл (например, оборванная запись) — считаем промахом
+            self._discard(path)
+            self.misses += 1
+            return None
+
+        if (payload.get("v") not in _READABLE_VERSIONS
+                or time.time() - payload.get("createdAt", 0) > self.ttl):
+            self._discard(path)
+            self.misses += 1
+            return None
+
+        try:
+            os.utime(path)  # отмечаем использование для LRU
+        except OSError:
+            pass
+        self.hits += 1
+        return [_chunk(row) for row in payload["chunks"]], payload.get("kind")
+
+    def put(self, video_id: str, lang: str, fmt: str, chunks: list[Chunk],
+            kind: Optional[str] = None) -> None:
+        path = self.path_for(video_id, lang, fmt)
+        payload = {
+            "v":         CACHE_FORMAT_VERSION,
+            "videoId":   video_id,
+            "lang":      lang,
+            "fmt":       fmt,
+            "createdAt": time.time(),
+            "chunks":    [_row(c) for c in chunks],
+        }
+        if kind is not None:
+            payload["kind"] = kind   # ручные / автоматические субтитры (clip_ranker)
+        data = zlib.compress(json.dumps(payload, ensure_ascii=False,
+                                        separators=(",", ":")).encode("utf-8"), 6)
+
+        try:
+            replaced = os.stat(path).st_size   # перезапись: старый файл уходит из размера
+        except OSError:
+            replaced = 0
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            self._discard(tmp)
+            raise
+
+        if self._approx_size is None:
+            self._approx_size = self._scan_size()
+        else:
+            self._approx_size += len(data) - replaced
+        if self._approx_size > self.max_bytes:
+            self.evict()
+
+    def get_or_fetch(self, video_id: str, lang: str, fmt: str,
+                     fetch: Callable[[], tuple[list[Chunk], Optional[str]]]) -> list[Chunk]:
+        """
+        Возвращает транскрипт из кеша, иначе вызывает fetch() → (chunks, kind)
+        и кладёт результат в кеш.
+        """
+        chunks = self.get(video_id, lang, fmt)
+        if chunks is None:
+            chunks, kind = fetch()
+            if chunks:
+                self.put(video_id, lang, fmt, chunks, kind)
+        return chunks
+
+    # ─── Вытеснение ───────────────────────────────────────────
+
+    def _entries(self) -> list[os.DirEntry]:
+        try:
+            return [e for e in os.scandir(self.root) if e.is_file()]
+        except FileNotFoundError:
+            return []
+
+    def _scan_size(self) -> int:
+        return sum(e.stat().st_size for e in self._entries() if e.name.endswith(_SUFFIX))
+
+    def evict(self) -> int:
+        """Удаляет самые старые по использованию файлы, пока кеш не влезет в лимит."""
+        now     = time.time()
+        entries = []
+        for e in self._entries():
+            try:
+                st = e.stat()
+            except FileNotFoundError:
+                continue
+            if e.name.startswith(".tmp-"):
+                # Осиротевшие временные файлы от упавших процессов
+                if now - st.st_mtime > 3600:
+                    self._discard(e.path)
+                continue
+            if e.name.endswith(_SUFFIX):
+                entries.append((st.st_mtime, st.st_size, e.path))
+
+        total   = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._discard(path)
+            total   -= size
+            removed += 1
+
+        self._approx_size = total
+        return removed
+
+    @staticmethod
+    def _discard(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def summary(self) -> str:
+        return f"💾 Кеш субтитров: попаданий {self.hits}, промахов {self.misses}"
+
+
+def add_cache_args(p) -> None:
+    """Общие CLI-флаги кеша для всех инструментов."""
+    p.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                   help=f"Папка кеша субтитров (default: {DEFAULT_CACHE_DIR})")
+    p.add_argument("--cache-max-mb", type=float, default=DEFAULT_MAX_MB,
+                   help=f"Максимальный размер кеша в МБ (default: {DEFAULT_MAX_MB})")
+    p.add_argument("--cache-ttl-days", type=float, default=DEFAULT_TTL_DAYS,
+                   help=f"Срок жизни записи в днях (default: {DEFAULT_TTL_DAYS})")
+    p.add_argument("--no-cache", action="store_true",
+                   help="Не использовать кеш субтитров")
+
+
+def cache_from_args(args) -> Optional[TranscriptCache]:
+    if getattr(args, "no_cache", False):
+        return None
+    return TranscriptCache(root=args.cache_dir,
+                           max_bytes=int(args.cache_max_mb * 1024 * 1024),
+                           ttl=args.cache_ttl_days * 86400)
@@ -0,0 +1,328 @@
+"""
+transcript_providers.py
+-----------------------
+Источники субтитров внутри процесса — вместо запуска CLI
+youtube-transcript-api на каждое слово.
+
+Все провайдеры отдают один и тот же список Chunk, поэтому поиск слова и
+кеш у инструментов общие. Имя провайдера — это формат источника в ключе
+TranscriptCache:
+
+  yta    youtube-transcript-api (библиотека, без подпроцесса)
+  json3  yt-dlp json3 (как в refine_segments)
+  file   локальные файлы <папка>/<videoId>.<lang>.json3 | .json | .vtt | .srt
+
+  provider = provider_from_args(args)
+  chunks   = load_transcript(provider, cache, video_id)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from caption_catalog import FILENAME as CATALOG_FILENAME
+from caption_catalog import CaptionCatalog, CatalogEntry, catalog_entry
+from metrics import METRICS
+from transcript_cache import DEFAULT_CACHE_DIR, TranscriptCache
+from transcripts import Chunk, _parse_json3, parse_subtitles
+from ydl_session import SessionPool, YdlSession
+
+PROVIDER_NAMES = ("yta", "json3", "file")
+
+
+class NoTranscript(RuntimeError):
+    """У видео нет субтитров на нужном языке (повторять запрос бессмысленно)."""
+
+
+class TranscriptProvider(ABC):
+    """
+    Базовый класс: fetch(video_id, lang, proxy) → (chunks, lang, kind), где
+    kind — вид дорожки: manual | auto, None — источник его не знает.
+    """
+
+    name      = ""
+    cacheable = True   # класть ли результат в TranscriptCache
+    network   = True   # ходит в сеть: "нет субтитров" — ответ YouTube, его можно запомнить
+
+    @abstractmethod
+    def fetch(self, video_id: str, lang: str = "en",
+              proxy: Optional[str] = None) -> tuple[list[Chunk], str, Optional[str]]:
+        """Субтитры видео; NoTranscript — их нет на языке lang."""
+
+    def reset(self) -> None:
+        """После смены IP: не переиспользовать соединения старого прокси."""
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "TranscriptProvider":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# ─── youtube-transcript-api ───────────────────────────────────
+
+def _yta_chunks(entries) -> list[Chunk]:
+    """Записи get_transcript() (dict) или fetch() (объекты со start/duration/text)."""
+    result = []
+    for e in entries:
+        if isinstance(e, dict):
+            text, start, duration = e["text"], e["start"], e.get("duration", 0.0)
+        else:
+            text, start, duration = e.text, e.start, e.duration
+        result.append(Chunk(text=text, start=start, end=start + duration))
+    return result
+
+
+class YouTubeTranscriptApiProvider(TranscriptProvider):
+    """youtube-transcript-api как библиотека: один клиент на поток и прокси."""
+
+    name = "yta"
+
+    def __init__(self):
+        try:
+            import youtube_transcript_api as yta
+        except ImportError as exc:
+            raise ImportError("pip install youtube-transcript-api") from exc
+        self._yta   = yta
+        self._local = threading.local()
+
+    def _client(self, proxy: Optional[str]):
+        """Клиент 1.x держит HTTP-сессию — создаём его один раз на поток."""
+        local = self._local
+        if getattr(local, "client", None) is None or local.proxy != proxy:
+            proxy_config = None
+            if proxy:
+                from youtube_transcript_api.proxies import GenericProxyConfig
+                proxy_config = GenericProxyConfig(http_url=proxy, https_url=proxy)
+            local.client = self._yta.YouTubeTranscriptApi(proxy_config=proxy_config)
+            local.proxy  = proxy
+        return local.client
+
+    def fetch(self, video_id: str, lang: str = "en",
+              proxy: Optional[str] = None) -> tuple[list[Chunk], str, Optional[str]]:
+        api = self._yta.YouTubeTranscriptApi
+        try:
+            with METRICS.time("download"):
+                if hasattr(api, "fetch"):
+                    entries = self._client(proxy).fetch(video_id, languages=[lang])
+                else:
+                    # youtube-transcript-api < 1.0
+                    proxies = {"http": proxy, "https": proxy} if proxy else None
+                    entries = api.get_transcript(video_id, languages=[lang], proxies=proxies)
+        except (self._yta.NoTranscriptFound, self._yta.TranscriptsDisabled) as exc:
+            raise NoTranscript(f"Субтитры не найдены: {type(exc).__name__}") from exc
+        except Exception as exc:
+            raise RuntimeError(str(exc).strip()[:200] or type(exc).__name__) from exc
+
+        with METRICS.time("parse"):
+            chunks = _yta_chunks(entries)
+        if not chunks:
+            raise NoTranscript("Субтитры не найдены: пустой транскрипт")
+        # 1.x сообщает, автоматическая ли дорожка; get_transcript() (< 1.0) — нет
+        generated = getattr(entries, "is_generated", None)
+        kind = None if generated is None else ("auto" if generated else "manual")
+        return chunks, lang, kind
+
+    def reset(self) -> None:
+        self._local = threading.local()
+
+
+# ─── yt-dlp json3 ─────────────────────────────────────────────
+
+def _build_ydl_opts(proxy: str | None, cookies_file: str | None) -> dict:
+    opts = {
+        "quiet":             True,
+        "no_warnings":       True,
+        "skip_download":     True,
+        "extract_flat":      False,
+        "writesubtitles":    True,
+        "writeautomaticsub": True,
+        "subtitleslangs":    ["en"],
+        "subtitlesformat":   "json3",
+        "retries":           3,
+        "sleep_interval":    1,
+        "max_sleep_interval": 5,
+        "user_agent": (
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+            "AppleWebKit/537.36 (KHTML, like Gecko) "
+            "Chrome/124.0.0.0 Safari/537.36"
+        ),
+    }
+    if proxy:
+        opts["proxy"] = proxy
+    if cookies_file:
+        opts["cookiefile"] = cookies_file
+    return opts
+
+
+def _caption_entry(video_id: str, session: YdlSession, lang: str,
+                   catalog: Optional[CaptionCatalog]) -> CatalogEntry:
+    """Запись каталога дорожек: из каталога, иначе один extract_info()."""
+    entry = catalog.lookup(video_id, lang) if catalog is not None else None
+    if entry is not None:
+        return entry
+
+    url  = f"https://www.youtube.com/watch?v={video_id}"
+    with METRICS.time("meta"):
+        info = session.extract_info(url, download=False)
+
+    if not info:
+        raise RuntimeError("yt-dlp вернул пустой результат")
+
+    # Из полного словаря метаданных оставляем только дорожки субтитров
+    langs = {lang, *(catalog.langs if catalog is not None else ())}
+    entry = catalog_entry(video_id, info, langs)
+    del info
+    return catalog.put(entry) if catalog is not None else entry
+
+
+def fetch_chunks(video_id: str, session: YdlSession, lang: str = "en",
+                 catalog: Optional[CaptionCatalog] = None) -> tuple[list[Chunk], str, str]:
+    entry = _caption_entry(video_id, session, lang, catalog)
+    track = entry.track(lang)
+
+    if track is None:
+        raise NoTranscript("Субтитры на английском не найдены")
+
+    # Скачиваем той же сессией yt-dlp (те же cookies/proxy и соединения)
+    try:
+        with METRICS.time("download"):
+            body = session.urlopen(track.url)
+    except Exception:
+        # Ссылка из каталога могла протухнуть раньше expire — следующая попытка
+        # снова возьмёт её из extract_info()
+        if catalog is not None:
+            catalog.invalidate(video_id)
+        raise
+    METRICS.inc("bytes_downloaded", len(body))
+
+    with METRICS.time("parse"):
+        data   = json.loads(body.decode("utf-8"))
+        chunks = _parse_json3(data)
+    if not chunks:
+        raise RuntimeError("Субтитры пустые после парсинга")
+
+    return chunks, lang, track.kind
+
+
+class YtDlpJson3Provider(TranscriptProvider):
+    """Субтитры json3 через yt-dlp; один YoutubeDL на поток на весь запуск."""
+
+    name = "json3"
+
+    def __init__(self, cookies_file: Optional[str] = None,
+                 catalog: Optional[CaptionCatalog] = None):
+        try:
+            from yt_dlp import YoutubeDL
+        except ImportError as exc:
+            raise ImportError("pip install yt-dlp") from exc
+        self.sessions = SessionPool(lambda proxy: _build_ydl_opts(proxy, cookies_file),
+                                    factory=YoutubeDL)
+        self.catalog  = catalog
+
+    def fetch(self, video_id: str, lang: str = "en",
+              proxy: Optional[str] = None) -> tuple[list[Chunk], str, Optional[str]]:
+        return fetch_chunks(video_id, self.sessions.get(proxy), lang, self.catalog)
+
+    def reset(self) -> None:
+        self.sessions.invalidate()
+
+    def close(self) -> None:
+        self.sessions.close()
+        if self.catalog is not None:
+            self.catalog.close()
+
+
+# ─── Локальные файлы ──────────────────────────────────────────
+
+class LocalFileProvider(TranscriptProvider):
+    """
+    Субтитры из папки: <videoId>.<lang>.<ext>, где ext — json3 (формат YouTube),
+    json (вывод youtube-transcript-api --format json), vtt или srt.
+    """
+
+    name      = "file"
+    cacheable = False  # файлы и так локальные
+    network   = False  # нет файла — ещё не значит, что у видео нет субтитров
+    exts      = ("json3", "json", "vtt", "srt")
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def fetch(self, video_id: str, lang: str = "en",
+              proxy: Optional[str] = None) -> tuple[list[Chunk], str, Optional[str]]:
+        for ext in self.exts:
+            path = os.path.join(self.root, f"{video_id}.{lang}.{ext}")
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding="utf-8-sig") as f, METRICS.time("parse"):
+                chunks = parse_subtitles(f.read(), ext)
+            if not chunks:
+                raise RuntimeError(f"Субтитры пустые после парсинга: {path}")
+            return chunks, lang, None
+        raise NoTranscript(f"Субтитры не найдены в {self.root}")
+
+
+# ─── Общий путь загрузки ──────────────────────────────────────
+
+def load_transcript(provider: TranscriptProvider, cache: Optional[TranscriptCache],
+                    video_id: str, lang: str = "en",
+                    proxy: Optional[str] = None) -> list[Chunk]:
+    """Транскрипт из кеша под форматом провайдера, иначе из самого провайдера."""
+    def fetch():
+        chunks, _lang, kind = provider.fetch(video_id, lang, proxy)
+        return chunks, kind
+
+    if cache is None or not provider.cacheable:
+        return fetch()[0]
+    return cache.get_or_fetch(video_id, lang, provider.name, fetch)
+
+
+def add_provider_args(p, default: str = "yta") -> None:
+    """Общие CLI-флаги выбора источника субтитров."""
+    p.add_argument("--provider", choices=PROVIDER_NAMES, default=default,
+                   help=f"Источник субтитров (default: {default})")
+    p.add_argument("--transcripts-dir", default="./transcripts",
+                   help="Папка с файлами субтитров для --provider file")
+    p.add_argument("--no-caption-catalog", action="store_true",
+                   help="Не запоминать дорожки субтитров видео (--provider json3): "
+                        "extract_info() на каждую загрузку")
+
+
+def is_network(name: str) -> bool:
+    """Ходит ли провайдер --provider name в сеть (до его создания)."""
+    return name != LocalFileProvider.name
+
+
+def make_provider(name: str, cookies_file: Optional[str] = None,
+                  transcripts_dir: str = "./transcripts",
+                  catalog: Optional[CaptionCatalog] = None) -> TranscriptProvider:
+    if name == "yta":
+        return YouTubeTranscriptApiProvider()
+    if name == "json3":
+        return YtDlpJson3Provider(cookies_file, catalog)
+    if name == "file":
+        return LocalFileProvider(transcripts_dir)
+    raise ValueError(f"неизвестный провайдер субтитров: {name}")
+
+
+def provider_from_args(args, cookies_file: Optional[str] = None) -> TranscriptProvider:
+    """Провайдер по --provider; без нужной библиотеки — сообщение и выход, как в инструментах."""
+    catalog = None
+    if args.provider == "json3" and not args.no_caption_catalog:
+        # Каталог лежит рядом с кешем субтитров (--cache-dir, если он есть у инструмента)
+        cache_dir = getattr(args, "cache_dir", DEFAULT_CACHE_DIR)
+        catalog   = CaptionCatalog(os.path.join(cache_dir, CATALOG_FILENAME))
+        catalog.purge()
+    try:
+        return make_provider(args.provider, cookies_file, args.transcripts_dir, catalog)
+    except ImportError as exc:
+        print(f"❌ {exc}")
+        raise SystemExit(1)
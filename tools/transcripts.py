@@ -0,0 +1,629 @@
+"""
+transcripts.py
+--------------
+Общие структуры субтитров для инструментов в tools/: Chunk, парсинг json3
+и поиск предложения со словом.
+
+Клипы бывают двух видов: "sentence" — окно из целых чанков вокруг слова
+(до max_duration, обычно 10–15 с), и "word" — по пословным меткам времени
+json3 (tOffsetMs) вокруг самого слова до ближайшей паузы или границы
+предложения (обычно 3–6 с).
+
+С inflect=True слово ищется и в словоформах (inflections.word_forms):
+"run" находится в "running", "take off" — в "took off". Точная форма
+в приоритете, остальные — если её в транскрипте нет.
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import re
+from array import array
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional
+
+from inflections import word_forms
+
+
+Marks = tuple[tuple[int, float], ...]
+
+
+@dataclass
+class Chunk:
+    text:  str
+    start: float
+    end:   float
+    # Пословные метки: (позиция символа в text, время начала); None — только start/end
+    marks: Optional[Marks] = None
+
+
+def _json3_events(data: dict) -> Iterator[tuple[str, float, float, Optional[list]]]:
+    """
+    Сырые события json3 без очистки: (склеенный текст сегментов, start, end, segs),
+    где segs — [(текст сегмента, время начала)] для пословных событий, иначе None.
+    """
+    for event in data.get("events", []):
+        start_ms = event.get("tStartMs", 0)
+        dur_ms   = event.get("dDurationMs", 0)
+        segs     = event.get("segs", [])
+        text = "".join(s.get("utf8", "") for s in segs).strip()
+        timed = None
+        if len(segs) > 1:
+            timed = [(s.get("utf8", ""), (start_ms + s.get("tOffsetMs", 0)) / 1000.0) for s in segs]
+        yield text, start_ms / 1000.0, (start_ms + dur_ms) / 1000.0, timed
+
+
+def _parse_json3(data: dict) -> list[Chunk]:
+    result: list[Chunk] = []
+    for text, start, end, segs in _json3_events(data):
+        text = _clean(text)
+        if text:
+            result.append(Chunk(text=text, start=start, end=end,
+                                marks=_seg_marks(text, segs) if segs else None))
+    return result
+
+
+def _seg_marks(text: str, segs: list[tuple[str, float]]) -> Optional[Marks]:
+    """Метки сегментов в координатах очищенного текста; выкинутые _clean сегменты пропускаются."""
+    marks: list[tuple[int, float]] = []
+    pos = 0
+    for seg_text, t in segs:
+        tokens = seg_text.split()
+        if not tokens:
+            continue
+        i = text.find(tokens[0], pos)
+        if i < 0:
+            continue  # например, [Music]
+        if not marks or marks[-1][0] != i:
+            marks.append((i, t))
+        pos = i + len(tokens[0])
+    return tuple(marks) if len(marks) > 1 else None
+
+
+def _clean(text: str) -> str:
+    text = text.replace("\n", " ")
+    text = re.sub(r"\[(?:music|applause|laughter|noise|\s)+\]", "", text, flags=re.IGNORECASE)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+# ─── VTT / SRT ────────────────────────────────────────────────
+
+_CUE_TIME = re.compile(
+    r"^\s*((?:\d+:)?\d{1,2}:\d{2}[.,]\d{1,3})\s*-->\s*((?:\d+:)?\d{1,2}:\d{2}[.,]\d{1,3})")
+_CUE_TAG  = re.compile(r"<[^>]*>|\{\\[^}]*\}")
+
+
+def _cue_seconds(stamp: str) -> float:
+    parts = stamp.replace(",", ".").split(":")
+    seconds = float(parts[-1])
+    for i, part in enumerate(reversed(parts[:-1]), start=1):
+        seconds += int(part) * 60 ** i
+    return seconds
+
+
+def _parse_cues(text: str) -> list[Chunk]:
+    """
+    Общий разбор VTT и SRT: блоки через пустую строку, строка таймингов
+    "a --> b", дальше текст. Теги (<c>, <00:00:01.500>, <i>, {\\an8}) убираются.
+    В автосубтитрах YouTube каждая реплика повторяет строку предыдущей —
+    такие повторы отбрасываются.
+    """
+    result: list[Chunk] = []
+    prev_lines: set[str] = set()
+    # Граница реплики — только пустая строка: строка из пробела в VTT YouTube часть реплики
+    for block in re.split(r"\n\n+", text.replace("\r\n", "\n").replace("\r", "\n")):
+        lines = block.split("\n")
+        for i, line in enumerate(lines):
+            m = _CUE_TIME.match(line)
+            if m:
+                break
+        else:
+            continue  # заголовок WEBVTT, NOTE, STYLE, номер без таймингов
+
+        cue_lines = [_CUE_TAG.sub("", l).strip() for l in lines[i + 1:]]
+        cue_lines = [l for l in cue_lines if l]
+        while cue_lines and cue_lines[0] in prev_lines:
+            cue_lines.pop(0)
+        if cue_lines:
+            prev_lines = set(cue_lines)
+        text_ = _clean(" ".join(cue_lines))
+        if text_:
+            result.append(Chunk(text=text_,
+                                start=_cue_seconds(m.group(1)),
+                                end=_cue_seconds(m.group(2))))
+    return result
+
+
+def _parse_vtt(text: str) -> list[Chunk]:
+    return _parse_cues(text)
+
+
+def _parse_srt(text: str) -> list[Chunk]:
+    return _parse_cues(text)
+
+
+def parse_subtitles(data: str, fmt: str) -> list[Chunk]:
+    """Текст файла субтитров → Chunk; fmt: "json3" | "json" | "vtt" | "srt"."""
+    if fmt in ("json3", "json"):
+        parsed = json.loads(data)
+        if isinstance(parsed, dict):
+            return _parse_json3(parsed)
+        # Вывод youtube-transcript-api --format json: [{text, start, duration}]
+        return [Chunk(text=e["text"], start=e["start"], end=e["start"] + e.get("duration", 0.0))
+                for e in parsed]
+    if fmt == "vtt":
+        return _parse_vtt(data)
+    if fmt == "srt":
+        return _parse_srt(data)
+    raise ValueError(f"неизвестный формат субтитров: {fmt}")
+
+
+# ─── Поиск слова ──────────────────────────────────────────────
+
+_SENTENCE_END = re.compile(r"[.!?…]\s*$")
+_SENTENCE_END_CHARS = (".", "!", "?", "…")
+_WORD_CHAR    = re.compile(r"\w")
+_TRIE_END     = ""
+# Меньше стольких слов общий проход дороже отдельных поисков с быстрым сканом литерала
+_BATCH_MIN_WORDS = 8
+
+# Версия алгоритма нарезки (find_sentence / word_clip / словоформы): записывается
+# в clip_params вместе с параметрами. Увеличивать, когда меняется результат.
+CLIP_ALGO_VERSION = 1
+
+CLIP_MODES    = ("sentence", "word")
+WORD_CLIP_MIN = 3.0    # клип по слову: целевая длина, с
+WORD_CLIP_MAX = 6.0
+_PAUSE_GAP    = 0.8    # пауза: между началами соседних слов не меньше, с
+_WORD_PAD     = 0.2
+_TOKEN        = re.compile(r"\S+")
+
+
+def find_sentence(chunks: list[Chunk], word: str,
+                  max_expand: int = 6,
+                  max_duration: float = 15.0,
+                  mode: str = "sentence",
+                  clip_min: float = WORD_CLIP_MIN,
+                  clip_max: float = WORD_CLIP_MAX,
+                  inflect: bool = False) -> Optional[tuple[float, float, str]]:
+    """
+    Ищет слово в субтитрах и возвращает фрагмент не длиннее max_duration секунд.
+    Центрирует окно вокруг чанка со словом. mode="word" — клип по меткам
+    слов длиной clip_min..clip_max (см. Transcript.word_clip).
+    """
+    if mode == "word" or inflect:
+        return Transcript(chunks).find_sentences([word], max_expand, max_duration, mode,
+                                                 clip_min, clip_max, inflect)[word]
+    pattern = re.compile(r"(?<!\w)" + re.escape(word) + r"(?!\w)", re.IGNORECASE)
+    hit = next((i for i, c in enumerate(chunks) if pattern.search(c.text)), None)
+    if hit is None:
+        return None
+
+    return _clip_window(chunks, hit,
+                        lambda i: _SENTENCE_END.search(chunks[i].text) is not None,
+                        max_expand, max_duration)
+
+
+def find_sentences(chunks: list[Chunk], words: list[str],
+                   max_expand: int = 6,
+                   max_duration: float = 15.0,
+                   mode: str = "sentence",
+                   clip_min: float = WORD_CLIP_MIN,
+                   clip_max: float = WORD_CLIP_MAX,
+                   inflect: bool = False) -> dict[str, Optional[tuple[float, float, str]]]:
+    """
+    Пакетный find_sentence(): все слова ищутся за один проход по транскрипту.
+    Результат для каждого слова совпадает с find_sentence(chunks, word).
+    """
+    return Transcript(chunks).find_sentences(words, max_expand, max_duration,
+                                             mode, clip_min, clip_max, inflect)
+
+
+class Transcript:
+    """
+    Компактный транскрипт для многократного поиска: строится один раз на видео.
+
+    Вместо списка Chunk — массивы start/end, битовая карта концов предложений,
+    префиксные смещения в одном склеенном через "\n" текстовом буфере и
+    индексы ближайших границ предложения слева/справа от каждого чанка.
+    Окно клипа выбирается через bisect, предложение — срезом буфера.
+    """
+
+    __slots__ = ("n", "starts", "ends", "text", "offsets", "boundary",
+                 "prev_end", "next_end", "starts_sorted", "ends_sorted", "_display", "marks")
+
+    def __init__(self, chunks: list[Chunk]):
+        n = self.n  = len(chunks)
+        self.starts = array("d", (c.start for c in chunks))
+        self.ends   = array("d", (c.end for c in chunks))
+        self.text   = "\n".join(c.text for c in chunks)
+        self.marks  = [c.marks for c in chunks]
+
+        offsets = array("l", [0]) * (n + 1)
+        pos = 0
+        for i, c in enumerate(chunks):
+            offsets[i] = pos
+            pos += len(c.text) + 1
+        offsets[n] = pos
+        self.offsets = offsets
+
+        # То же, что _SENTENCE_END, но без regex: последний непробельный символ
+        self.boundary = bytearray(c.text.rstrip()[-1:] in _SENTENCE_END_CHARS for c in chunks)
+
+        # Ближайший конец предложения строго левее i и не левее i
+        prev_end, last = array("l", [0]) * n, -1
+        for i in range(n):
+            prev_end[i] = last
+            if self.boundary[i]:
+                last = i
+        next_end, nxt = array("l", [0]) * n, n
+        for i in range(n - 1, -1, -1):
+            if self.boundary[i]:
+                nxt = i
+            next_end[i] = nxt
+        self.prev_end, self.next_end = prev_end, next_end
+
+        self.starts_sorted = all(self.starts[i] <= self.starts[i + 1] for i in range(n - 1))
+        self.ends_sorted   = all(self.ends[i] <= self.ends[i + 1] for i in range(n - 1))
+
+        # Буфер для текста предложений: совпадает с text, если чанки уже
+        # нормализованы (_clean схлопывает пробелы), иначе хранится отдельно
+        normalized = [" ".join(c.text.split()) for c in chunks]
+        if all(normalized[i] == c.text and c.text for i, c in enumerate(chunks)):
+            self._display = None
+        else:
+            self._display = normalized
+
+    def chunk_text(self, i: int) -> str:
+        return self.text[self.offsets[i]:self.offsets[i + 1] - 1]
+
+    # ─── Поиск ────────────────────────────────────────────────
+
+    def find_sentences(self, words: list[str], max_expand: int = 6,
+                       max_duration: float = 15.0, mode: str = "sentence",
+                       clip_min: float = WORD_CLIP_MIN,
+                       clip_max: float = WORD_CLIP_MAX,
+                       inflect: bool = False) -> dict[str, Optional[tuple[float, float, str]]]:
+        matches = self.find_matches(words, max_expand, max_duration, mode,
+                                    clip_min, clip_max, inflect)
+        return {w: (None if m is None else m[0]) for w, m in matches.items()}
+
+    def find_matches(self, words: list[str], max_expand: int = 6,
+                     max_duration: float = 15.0, mode: str = "sentence",
+                     clip_min: float = WORD_CLIP_MIN,
+                     clip_max: float = WORD_CLIP_MAX, inflect: bool = False,
+                     ) -> dict[str, Optional[tuple[tuple[float, float, str], str]]]:
+        """Как find_sentences(), но вместе с клипом отдаёт совпавшую форму слова."""
+        result: dict[str, Optional[tuple[tuple[float, float, str], str]]] = {}
+        for w, m in self.match(words, inflect).items():
+            if m is None:
+                result[w] = None
+                continue
+            hit, form = m
+            if mode == "word":
+                result[w] = self.word_clip(hit, form, clip_min, clip_max), form
+            else:
+                result[w] = self.clip(hit, max_expand, max_duration), form
+        return result
+
+    def match(self, words: list[str], inflect: bool = False) -> dict[str, Optional[tuple[int, str]]]:
+        """
+        Первый чанк со словом и совпавшая форма. С inflect ищутся и словоформы:
+        точная форма в приоритете, иначе — самая ранняя из словоформ.
+        """
+        if not inflect:
+            return {w: (None if hit is None else (hit, w))
+                    for w, hit in self.first_hits(words).items()}
+
+        forms = {w: word_forms(w) for w in words}
+        hits  = self.first_hits(list(dict.fromkeys(f for fs in forms.values() for f in fs)))
+        result: dict[str, Optional[tuple[int, str]]] = {}
+        for w, fs in forms.items():
+            if hits[w] is not None:
+                result[w] = hits[w], w
+            else:
+                found = [(hits[f], f) for f in fs[1:] if hits[f] is not None]
+                result[w] = min(found) if found else None
+        return result
+
+    def first_hits(self, words: list[str]) -> dict[str, Optional[int]]:
+        """
+        Индекс первого чанка с каждым словом. По буферу один раз проходит
+        общее регулярное выражение-trie с теми же границами (?<!\w)…(?!\w),
+        что и в find_sentence().
+        """
+        hits: dict[str, Optional[int]] = {}
+        by_key: dict[str, list[str]] = {}
+        for word in words:
+            if word in hits:
+                continue
+            hits[word] = None
+            key = word.lower()
+            if not word or "\n" in word or len(key) != len(word):
+                # Редкие случаи, где склейка или регистр меняют семантику, — по-старому
+                pattern = re.compile(r"(?<!\w)" + re.escape(word) + r"(?!\w)", re.IGNORECASE)
+                hits[word] = next((i for i in range(self.n)
+                                   if pattern.search(self.chunk_text(i))), None)
+            else:
+                by_key.setdefault(key, []).append(word)
+
+        if not by_key or not self.n:
+            return hits
+
+        text, offsets = self.text, self.offsets
+
+        if len(by_key) < _BATCH_MIN_WORDS:
+            # Мало слов — отдельный поиск по буферу быстрее общего прохода
+            for key, ws in by_key.items():
+                pattern = re.compile(r"(?<!\w)" + re.escape(ws[0]) + r"(?!\w)", re.IGNORECASE)
+                m = pattern.search(text)
+                if m:
+                    idx = bisect.bisect_right(offsets, m.start()) - 1
+                    for word in ws:
+                        hits[word] = idx
+            return hits
+
+        keys    = sorted(by_key, key=len)
+        pattern = re.compile(r"(?<!\w)(?=(" + _trie_regex(keys) + r")(?!\w))", re.IGNORECASE)
+        pending = set(by_key)
+        for m in pattern.finditer(text):
+            p = m.start()
+            first = m.group(1).lower()
+            # Регулярка возвращает самое длинное совпадение в позиции; более короткие
+            # ключи-префиксы тоже могут совпадать здесь — проверяем их отдельно
+            matched = [key for key in (first[:n] for n in range(1, len(first) + 1))
+                       if key in pending
+                       and (len(key) == len(first) or not _WORD_CHAR.match(text, p + len(key)))]
+            if not matched:
+                continue
+            idx = bisect.bisect_right(offsets, p) - 1
+            for key in matched:
+                pending.discard(key)
+                for word in by_key[key]:
+                    hits[word] = idx
+            if not pending:
+                break
+
+        return hits
+
+    def clip(self, hit: int, max_expand: int = 6,
+             max_duration: float = 15.0) -> tuple[float, float, str]:
+        """То же окно, что и _clip_window(), но на массивах без обхода чанков."""
+        starts, ends = self.starts, self.ends
+
+        # Расширение до границ предложения — по предвычисленным индексам
+        left  = max(hit - max_expand, self.prev_end[hit] + 1)
+        right = min(hit + max_expand, self.next_end[hit], self.n - 1)
+
+        clip_start = max(starts[left], starts[hit] - max_duration / 2.0)
+        clip_end   = clip_start + max_duration
+
+        # Сужаем left/right чтобы вписаться в окно
+        if self.starts_sorted:
+            left = bisect.bisect_left(starts, clip_start, left, hit)
+        else:
+            while left < hit and starts[left] < clip_start:
+                left += 1
+        if self.ends_sorted:
+            right = max(hit, bisect.bisect_right(ends, clip_end, hit + 1, right + 1) - 1)
+        else:
+            while right > hit and ends[right] > clip_end:
+                right -= 1
+
+        final_start = starts[left]
+        final_end   = ends[right]
+        if final_end - final_start > max_duration:
+            left = right = hit
+            final_start = starts[hit]
+            final_end   = ends[hit]
+
+        if self._display is None:
+            sentence = self.text[self.offsets[left]:self.offsets[right + 1] - 1].replace("\n", " ")
+        else:
+            sentence = re.sub(r"\s+", " ", " ".join(self._display[left:right + 1])).strip()
+
+        pad_start = max(0.0, final_start - 0.5)
+        pad_end   = final_end + 0.5
+        if pad_end - pad_start > max_duration:
+            pad_end = pad_start + max_duration
+
+        return round(pad_start, 2), round(pad_end, 2), sentence
+
+    # ─── Клип по слову ────────────────────────────────────────
+
+    def _chunk_end(self, i: int) -> float:
+        """Конец чанка без наложения на следующий (в автосубтитрах события перекрываются)."""
+        end = self.ends[i]
+        if i + 1 < self.n and self.starts[i + 1] > self.starts[i]:
+            end = min(end, self.starts[i + 1])
+        return max(end, self.starts[i])
+
+    def token_times(self, i: int) -> list[tuple[int, int, float, float]]:
+        """
+        Слова чанка i: (начало, конец в тексте чанка, время начала, время конца).
+        Между метками json3 (и без них — между start/end чанка) время
+        интерполируется по позиции символа.
+        """
+        text  = self.chunk_text(i)
+        start = self.starts[i]
+        end   = self._chunk_end(i)
+        anchors = list(self.marks[i] or ())
+        if not anchors or anchors[0][0] > 0:
+            anchors.insert(0, (0, start))
+        anchors.append((len(text), max(end, anchors[-1][1])))
+
+        tokens: list[tuple[int, int, float, float]] = []
+        a = 0
+        for m in _TOKEN.finditer(text):
+            cs = m.start()
+            while a + 2 < len(anchors) and anchors[a + 1][0] <= cs:
+                a += 1
+            (p0, t0), (p1, t1) = anchors[a], anchors[a + 1]
+            t = t0 if p1 == p0 else t0 + (t1 - t0) * (cs - p0) / (p1 - p0)
+            tokens.append((cs, m.end(), t, end))
+        for j in range(len(tokens) - 1):
+            cs, ce, t, _ = tokens[j]
+            tokens[j] = (cs, ce, t, max(t, tokens[j + 1][2]))
+        return tokens
+
+    def word_clip(self, hit: int, word: str, clip_min: float = WORD_CLIP_MIN,
+                  clip_max: float = WORD_CLIP_MAX) -> tuple[float, float, str]:
+        """
+        Клип вокруг самого слова: от ближайшей слева паузы / начала предложения
+        до ближайшей справа паузы / конца предложения, в пределах clip_max
+        и не короче clip_min (добирается поровну с обеих сторон).
+        """
+        m = re.compile(r"(?<!\w)" + re.escape(word) + r"(?!\w)",
+                       re.IGNORECASE).search(self.chunk_text(hit))
+        if m is None or not self.starts_sorted:
+            return self.clip(hit, max_duration=clip_max)
+
+        lo, hi = max(0, hit - 3), min(self.n - 1, hit + 3)
+        times: list[tuple[float, float]] = []
+        texts: list[str] = []
+        k = k_end = -1
+        for i in range(lo, hi + 1):
+            chunk_text = self.chunk_text(i)
+            for cs, ce, t0, t1 in self.token_times(i):
+                if i == hit:
+                    if k < 0 and ce > m.start():
+                        k = len(times)
+                    if cs < m.end():
+                        k_end = len(times)
+                times.append((t0, t1))
+                texts.append(chunk_text[cs:ce])
+        last = len(times) - 1
+
+        def starts_phrase(j: int) -> bool:
+            if j == 0:
+                return lo == 0
+            return (texts[j - 1].endswith(_SENTENCE_END_CHARS)
+                    or times[j][0] - times[j - 1][0] >= _PAUSE_GAP)
+
+        def ends_phrase(j: int) -> bool:
+            if j == last:
+                return hi == self.n - 1
+            return (texts[j].endswith(_SENTENCE_END_CHARS)
+                    or times[j + 1][0] - times[j][0] >= _PAUSE_GAP)
+
+        w0, w1 = times[k][0], times[k_end][1]
+        reach  = max(0.0, clip_max - (w1 - w0)) / 2.0
+        fallback = min(reach, clip_min / 2.0)
+
+        # Влево — до ближайшей границы фразы, иначе на половину минимальной длины
+        left, j = None, k
+        while j >= 0 and w0 - times[j][0] <= reach:
+            if starts_phrase(j):
+                left = j
+                break
+            j -= 1
+        if left is None:
+            left = k
+            while left > 0 and w0 - times[left - 1][0] <= fallback:
+                left -= 1
+
+        right, j = None, k_end
+        while j <= last and times[j][1] - w1 <= reach:
+            if ends_phrase(j):
+                right = j
+                break
+            j += 1
+        if right is None:
+            right = k_end
+            while right < last and times[right + 1][1] - w1 <= fallback:
+                right += 1
+
+        start, end = times[left][0], times[right][1]
+        if end - start < clip_min:
+            grow  = (clip_min - (end - start)) / 2.0
+            start = max(0.0, start - grow)
+            end   = start + max(clip_min, end - start + grow)
+            # Слова, целиком попавшие в расширенное окно, — в текст клипа
+            while left > 0 and times[left - 1][0] >= start:
+                left -= 1
+            while right < last and times[right + 1][1] <= end:
+                right += 1
+
+        pad_start = max(0.0, start - _WORD_PAD)
+        pad_end   = end + _WORD_PAD
+        if pad_end - pad_start > clip_max:
+            pad_start, pad_end = start, min(end, start + clip_max)
+
+        sentence = " ".join(texts[left:right + 1])
+        return round(pad_start, 2), round(pad_end, 2), sentence
+
+
+def _trie_regex(keys: list[str]) -> str:
+    """Регулярка-trie по набору строк; на каждой развилке сначала пробуется более длинное продолжение."""
+    root: dict = {}
+    for key in keys:
+        node = root
+        for ch in key:
+            node = node.setdefault(ch, {})
+        node[_TRIE_END] = {}
+
+    def build(node: dict) -> str:
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch != _TRIE_END]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        if _TRIE_END in node:
+            return "(?:" + body + ")?"
+        return body
+
+    return build(root)
+
+
+def _clip_window(chunks: list[Chunk], hit: int, is_end: Callable[[int], bool],
+                 max_expand: int, max_duration: float) -> tuple[float, float, str]:
+    """Окно вокруг чанка hit: расширение до границ предложения и обрезка до max_duration."""
+    # Расширяем влево до границы предложения
+    left = hit
+    while left > 0 and (hit - left) < max_expand:
+        if is_end(left - 1):
+            break
+        left -= 1
+
+    # Расширяем вправо до границы предложения
+    right = hit
+    while right < len(chunks) - 1 and (right - hit) < max_expand:
+        if is_end(right):
+            break
+        right += 1
+        if is_end(right):
+            break
+
+    # Обрезаем если фрагмент длиннее max_duration секунд
+    # Центрируем окно вокруг чанка со словом
+    word_start = chunks[hit].start
+    word_end   = chunks[hit].end
+    half       = max_duration / 2.0
+
+    clip_start = max(chunks[left].start, word_start - half)
+    clip_end   = clip_start + max_duration
+
+    # Сужаем left/right чтобы вписаться в окно
+    while left < hit and chunks[left].start < clip_start:
+        left += 1
+    while right > hit and chunks[right].end > clip_end:
+        right -= 1
+
+    # Финальная проверка длины — если всё ещё длиннее, берём только чанк со словом
+    final_start = chunks[left].start
+    final_end   = chunks[right].end
+    if final_end - final_start > max_duration:
+        left = right = hit
+        final_start = chunks[hit].start
+        final_end   = chunks[hit].end
+
+    sentence = re.sub(r"\s+", " ",
+                      " ".join(c.text for c in chunks[left:right + 1])).strip()
+
+    # Небольшой контекст вокруг (но не выходим за max_duration)
+    pad_start = max(0.0, final_start - 0.5)
+    pad_end   = final_end + 0.5
+    if pad_end - pad_start > max_duration:
+        pad_end = pad_start + max_duration
+
+    return round(pad_start, 2), round(pad_end, 2), sentence
@@ -1,28 +1,39 @@
 #!/usr/bin/env python3
-import sqlite3
+import argparse
 import time
 import random
-import json
-import subprocess
 
-def get_precise_range(v_id, target_word):
+from db_writer import add_writer_args, writer_from_args
+from inflections import forms_pattern
+from metrics import METRICS, add_metrics_args, metrics_from_args, profiled
+from outcomes import add_outcome_args, outcomes_from_args
+from transcript_cache import add_cache_args, cache_from_args
+from transcript_providers import (NoTranscript, add_provider_args, load_transcript,
+                                  provider_from_args)
+from vocab_store import connect
+
+def get_precise_range(v_id, target_word, provider, cache=None, outcomes=None, writer=None):
     """Скачивает субтитры и находит идеальный узкий таймкод для слова"""
     try:
-        # Вызываем CLI инструмент для получения JSON субтитров
-        cmd = ["youtube-transcript-api", v_id, "--format", "json"]
-        result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8')
-        
-        if result.returncode != 0:
+        # Субтитры из общего кеша (или от провайдера, в том же процессе)
+        try:
+            transcript = load_transcript(provider, cache, v_id)
+        except NoTranscript:
+            if outcomes is not None:   # исход — в той же пачке BatchWriter
+                outcomes.add_to(writer, v_id, "no_subs")
+            return None
+        except RuntimeError:
             return None
 
-        transcript = json.loads(result.stdout)
-        word_low = target_word.lower()
+        # Исходная запись и словоформы целыми словами: run → running/ran,
+        # take off → took off, но "is" не найдётся внутри "this"
+        pattern = forms_pattern(target_word)
         
         for i, entry in enumerate(transcript):
-            if word_low in entry['text'].lower():
+            if pattern.search(entry.text):
                 # Нашли! Теперь делаем красивый "надрез"
-                raw_start = entry['start']
-                raw_duration = entry.get('duration', 5.0)
+                raw_start = entry.start
+                raw_duration = entry.end - entry.start
                 
                 # Логика обрезки:
                 # Начинаем за 2 секунды до (чтобы фраза не обрывалась)
@@ -32,46 +43,85 @@ def get_precise_range(v_id, target_word):
                 new_end = raw_start + raw_duration + 3.0
                 
                 # Формируем чистый текст предложения
-                clean_text = entry['text'].replace('\n', ' ')
+                clean_text = entry.text.replace('\n', ' ')
                 if i + 1 < len(transcript):
-                    clean_text += " " + transcript[i+1]['text'].replace('\n', ' ')
+                    clean_text += " " + transcript[i+1].text.replace('\n', ' ')
                 
                 return round(new_start, 2), round(new_end, 2), clean_text.strip()
+        if outcomes is not None:
+            outcomes.add_to(writer, v_id, "not_found", target_word)
         return None
     except:
         return None
 
 def main():
-    db_path = "./vocab.db"
-    conn = sqlite3.connect(db_path)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default="./vocab.db")
+    add_provider_args(parser)
+    add_cache_args(parser)
+    add_writer_args(parser)
+    add_outcome_args(parser)
+    add_metrics_args(parser)
+    args = parser.parse_args()
+    metrics_from_args(args, "trim_segments")
+    provider = provider_from_args(args)
+    # Транскрипты кешируются под форматом источника (провайдера)
+    cache = cache_from_args(args)
+
+    conn = connect(args.db)
     cur = conn.cursor()
+    # Видео без субтитров / слова, которых нет в видео, — пропускаем без сети
+    outcomes = outcomes_from_args(conn, args, network=provider.network)
 
     # Выбираем слова, где видео уже привязано
-    cur.execute("SELECT original, videoId FROM words WHERE videoId != '' AND videoId IS NOT NULL")
+    cur.execute("SELECT rowid, original, videoId FROM words WHERE videoId != '' AND videoId IS NOT NULL")
     rows = cur.fetchall()
 
     print(f"✂️ Начинаем ювелирную подрезку для {len(rows)} слов...")
 
-    for word, v_id in rows:
-        print(f"🎯 Оптимизируем '{word}'...", end=" ", flush=True)
-        
-        result = get_precise_range(v_id, word)
-        
-        if result:
-            start, end, text = result
-            cur.execute("""
-                UPDATE words 
-                SET startTime = ?, endTime = ?, subtitleText = ? 
-                WHERE original = ? AND videoId = ?
-            """, (start, end, text, word, v_id))
-            conn.commit()
-            print(f"✅ Теперь: {start}s -> {end}s (было сокращено)")
-        else:
-            print("❌ слово не найдено в субтитрах")
-            
-        time.sleep(random.uniform(1.5, 3))
+    # Результаты пишутся пачками по rowid; при Ctrl+C остаток дописывается
+    writer = writer_from_args(conn, args)
+    try:
+        with writer, profiled(args.profile):
+            for rowid, word, v_id in rows:
+                print(f"🎯 Оптимизируем '{word}'...", end=" ", flush=True)
+
+                reason = outcomes.blocked(v_id, word)
+                if reason:
+                    METRICS.inc(f"skipped_{reason}")
+                    print(f"⏭  {reason} (известно)")
+                    continue
+
+                hits_before = cache.hits if cache is not None else None
+                with METRICS.time("word"):
+                    result = get_precise_range(v_id, word, provider, cache, outcomes, writer)
+                METRICS.inc("words_found" if result else "words_not_found")
+
+                if result:
+                    start, end, text = result
+                    print(f"✅ Теперь: {start}s -> {end}s (было сокращено)")
+                    writer.add("""
+                        UPDATE words
+                        SET startTime = ?, endTime = ?, subtitleText = ?
+                        WHERE rowid = ?
+                    """, (start, end, text, rowid))
+                else:
+                    print("❌ слово не найдено в субтитрах")
+
+                from_cache = cache is not None and cache.hits != hits_before
+                if provider.network and not from_cache:  # пауза только после обращения к сети
+                    METRICS.sleep(random.uniform(1.5, 3))
+    except KeyboardInterrupt:
+        print("\n⛔ Прервано.")
 
+    provider.close()
     conn.close()
+    print(writer.summary())
+    if cache is not None:
+        print(cache.summary())
+    print(outcomes.summary())
+    print(METRICS.summary())
+    METRICS.close()
     print("🚀 Все таймкоды уточнены!")
 
 if __name__ == "__main__":
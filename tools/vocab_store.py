@@ -0,0 +1,377 @@
+"""
+vocab_store.py
+--------------
+Общий доступ инструментов к vocab.db, которую параллельно держит server.js.
+
+  conn = connect(args.db)     # WAL, busy_timeout, mmap, кеш страниц, миграции
+
+Вместо sqlite3.connect() с настройками по умолчанию и собственных
+PRAGMA table_info / ALTER TABLE в каждом инструменте:
+
+  • соединение открывается с теми же WAL / busy_timeout, что у сервера,
+    плюс mmap_size и cache_size для больших выборок;
+  • записи идут транзакциями BEGIN IMMEDIATE: блокировка на запись берётся
+    сразу и ждёт busy_timeout, а не падает с "database is locked" при попытке
+    поднять читающую транзакцию до пишущей, пока пишет сервер;
+  • схема инструментов (колонки words, служебные таблицы, индексы) —
+    версионированные миграции, номер в PRAGMA user_version (сервер его не
+    использует); каждая применяется один раз, под блокировкой.
+
+Здесь же SQL служебных таблиц: job_queue / outcomes / clip_ranker берут
+свою схему отсюда.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from typing import Callable, Iterable, Iterator
+
+DEFAULT_BUSY_TIMEOUT_MS = 10_000
+DEFAULT_MMAP_MB         = 256
+DEFAULT_CACHE_MB        = 32
+
+# Колонки words, которые пишут инструменты (сервер добавляет часть из них сам)
+WORD_COLUMNS = {
+    "videoId":           "TEXT DEFAULT ''",
+    "startTime":         "REAL DEFAULT 0",
+    "endTime":           "REAL DEFAULT 0",
+    "subtitleText":      "TEXT DEFAULT ''",
+    "subtitleLang":      "TEXT",
+    "subtitleUpdatedAt": "TEXT",
+    # clipParams больше не создаётся: /api/sync его стирал, подпись — в clip_params.
+    # В старых базах колонка остаётся, миграция 6 переносит из неё подписи
+}
+
+
+# ─── Схема служебных таблиц ───────────────────────────────────
+
+REFINE_JOBS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS refine_jobs (
+        wordId        REAL PRIMARY KEY,
+        videoId       TEXT NOT NULL,
+        state         TEXT NOT NULL DEFAULT 'pending',
+        attempts      INTEGER NOT NULL DEFAULT 0,
+        lastError     TEXT,
+        nextAttemptAt REAL NOT NULL DEFAULT 0,
+        updatedAt     REAL NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS idx_refine_jobs_ready ON refine_jobs(state, nextAttemptAt, videoId);
+    CREATE INDEX IF NOT EXISTS idx_refine_jobs_video ON refine_jobs(videoId);
+    CREATE INDEX IF NOT EXISTS idx_words_id ON words(id);
+"""
+
+NEGATIVE_OUTCOMES_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS negative_outcomes (
+        videoId    TEXT NOT NULL,
+        term       TEXT NOT NULL DEFAULT '',
+        reason     TEXT NOT NULL,
+        retryAfter REAL NOT NULL,
+        updatedAt  REAL NOT NULL,
+        PRIMARY KEY (videoId, term)
+    ) WITHOUT ROWID;
+"""
+
+CLIP_CANDIDATES_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS clip_candidates (
+        wordId       REAL    NOT NULL,
+        rank         INTEGER NOT NULL,
+        videoId      TEXT    NOT NULL,
+        fmt          TEXT    NOT NULL,
+        startTime    REAL    NOT NULL,
+        endTime      REAL    NOT NULL,
+        subtitleText TEXT    NOT NULL,
+        score        REAL    NOT NULL,
+        rankedAt     REAL    NOT NULL,
+        PRIMARY KEY (wordId, rank)
+    ) WITHOUT ROWID;
+"""
+
+# Подпись клипа (refine_segments.params_signature): кто и с какими параметрами
+# его нарезал. Отдельная таблица с ключом (words.id, original), как у
+# word_changes: /api/sync переписывает words целиком и колонки инструментов
+# (раньше — words.clipParams) обнуляет, а эта таблица синхронизацию переживает.
+CLIP_PARAMS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS clip_params (
+        wordId    REAL NOT NULL,
+        original  TEXT NOT NULL,
+        params    TEXT NOT NULL,
+        state     TEXT NOT NULL DEFAULT 'clip',   -- clip | lost (с params слово не нашлось)
+        updatedAt REAL NOT NULL,
+        PRIMARY KEY (wordId, original)
+    ) WITHOUT ROWID;
+"""
+
+# Подписи, которые уже успели записать в words.clipParams (если колонка есть)
+CLIP_PARAMS_BACKFILL = """
+    INSERT OR IGNORE INTO clip_params (wordId, original, params, updatedAt)
+    SELECT id, COALESCE(original, ''), clipParams, CAST(strftime('%s', 'now') AS REAL)
+    FROM   words WHERE id IS NOT NULL AND clipParams IS NOT NULL
+"""
+
+# Журнал изменений words (word_changes.py): одна строка на (words.id, original)
+# с номером версии последнего изменения. Ключ включает original, потому что
+# id не уникален (Date.now() при импорте), а дубли с разными словами иначе
+# перетирали бы снимок друг друга при каждой синхронизации. Триггеры
+# сравнивают videoId со снимком, так что полная перезапись таблицы через
+# /api/sync (DELETE + INSERT тех же строк) версий не меняет. Новое слово или
+# правка original — новая строка журнала. Удаления не отслеживаются.
+TRACKED_COLUMNS = ("original", "videoId")
+
+WORD_CHANGES_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS word_changes (
+        wordId    REAL NOT NULL,
+        original  TEXT NOT NULL,
+        version   INTEGER NOT NULL,
+        videoId   TEXT,
+        changedAt REAL NOT NULL,
+        PRIMARY KEY (wordId, original)
+    );
+    CREATE INDEX IF NOT EXISTS idx_word_changes_version ON word_changes(version);
+
+    CREATE TABLE IF NOT EXISTS change_marks (
+        tool      TEXT PRIMARY KEY,
+        version   INTEGER NOT NULL,
+        updatedAt REAL NOT NULL
+    );
+"""
+
+# Текущее содержимое words — версии по rowid, как будто всё только что добавлено
+WORD_CHANGES_BACKFILL = """
+    INSERT OR IGNORE INTO word_changes (wordId, original, version, videoId, changedAt)
+    SELECT id, COALESCE(original, ''), rowid, videoId, CAST(strftime('%s', 'now') AS REAL)
+    FROM   words WHERE id IS NOT NULL ORDER BY rowid
+"""
+
+_RECORD_CHANGE = """
+    INSERT INTO word_changes (wordId, original, version, videoId, changedAt)
+    VALUES (NEW.id, COALESCE(NEW.original, ''),
+            (SELECT COALESCE(MAX(version), 0) + 1 FROM word_changes),
+            NEW.videoId, CAST(strftime('%s', 'now') AS REAL))
+    ON CONFLICT (wordId, original) DO UPDATE
+    SET    version = excluded.version, videoId = excluded.videoId,
+           changedAt = excluded.changedAt
+    WHERE  word_changes.videoId IS NOT excluded.videoId;
+"""
+
+WORD_CHANGES_TRIGGERS = (
+    f"""CREATE TRIGGER IF NOT EXISTS trg_words_changes_insert
+        AFTER INSERT ON words WHEN NEW.id IS NOT NULL
+        BEGIN {_RECORD_CHANGE} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_words_changes_update
+        AFTER UPDATE OF id, {", ".join(TRACKED_COLUMNS)} ON words WHEN NEW.id IS NOT NULL
+        BEGIN {_RECORD_CHANGE} END""",
+)
+
+# Полнотекстовый индекс words (word_search.py): FTS5 с внешним содержимым —
+# текст не копируется, индекс хранит только токены и ссылается на words.rowid.
+# Триггеры держат его в актуальном состоянии при любых записях, в том числе
+# от server.js (/api/sync). rowid у words не объявлен явно, VACUUM может его
+# перенумеровать — после VACUUM нужен word_search.py --rebuild.
+SEARCH_COLUMNS = ("original", "translate", "example", "subtitleText")
+FTS_WEIGHTS    = "10.0, 5.0, 2.0, 1.0"   # bm25 по колонкам SEARCH_COLUMNS
+
+WORDS_FTS_SCHEMA = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS words_fts USING fts5(
+        {", ".join(SEARCH_COLUMNS)},
+        content = 'words', content_rowid = 'rowid',
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+"""
+
+_FTS_COLUMNS = ", ".join(SEARCH_COLUMNS)
+_FTS_NEW     = ", ".join(f"NEW.{c}" for c in SEARCH_COLUMNS)
+_FTS_OLD     = ", ".join(f"OLD.{c}" for c in SEARCH_COLUMNS)
+
+WORDS_FTS_TRIGGERS = (
+    f"""CREATE TRIGGER IF NOT EXISTS trg_words_fts_insert AFTER INSERT ON words BEGIN
+            INSERT INTO words_fts (rowid, {_FTS_COLUMNS}) VALUES (NEW.rowid, {_FTS_NEW});
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_words_fts_delete AFTER DELETE ON words BEGIN
+            INSERT INTO words_fts (words_fts, rowid, {_FTS_COLUMNS})
+            VALUES ('delete', OLD.rowid, {_FTS_OLD});
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_words_fts_update
+        AFTER UPDATE OF {_FTS_COLUMNS} ON words BEGIN
+            INSERT INTO words_fts (words_fts, rowid, {_FTS_COLUMNS})
+            VALUES ('delete', OLD.rowid, {_FTS_OLD});
+            INSERT INTO words_fts (rowid, {_FTS_COLUMNS}) VALUES (NEW.rowid, {_FTS_NEW});
+        END""",
+)
+
+# Ревизия содержимого words: растёт при любой записи в words, в том числе от
+# /api/sync. clip_export.py пишет её в clips/index.json, а клиент сверяет с
+# GET /api/words/revision — шарды берутся, только если с экспорта ничего не менялось.
+WORDS_REVISION_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS words_revision (
+        id       INTEGER PRIMARY KEY CHECK (id = 1),
+        revision INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO words_revision (id, revision) VALUES (1, 0);
+"""
+
+_BUMP_REVISION = "UPDATE words_revision SET revision = revision + 1 WHERE id = 1;"
+
+WORDS_REVISION_TRIGGERS = tuple(
+    f"""CREATE TRIGGER IF NOT EXISTS trg_words_revision_{event.lower()}
+        AFTER {event} ON words BEGIN {_BUMP_REVISION} END"""
+    for event in ("INSERT", "UPDATE", "DELETE")
+)
+
+# Колонки, по которым инструменты ищут строки words
+LOOKUP_INDEXES = """
+    CREATE INDEX IF NOT EXISTS idx_words_id       ON words(id);
+    CREATE INDEX IF NOT EXISTS idx_words_video    ON words(videoId);
+    CREATE INDEX IF NOT EXISTS idx_words_original ON words(original);
+"""
+
+
+# ─── Миграции ─────────────────────────────────────────────────
+
+def _statements(script: str) -> list[str]:
+    """executescript() сам делает COMMIT — внутри миграции выполняем по одному."""
+    return [s.strip() for s in script.split(";") if s.strip()]
+
+
+def _add_word_columns(conn: sqlite3.Connection) -> None:
+    # Старые базы уже могли получить часть колонок от сервера или прежних инструментов
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(words)")}
+    for col, typ in WORD_COLUMNS.items():
+        if col not in existing:
+            conn.execute(f"ALTER TABLE words ADD COLUMN {col} {typ}")
+
+
+def _run(script: str) -> Callable[[sqlite3.Connection], None]:
+    def step(conn: sqlite3.Connection) -> None:
+        for stmt in _statements(script):
+            conn.execute(stmt)
+    return step
+
+
+def _change_tracking(conn: sqlite3.Connection) -> None:
+    _run(WORD_CHANGES_SCHEMA)(conn)
+    conn.execute(WORD_CHANGES_BACKFILL)
+    for trigger in WORD_CHANGES_TRIGGERS:   # внутри BEGIN ... END свои ";"
+        conn.execute(trigger)
+
+
+def _words_revision(conn: sqlite3.Connection) -> None:
+    _run(WORDS_REVISION_SCHEMA)(conn)
+    for trigger in WORDS_REVISION_TRIGGERS:
+        conn.execute(trigger)
+
+
+def words_revision(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT revision FROM words_revision WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+def _clip_params(conn: sqlite3.Connection) -> None:
+    _run(CLIP_PARAMS_SCHEMA)(conn)
+    if "clipParams" in {row[1] for row in conn.execute("PRAGMA table_info(words)")}:
+        conn.execute(CLIP_PARAMS_BACKFILL)
+
+
+def fts5_available(conn: sqlite3.Connection) -> bool:
+    return bool(conn.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')").fetchone()[0])
+
+
+def create_search_index(conn: sqlite3.Connection) -> bool:
+    """Таблица words_fts, заполнение по words и триггеры; False — SQLite без FTS5."""
+    if not fts5_available(conn):
+        return False
+    conn.execute(WORDS_FTS_SCHEMA)
+    # Порядок по умолчанию (ORDER BY rank): совпадение в original важнее субтитров
+    conn.execute(f"INSERT INTO words_fts (words_fts, rank) VALUES ('rank', 'bm25({FTS_WEIGHTS})')")
+    conn.execute("INSERT INTO words_fts (words_fts) VALUES ('rebuild')")
+    for trigger in WORDS_FTS_TRIGGERS:
+        conn.execute(trigger)
+    return True
+
+
+# (версия, описание, шаг); новые — только в конец
+MIGRATIONS: list[tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "колонки инструментов в words", _add_word_columns),
+    (2, "служебные таблицы: refine_jobs, negative_outcomes, clip_candidates",
+     _run(REFINE_JOBS_SCHEMA + NEGATIVE_OUTCOMES_SCHEMA + CLIP_CANDIDATES_SCHEMA)),
+    (3, "индексы words по id, videoId, original", _run(LOOKUP_INDEXES)),
+    (4, "журнал изменений words (word_changes, триггеры)", _change_tracking),
+    # Без FTS5 шаг пропускается; индекс потом создаст word_search.py --rebuild
+    (5, "полнотекстовый индекс words_fts (FTS5, триггеры)", create_search_index),
+    (6, "подписи клипов clip_params вне words", _clip_params),
+    (7, "ревизия words для шардов clip_export (words_revision, триггеры)", _words_revision),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> list[str]:
+    """
+    Применяет недостающие миграции одной транзакцией и возвращает их описания.
+    Таблицы words ещё нет (сервер не запускался) — ничего не делает.
+    """
+    if schema_version(conn) >= SCHEMA_VERSION:
+        return []
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='words'").fetchone() is None:
+        return []
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Пока ждали блокировку, миграцию мог применить соседний инструмент
+        current = schema_version(conn)
+        applied = []
+        for version, name, step in MIGRATIONS:
+            if version > current:
+                step(conn)
+                applied.append(name)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return applied
+
+
+# ─── Соединение ───────────────────────────────────────────────
+
+def connect(path: str, busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS,
+            mmap_mb: int = DEFAULT_MMAP_MB, cache_mb: int = DEFAULT_CACHE_MB,
+            verbose: bool = True) -> sqlite3.Connection:
+    """Соединение с vocab.db, настроенное для работы рядом с живым сервером."""
+    conn = sqlite3.connect(path, timeout=busy_timeout_ms / 1000,
+                           isolation_level="IMMEDIATE")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+    conn.execute(f"PRAGMA mmap_size = {int(mmap_mb) * 1024 * 1024}")
+    conn.execute(f"PRAGMA cache_size = {-int(cache_mb) * 1024}")   # минус — в КиБ
+    for name in migrate(conn):
+        if verbose:
+            print(f"  ✚ Миграция схемы: {name}")
+    return conn
+
+
+# ─── Пакетные операции ────────────────────────────────────────
+
+def iter_rows(conn: sqlite3.Connection, sql: str, params: tuple = (),
+              size: int = 1000) -> Iterator[tuple]:
+    """SELECT порциями fetchmany — без списка всей таблицы в памяти."""
+    cur = conn.execute(sql, params)
+    while True:
+        rows = cur.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
+
+
+def update_many(conn: sqlite3.Connection, sql: str, params: Iterable[tuple]) -> int:
+    """Один подготовленный запрос на все строки, одна транзакция (BEGIN IMMEDIATE)."""
+    params = list(params)
+    if params:
+        with conn:
+            conn.executemany(sql, params)
+    return len(params)
@@ -0,0 +1,142 @@
+"""
+word_changes.py
+---------------
+Работа только с изменившимися словами: журнал word_changes (vocab_store,
+миграция 4) и отметки инструментов change_marks.
+
+Триггеры на words поднимают версию слова (words.id + original), когда оно
+добавлено, переименовано или у него сменился videoId; полная перезапись
+через /api/sync тех же строк версий не трогает. У каждого инструмента своя
+отметка — до какой версии он уже всё просмотрел. С --changed-only инструмент добавляет к своему SELECT
+условие "слово изменилось после отметки" и после работы сдвигает отметку:
+
+  changes = changes_from_args(conn, args, "refine_segments")
+  where, params = changes.sql_filter()      # "1", () без --changed-only
+  cur.execute(f"SELECT rowid, ... WHERE {where} {changes.sql_order()} LIMIT ?", ...)
+  changes.selected(rows, limit)
+  ...
+  changes.commit()
+
+Окно — изменения после отметки до последней версии на момент запуска.
+С LIMIT строки выбираются по возрастанию версии, и selected() запоминает,
+до какой версии выбрано всё: одно изменение (id, original) бывает у
+нескольких строк words, поэтому считать надо по выбранным строкам, а не по
+числу изменений. Отметка не перепрыгивает через невыбранные слова. Слова,
+обработка которых в этом запуске не удалась, в следующий --changed-only не
+попадут — их подберёт обычный запуск без флага.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import time
+from typing import Optional
+
+
+class ChangeTracker:
+    """Окно версий (since, upto] для одного инструмента и отметка mark после запуска."""
+
+    def __init__(self, conn: sqlite3.Connection, tool: str):
+        self.conn  = conn
+        self.tool  = tool
+        row = conn.execute("SELECT version FROM change_marks WHERE tool=?", (tool,)).fetchone()
+        self.since = row[0] if row else 0
+        # Изменения, сделанные во время запуска, остаются следующему
+        row = conn.execute("SELECT MAX(version) FROM word_changes").fetchone()
+        self.upto  = max(self.since, row[0] or 0)
+        self.mark  = self.upto
+
+    def _version(self, rowid: int, table: str) -> int:
+        row = self.conn.execute(f"""
+            SELECT c.version FROM {table} w
+            JOIN   word_changes c ON c.wordId = w.id AND c.original = COALESCE(w.original, '')
+            WHERE  w.rowid = ?
+        """, (rowid,)).fetchone()
+        return row[0] if row else self.upto
+
+    @property
+    def pending(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM word_changes WHERE version > ? AND version <= ?",
+                                 (self.since, self.upto)).fetchone()[0]
+
+    def sql_filter(self, table: str = "words") -> tuple[str, tuple]:
+        """Условие WHERE "слово изменилось в окне" для строк table и его параметры."""
+        return f"""EXISTS (
+                SELECT 1 FROM word_changes c
+                WHERE  c.wordId = {table}.id AND c.original = COALESCE({table}.original, '')
+                  AND  c.version > ? AND c.version <= ?)""", (self.since, self.upto)
+
+    def sql_order(self, table: str = "words") -> str:
+        """ORDER BY для SELECT с LIMIT: сначала ранние изменения (см. selected)."""
+        return f"""ORDER BY (
+                SELECT c.version FROM word_changes c
+                WHERE  c.wordId = {table}.id AND c.original = COALESCE({table}.original, ''))"""
+
+    def selected(self, rows: list[tuple], limit: Optional[int], table: str = "words") -> None:
+        """
+        Запоминает, до какой версии выбраны все строки: rows — результат SELECT
+        с sql_order (rowid первым). Не упёрлись в LIMIT — выбрано всё окно.
+        Иначе строки версий ниже последней выбраны все, а последняя версия
+        засчитывается, только если выбраны все её строки words (дубли id +
+        original). Если вся выборка — дубли одной версии, отметка всё равно
+        встаёт на неё, иначе запуски с этим --limit не продвинулись бы.
+        """
+        if not limit or len(rows) < limit:
+            self.mark = self.upto
+            return
+        last = self._version(rows[-1][0], table)
+        tail = 0
+        for row in reversed(rows):
+            if self._version(row[0], table) != last:
+                break
+            tail += 1
+        total = self.conn.execute(f"""
+            SELECT COUNT(*) FROM {table} w
+            JOIN   word_changes c ON c.wordId = w.id AND c.original = COALESCE(w.original, '')
+            WHERE  c.version = ?
+        """, (last,)).fetchone()[0]
+        done = tail >= total or tail == len(rows)
+        self.mark = min(self.upto, last if done else last - 1)
+
+    def commit(self) -> None:
+        """Сдвигает отметку инструмента до выбранного (по умолчанию — на конец окна)."""
+        with self.conn:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO change_marks (tool, version, updatedAt) VALUES (?, ?, ?)
+            """, (self.tool, self.mark, time.time()))
+
+    def summary(self) -> str:
+        mark = f" (отметка → {self.mark})" if self.mark != self.upto else ""
+        return (f"🆕 Изменения: версии {self.since}→{self.upto}{mark}, "
+                f"изменившихся слов в окне {self.pending}")
+
+
+class AllWords:
+    """Без --changed-only: фильтра нет, отметка не двигается."""
+
+    def sql_filter(self, table: str = "words") -> tuple[str, tuple]:
+        return "1", ()
+
+    def sql_order(self, table: str = "words") -> str:
+        return ""
+
+    def selected(self, rows: list[tuple], limit: Optional[int], table: str = "words") -> None:
+        pass
+
+    def commit(self) -> None:
+        pass
+
+    def summary(self) -> str:
+        return ""
+
+
+def add_change_args(p) -> None:
+    p.add_argument("--changed-only", action="store_true",
+                   help="Только слова, добавленные или изменённые (original / videoId) "
+                        "после прошлого запуска с этим флагом")
+
+
+def changes_from_args(conn: sqlite3.Connection, args, tool: str):
+    if not args.changed_only:
+        return AllWords()
+    return ChangeTracker(conn, tool)
@@ -0,0 +1,171 @@
+"""
+word_index.py
+-------------
+Инвертированный индекс слов по уже скачанным транскриптам.
+
+Токен (нижний регистр, последовательность \\w) → постинги
+(videoId, индекс чанка, время начала). Индекс лежит рядом с кешем
+субтитров (word_index.db) и обновляется инкрементально: sync() добавляет
+только транскрипты, которых ещё нет в индексе, а add() вызывается сразу
+после загрузки нового транскрипта.
+
+Позволяет найти видео для нового слова без поискового запроса в YouTube:
+если слово уже встречается в одном из известных видео, фрагмент
+вырезается локально через find_sentence().
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from transcript_cache import TranscriptCache
+from transcripts import Chunk, find_sentence
+
+INDEX_FILENAME = "word_index.db"
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Нормализованные токены — те же границы слова, что и в find_sentence()."""
+    return _TOKEN.findall(text.lower())
+
+
+class WordIndex:
+    """SQLite-индекс токен → (videoId, chunk, start)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        # add() вызывается и из потоков загрузки конвейера — пишем под замком
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.conn.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous  = NORMAL;
+            PRAGMA busy_timeout = 5000;
+
+            CREATE TABLE IF NOT EXISTS videos (
+                videoId   TEXT NOT NULL,
+                lang      TEXT NOT NULL,
+                fmt       TEXT NOT NULL,
+                chunks    INTEGER NOT NULL,
+                indexedAt REAL NOT NULL,
+                PRIMARY KEY (videoId, lang, fmt)
+            );
+
+            CREATE TABLE IF NOT EXISTS postings (
+                token   TEXT    NOT NULL,
+                videoId TEXT    NOT NULL,
+                fmt     TEXT    NOT NULL,
+                chunk   INTEGER NOT NULL,
+                start   REAL    NOT NULL,
+                PRIMARY KEY (token, videoId, fmt, chunk)
+            ) WITHOUT ROWID;
+
+            CREATE INDEX IF NOT EXISTS idx_postings_video ON postings(videoId, fmt);
+        """)
+
+    @classmethod
+    def for_cache(cls, cache: TranscriptCache) -> "WordIndex":
+        return cls(os.path.join(cache.root, INDEX_FILENAME))
+
+    def close(self) -> None:
+        self.conn.close()
+
+    # ─── Обновление ───────────────────────────────────────────
+
+    def add(self, video_id: str, lang: str, fmt: str, chunks: list[Chunk]) -> int:
+        """(Пере)индексирует один транскрипт. Возвращает число постингов."""
+        postings = {}
+        for i, chunk in enumerate(chunks):
+            for token in tokenize(chunk.text):
+                postings.setdefault((token, i), chunk.start)
+
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM postings WHERE videoId=? AND fmt=?", (video_id, fmt))
+            self.conn.executemany(
+                "INSERT INTO postings (token, videoId, fmt, chunk, start) VALUES (?, ?, ?, ?, ?)",
+                [(tok, video_id, fmt, i, start) for (tok, i), start in postings.items()])
+            self.conn.execute("""
+                INSERT OR REPLACE INTO videos (videoId, lang, fmt, chunks, indexedAt)
+                VALUES (?, ?, ?, ?, ?)
+            """, (video_id, lang, fmt, len(chunks), time.time()))
+        return len(postings)
+
+    def remove(self, video_id: str, lang: str, fmt: str) -> None:
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM postings WHERE videoId=? AND fmt=?", (video_id, fmt))
+            self.conn.execute("DELETE FROM videos WHERE videoId=? AND lang=? AND fmt=?",
+                              (video_id, lang, fmt))
+
+    def sync(self, cache: TranscriptCache) -> tuple[int, int]:
+        """
+        Доиндексирует новые транскрипты из кеша и выбрасывает вытесненные.
+        Возвращает (добавлено, удалено).
+        """
+        cached  = set(cache.keys())
+        indexed = {tuple(r) for r in self.conn.execute("SELECT videoId, lang, fmt FROM videos")}
+
+        added = 0
+        for video_id, lang, fmt in sorted(cached - indexed):
+            chunks = cache.get(video_id, lang, fmt)
+            if chunks:
+                self.add(video_id, lang, fmt, chunks)
+                added += 1
+
+        stale = indexed - cached
+        for video_id, lang, fmt in stale:
+            self.remove(video_id, lang, fmt)
+        return added, len(stale)
+
+    # ─── Поиск ────────────────────────────────────────────────
+
+    def lookup(self, word: str, limit: int = 50) -> list[tuple[str, str, int, float]]:
+        """
+        Чанки, содержащие все токены слова/фразы:
+        список (videoId, fmt, chunk, start).
+        """
+        tokens = list(dict.fromkeys(tokenize(word)))
+        if not tokens:
+            return []
+
+        joins  = "".join(
+            f" JOIN postings p{i} ON p{i}.token=? AND p{i}.videoId=p0.videoId"
+            f" AND p{i}.fmt=p0.fmt AND p{i}.chunk=p0.chunk"
+            for i in range(1, len(tokens)))
+        sql = (f"SELECT p0.videoId, p0.fmt, p0.chunk, p0.start FROM postings p0{joins}"
+               f" WHERE p0.token=? ORDER BY p0.videoId, p0.chunk LIMIT ?")
+        return self.conn.execute(sql, (*tokens[1:], tokens[0], limit)).fetchall()
+
+    def stats(self) -> tuple[int, int]:
+        videos = self.conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+        tokens = self.conn.execute("SELECT COUNT(DISTINCT token) FROM postings").fetchone()[0]
+        return videos, tokens
+
+
+def resolve_from_index(index: WordIndex, cache: TranscriptCache, word: str,
+                       max_duration: float = 15.0,
+                       ) -> Optional[tuple[str, float, float, str]]:
+    """
+    Ищет слово в уже известных видео без обращения к сети.
+    Возвращает (videoId, start, end, sentence) или None.
+    """
+    seen = set()
+    for video_id, fmt, _chunk, _start in index.lookup(word):
+        if (video_id, fmt) in seen:
+            continue
+        seen.add((video_id, fmt))
+
+        chunks = cache.get(video_id, "en", fmt)
+        if not chunks:
+            continue
+        result = find_sentence(chunks, word, max_duration=max_duration)
+        if result is not None:
+            start, end, sentence = result
+            return video_id, start, end, sentence
+    return None
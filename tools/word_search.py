@@ -0,0 +1,225 @@
+"""
+word_search.py
+--------------
+Полнотекстовый поиск по словарю: FTS5-индекс words_fts над original,
+translate, example и subtitleText (vocab_store, миграция 5).
+
+Индекс с внешним содержимым: строки не копируются, а триггеры на words
+обновляют его при каждой записи — и из инструментов, и из /api/sync
+сервера, так что отдельного шага "переиндексировать" нет. Запрос идёт по
+B-дереву токенов, а не перебором строк, и на 100k+ слов занимает
+миллисекунды.
+
+  python3 tools/word_search.py "take off"            # все слова, последнее — префикс
+  python3 tools/word_search.py '"look forward to"'   # точная фраза
+  python3 tools/word_search.py rock --columns subtitleText --clips-only
+  python3 tools/word_search.py --sentence "We should take off early" --json
+  python3 tools/word_search.py --rebuild             # после VACUUM / без FTS5 при миграции
+
+Синтаксис запроса (fts_query; /api/search в server.js разбирает так же):
+слова через пробел — все должны встретиться; "в кавычках" — фраза;
+слово* — префикс. Из программы:
+
+  hits = search(conn, "take of", columns=("original",))
+  found = words_in_sentence(conn, "We should take off early")
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import time
+from dataclasses import asdict, dataclass
+from typing import Iterable, Optional
+
+from vocab_store import SEARCH_COLUMNS, connect, create_search_index, fts5_available
+
+DEFAULT_LIMIT    = 20
+SNIPPET_TOKENS   = 12
+_CANDIDATE_LIMIT = 10_000   # слов-кандидатов для words_in_sentence
+
+_QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+_TOKEN_RE = re.compile(r"\w+")
+
+
+@dataclass
+class SearchHit:
+    rowid:     int
+    id:        Optional[float]
+    original:  str
+    translate: str
+    videoId:   str
+    startTime: float
+    endTime:   float
+    snippet:   str
+    score:     float   # bm25: меньше — лучше
+
+
+# ─── Запрос ───────────────────────────────────────────────────
+
+def _tokens(text: str) -> list[str]:
+    return [t.lower() for t in _TOKEN_RE.findall(text)]
+
+
+def _phrase(tokens: list[str]) -> str:
+    return '"' + " ".join(tokens) + '"'
+
+
+def fts_query(text: str, prefix: bool = True) -> Optional[str]:
+    """
+    Строка пользователя → выражение MATCH. Спецсимволы FTS5 не пропускаются:
+    каждое слово — фраза в кавычках, "take-off" — фраза "take off". С prefix
+    последнее слово без кавычек ищется как префикс (поиск по мере набора).
+    """
+    parts = []
+    for quoted, bare in _QUERY_RE.findall(text):
+        tokens = _tokens(quoted if quoted else bare)
+        if not tokens:
+            continue
+        star = "*" if bare and bare.endswith("*") else ""
+        parts.append([_phrase(tokens), star, bool(bare)])
+    if not parts:
+        return None
+    if prefix and parts[-1][2]:
+        parts[-1][1] = "*"
+    return " ".join(phrase + star for phrase, star, _bare in parts)
+
+
+def _in_columns(query: str, columns: Optional[Iterable[str]]) -> str:
+    if not columns:
+        return query
+    columns = list(columns)
+    unknown = set(columns) - set(SEARCH_COLUMNS)
+    if unknown:
+        raise ValueError(f"нет в индексе: {', '.join(sorted(unknown))}")
+    return f"{{{' '.join(columns)}}} : ({query})"
+
+
+# ─── Поиск ────────────────────────────────────────────────────
+
+def search(conn, text: str, limit: int = DEFAULT_LIMIT,
+           columns: Optional[Iterable[str]] = None, clips_only: bool = False,
+           prefix: bool = True, marks: tuple[str, str] = ("[", "]")) -> list[SearchHit]:
+    """Слова, подходящие под запрос, лучшие по bm25 первыми."""
+    query = fts_query(text, prefix)
+    if query is None:
+        return []
+    clips = "AND COALESCE(w.videoId, '') != '' AND COALESCE(w.subtitleText, '') != ''" if clips_only else ""
+    rows = conn.execute(f"""
+        SELECT w.rowid, w.id, w.original, w.translate, w.videoId, w.startTime, w.endTime,
+               snippet(words_fts, -1, ?, ?, '…', {SNIPPET_TOKENS}), words_fts.rank
+        FROM   words_fts JOIN words w ON w.rowid = words_fts.rowid
+        WHERE  words_fts MATCH ? {clips}
+        ORDER  BY words_fts.rank
+        LIMIT  ?
+    """, (*marks, _in_columns(query, columns), limit)).fetchall()
+    return [SearchHit(rowid, word_id, original or "", translate or "", video_id or "",
+                      float(start or 0), float(end or 0), snippet or "", score)
+            for rowid, word_id, original, translate, video_id, start, end, snippet, score in rows]
+
+
+def _contains(sentence: list[str], phrase: list[str]) -> bool:
+    n = len(phrase)
+    return any(sentence[i:i + n] == phrase for i in range(len(sentence) - n + 1))
+
+
+def words_in_sentence(conn, sentence: str, limit: int = 50) -> list[tuple[int, Optional[float], str]]:
+    """
+    Сохранённые слова, которые встречаются в предложении целиком:
+    (rowid, id, original). Кандидаты — по индексу original (любое слово
+    предложения), затем проверка, что все токены original идут подряд.
+    """
+    tokens = _tokens(sentence)
+    if not tokens:
+        return []
+    query = " OR ".join(_phrase([t]) for t in dict.fromkeys(tokens))
+    rows = conn.execute("""
+        SELECT w.rowid, w.id, w.original
+        FROM   words_fts JOIN words w ON w.rowid = words_fts.rowid
+        WHERE  words_fts MATCH ?
+        LIMIT  ?
+    """, (_in_columns(query, ("original",)), _CANDIDATE_LIMIT)).fetchall()
+    found = [(rowid, word_id, original) for rowid, word_id, original in rows
+             if _tokens(original or "") and _contains(tokens, _tokens(original))]
+    # Длинные фразы раньше отдельных слов из них
+    found.sort(key=lambda r: -len(_tokens(r[2])))
+    return found[:limit]
+
+
+def rebuild(conn) -> bool:
+    """Пересобирает индекс (и создаёт его, если миграция прошла без FTS5)."""
+    with conn:
+        return create_search_index(conn)
+
+
+def has_index(conn) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name='words_fts'").fetchone() is not None
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Полнотекстовый поиск по словам, примерам и субтитрам")
+    p.add_argument("query", nargs="?", default="", help='Слова, "фраза", префикс*')
+    p.add_argument("--db", default="./vocab.db")
+    p.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    p.add_argument("--columns", default=None,
+                   help=f"Искать только в колонках через запятую ({', '.join(SEARCH_COLUMNS)})")
+    p.add_argument("--clips-only", action="store_true", help="Только слова с клипом")
+    p.add_argument("--exact", action="store_true",
+                   help="Без префикса для последнего слова")
+    p.add_argument("--sentence", default=None,
+                   help="Какие сохранённые слова встречаются в этом предложении")
+    p.add_argument("--json", action="store_true", help="Результат в JSON (для сервера)")
+    p.add_argument("--rebuild", action="store_true", help="Пересобрать индекс words_fts")
+    args = p.parse_args()
+
+    conn = connect(args.db, verbose=not args.json)
+    if args.rebuild:
+        t0 = time.perf_counter()
+        if not rebuild(conn):
+            print("❌ SQLite собран без FTS5 — индекс не создать")
+            raise SystemExit(1)
+        rows = conn.execute("SELECT COUNT(*) FROM words").fetchone()[0]
+        print(f"🗂  Индекс words_fts пересобран: {rows} слов за {time.perf_counter() - t0:.2f}с")
+        if not (args.query or args.sentence):
+            conn.close()
+            return
+    if not has_index(conn):
+        reason = "SQLite без FTS5" if not fts5_available(conn) else "запустите с --rebuild"
+        print(f"❌ Нет индекса words_fts ({reason})")
+        raise SystemExit(1)
+
+    t0 = time.perf_counter()
+    if args.sentence is not None:
+        found = words_in_sentence(conn, args.sentence, args.limit)
+        elapsed = time.perf_counter() - t0
+        if args.json:
+            print(json.dumps([{"rowid": r, "id": i, "original": o} for r, i, o in found],
+                             ensure_ascii=False))
+        else:
+            print(f"🔎 В предложении {len(found)} сохранённых слов ({elapsed * 1000:.1f} мс)")
+            for _rowid, _id, original in found:
+                print(f"  • {original}")
+        conn.close()
+        return
+
+    columns = args.columns.split(",") if args.columns else None
+    try:
+        hits = search(conn, args.query, args.limit, columns, args.clips_only, not args.exact)
+    except ValueError as exc:
+        print(f"❌ {exc}")
+        raise SystemExit(1)
+    elapsed = time.perf_counter() - t0
+    if args.json:
+        print(json.dumps([asdict(h) for h in hits], ensure_ascii=False))
+    else:
+        print(f"🔎 {fts_query(args.query, not args.exact)}: {len(hits)} "
+              f"({elapsed * 1000:.1f} мс)")
+        for h in hits:
+            clip = f"  🎬 {h.videoId} [{h.startTime:g}s–{h.endTime:g}s]" if h.videoId else ""
+            print(f"  • {h.original} — {h.translate}{clip}\n      {h.snippet}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+ydl_session.py
+--------------
+Долгоживущие сессии yt-dlp вместо нового YoutubeDL на каждое слово.
+
+Конструктор YoutubeDL каждый раз заново разбирает опции, читает cookies.txt
+и собирает HTTP-обработчики, а после выхода из with соединения закрываются.
+YdlSession строит экземпляр один раз и отдаёт через него и extract_info,
+и urlopen — запросы идут через keep-alive соединения того же экземпляра.
+
+SessionPool держит по сессии на поток (на каждый набор опций) и пересоздаёт
+её после смены IP: старые keep-alive соединения остались бы на прежнем
+прокси / цепочке Tor.
+
+  pool = SessionPool(lambda proxy: build_opts(proxy, cookies))
+  try:
+      info = pool.get(proxy).extract_info(url, download=False)
+  finally:
+      pool.close()
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Optional
+
+
+def _default_factory():
+    from yt_dlp import YoutubeDL
+    return YoutubeDL
+
+
+class YdlSession:
+    """Один настроенный YoutubeDL; создаётся лениво, закрывается явно."""
+
+    def __init__(self, opts: dict, factory: Optional[Callable[[dict], Any]] = None):
+        self.opts     = opts
+        self._factory = factory
+        self._ydl     = None
+        self.requests = 0
+
+    @property
+    def ydl(self):
+        if self._ydl is None:
+            factory   = self._factory or _default_factory()
+            self._ydl = factory(self.opts)
+        return self._ydl
+
+    def extract_info(self, url: str, **kwargs) -> Optional[dict]:
+        self.requests += 1
+        kwargs.setdefault("download", False)
+        return self.ydl.extract_info(url, **kwargs)
+
+    def urlopen(self, url: str) -> bytes:
+        """Скачивает url тем же экземпляром (те же cookies, прокси и соединения)."""
+        self.requests += 1
+        response = self.ydl.urlopen(url)
+        try:
+            return response.read()
+        finally:
+            # Дочитанный и закрытый ответ возвращает соединение в пул
+            close = getattr(response, "close", None)
+            if close is not None:
+                close()
+
+    def close(self) -> None:
+        ydl, self._ydl = self._ydl, None
+        if ydl is None:
+            return
+        # __exit__ сохраняет cookies и закрывает обработчики (в новых yt-dlp — через close())
+        exit_ = getattr(ydl, "__exit__", None)
+        if exit_ is not None:
+            exit_(None, None, None)
+        else:
+            close = getattr(ydl, "close", None)
+            if close is not None:
+                close()
+
+    def __enter__(self) -> "YdlSession":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class SessionPool:
+    """
+    Сессии по потокам: get(key) в одном потоке всегда отдаёт одну и ту же
+    сессию, пока не сменился key (прокси) или не вызван invalidate().
+    """
+
+    def __init__(self, opts_for: Callable[[Optional[str]], dict],
+                 factory: Optional[Callable[[dict], Any]] = None):
+        self.opts_for    = opts_for
+        self.factory     = factory
+        self._local      = threading.local()
+        self._lock       = threading.Lock()
+        self._sessions: list[YdlSession] = []
+        self._generation = 0
+        self.created     = 0
+
+    def get(self, key: Optional[str] = None) -> YdlSession:
+        local = self._local
+        if (getattr(local, "session", None) is not None
+                and local.key == key and local.generation == self._generation):
+            return local.session
+
+        old = getattr(local, "session", None)
+        if old is not None:
+            self._discard(old)
+
+        session = YdlSession(self.opts_for(key), self.factory)
+        with self._lock:
+            self._sessions.append(session)
+            self.created += 1
+        local.session, local.key, local.generation = session, key, self._generation
+        return session
+
+    def invalidate(self) -> None:
+        """После смены IP: каждый поток пересоздаст сессию при следующем get()."""
+        with self._lock:
+            self._generation += 1
+
+    def _discard(self, session: YdlSession) -> None:
+        with self._lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+        session.close()
+
+    def close(self) -> None:
+        """Закрывает все сессии всех потоков — вызывать в конце запуска."""
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+            self._generation += 1
+        for session in sessions:
+            session.close()
+
+    def __enter__(self) -> "SessionPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
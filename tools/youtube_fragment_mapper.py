@@ -1,12 +1,21 @@
 #!/usr/bin/env python3
 import argparse
-import sqlite3
 import time
 import random
 from dataclasses import dataclass
 from typing import Optional
 from yt_dlp import YoutubeDL
 
+from outcomes import OutcomeStore, add_outcome_args, outcomes_from_args
+from search_cache import (SearchCache, add_search_cache_args, search_cache_from_args,
+                          search_entry, walk_candidates)
+from terms import dedupe_summary, fan_out, group_terms, resolved_by_key
+from transcript_cache import add_cache_args, cache_from_args
+from vocab_store import connect
+from word_changes import add_change_args, changes_from_args
+from word_index import WordIndex, resolve_from_index
+from ydl_session import YdlSession
+
 @dataclass
 class MatchResult:
     word: str
@@ -14,25 +23,44 @@ class MatchResult:
     start_time: float
 
 class YouTubeFinder:
-    def __init__(self):
+    def __init__(self, outcomes: Optional[OutcomeStore] = None,
+                 searches: Optional[SearchCache] = None):
+        self.outcomes = outcomes
+        self.searches = searches
         self.ydl_opts = {
             "quiet": True,
             "no_warnings": True,
             "skip_download": True,
-            "extract_flat": False,
+            # Из поиска нужен только id — плоский список без загрузки страницы каждого видео
+            "extract_flat": True,
             "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
         }
+        # Один экземпляр YoutubeDL на весь запуск
+        self.session = YdlSession(self.ydl_opts, YoutubeDL)
+
+    def close(self):
+        self.session.close()
+
+    def _known_no_subs(self, vid_id: str) -> bool:
+        # Про это видео уже известно, что английских субтитров нет — не привязываем
+        return self.outcomes is not None and self.outcomes.blocked(vid_id) == "no_subs"
+
+    def _search(self, query: str, n: int) -> list[dict]:
+        search_data = self.session.extract_info(f"ytsearch{n}:{query}", download=False)
+        if not search_data or not search_data.get('entries'):
+            return []
+        return [search_entry(e) for e in search_data['entries'] if e.get('id')]
 
     def find(self, word: str) -> Optional[MatchResult]:
         query = f"sentence with the word {word} english"
         try:
-            with YoutubeDL(self.ydl_opts) as ydl:
-                search_data = ydl.extract_info(f"ytsearch1:{query}", download=False)
-                if not search_data or 'entries' not in search_data or not search_data['entries']:
-                    return None
-                
-                entry = search_data['entries'][0]
-                return MatchResult(word, entry['id'], 5.0)
+            # Первый подходящий кандидат — из кеша поиска, если он там есть
+            entry = next(walk_candidates(self.searches, query, 1,
+                                         lambda n: self._search(query, n), self._known_no_subs),
+                         None)
+            if entry is None:
+                return None
+            return MatchResult(word, entry['id'], 5.0)
         except:
             return None
 
@@ -40,51 +68,102 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--db", default="./vocab.db")
     parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--index-first", action="store_true",
+                        help="Сначала искать слово в уже скачанных транскриптах (без поиска в YouTube)")
+    parser.add_argument("--max-duration", type=float, default=15.0,
+                        help="Макс. длина фрагмента для совпадений из индекса")
+    add_cache_args(parser)
+    add_outcome_args(parser)
+    add_search_cache_args(parser)
+    add_change_args(parser)
     args = parser.parse_args()
 
     try:
-        conn = sqlite3.connect(args.db)
+        conn = connect(args.db)
         cur = conn.cursor()
-        
-        # Проверяем колонки
-        cur.execute("PRAGMA table_info(words)")
-        cols = {row[1] for row in cur.fetchall()}
-        if "videoId" not in cols: cur.execute("ALTER TABLE words ADD COLUMN videoId TEXT DEFAULT ''")
-        if "startTime" not in cols: cur.execute("ALTER TABLE words ADD COLUMN startTime REAL DEFAULT 0")
-        conn.commit()
+        changes = changes_from_args(conn, args, "youtube_fragment_mapper")
+        changed, changed_params = changes.sql_filter()
 
         # Исправленный запрос получения слов
-        cur.execute("""
-            SELECT original FROM words 
+        cur.execute(f"""
+            SELECT rowid, original FROM words 
             WHERE (videoId IS NULL OR videoId = '') 
               AND length(original) > 1 
+              AND {changed}
+            {changes.sql_order()}
             LIMIT ?
-        """, (args.limit,))
-        
-        words = [row[0] for row in cur.fetchall()]
+        """, (*changed_params, args.limit))
+        rows = cur.fetchall()
+        changes.selected(rows, args.limit)
+
+        # Один поиск на термин; уже найденное для другого написания — копируем
+        terms = group_terms(rows)
+        resolved = resolved_by_key(cur, ("videoId", "startTime"),
+                                   "videoId != '' AND videoId IS NOT NULL")
+        borrowed = [t for t in terms if t.key in resolved]
+        for term in borrowed:
+            fan_out(conn, "UPDATE words SET videoId=?, startTime=? WHERE rowid=?",
+                    resolved[term.key], term.rowids)
+        terms = [t for t in terms if t.key not in resolved]
+        print(dedupe_summary(len(rows), len(terms) + len(borrowed), len(borrowed)))
         
-        if not words:
+        if not terms:
+            changes.commit()
             print("✨ Все videoId уже заполнены. Работы нет!")
             return
 
-        finder = YouTubeFinder()
-        print(f"🤖 Автоматизация запущена! Обрабатываю {len(words)} слов...")
+        outcomes = outcomes_from_args(conn, args)
+        searches = search_cache_from_args(args)
+        if searches is not None:
+            searches.purge()
+        finder = YouTubeFinder(outcomes, searches)
+        print(f"🤖 Автоматизация запущена! Обрабатываю {len(terms)} слов...")
+
+        cache = index = None
+        if args.index_first:
+            cache = cache_from_args(args)
+            if cache is not None:
+                index = WordIndex.for_cache(cache)
+                added, removed = index.sync(cache)
+                videos, tokens = index.stats()
+                print(f"📚 Индекс: {videos} видео, {tokens} токенов (+{added} / -{removed})")
+
+        from_index = 0
+        for i, term in enumerate(terms, start=1):
+            word = term.original
+            local = resolve_from_index(index, cache, word, args.max_duration) if index else None
+            if local:
+                # Слово уже есть в известном видео — пишем фрагмент без сети и без паузы
+                video_id, start, end, sentence = local
+                fan_out(conn, """
+                    UPDATE words SET videoId=?, startTime=?, endTime=?, subtitleText=?
+                    WHERE rowid=?
+                """, (video_id, start, end, sentence), term.rowids)
+                from_index += 1
+                print(f"[{i}/{len(terms)}] 📚 {word} -> {video_id} [{start}s–{end}s]")
+                continue
 
-        for i, word in enumerate(words, start=1):
             res = finder.find(word)
             if res:
                 # Вставляем ID видео прямо в базу
-                cur.execute("UPDATE words SET videoId=?, startTime=? WHERE original=?", 
-                            (res.video_id, res.start_time, word))
-                conn.commit()
-                print(f"[{i}/{len(words)}] ✅ {word} -> {res.video_id}")
+                fan_out(conn, "UPDATE words SET videoId=?, startTime=? WHERE rowid=?",
+                        (res.video_id, res.start_time), term.rowids)
+                print(f"[{i}/{len(terms)}] ✅ {word} -> {res.video_id}")
             else:
-                print(f"[{i}/{len(words)}] ❌ {word} -> пропуск")
+                print(f"[{i}/{len(terms)}] ❌ {word} -> пропуск")
             
             # Пауза для защиты от бана
             time.sleep(random.uniform(4, 8))
 
+        finder.close()
+        changes.commit()
+        print(outcomes.summary())
+        if searches is not None:
+            print(searches.summary())
+            searches.close()
         conn.close()
+        if index is not None:
+            print(f"📚 Найдено по индексу без поиска: {from_index}/{len(terms)}")
         print("🏁 Автоматизация успешно завершена!")
 
     except Exception as e: